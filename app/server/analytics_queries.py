@@ -0,0 +1,299 @@
+"""Set-based aggregate queries behind the analytics router.
+
+Each public function issues ONE SQL statement and returns typed schema objects,
+so a dashboard load costs a fixed number of round trips to the (cross-region)
+database no matter how many figures it shows:
+
+- ``dashboard_summary``: today's purchase/sale/expense totals (conditional sums
+  over a UNION ALL of the three ledgers restricted to today), the all-time
+  totals summed from ``monthly_rollups`` and the receivable.
+- ``monthly_stats``: per-month purchase/sale/expense totals, read from the
+  ``monthly_rollups`` table (at most one row per month, see rollups.py).
+- ``product_sales`` / ``top_buyers``: product totals (from
+  ``monthly_product_rollups`` unless filtered by exact dates) and the largest
+  outstanding balances.
+- ``full_report``: monthly stats, product sales and top buyers combined in a
+  single UNION ALL, tagged by a ``section`` column.
+
+Every sum runs in the database over the NUMERIC money/quantity columns, so it
+is exact however many rows it covers; the result is converted to float once, by
+the report schemas.
+
+Statement construction is kept separate from row parsing so the same SQL can be
+executed by other session types; the wrappers at the bottom run it on the
+``AsyncSession`` used by the async analytics routes.
+"""
+from datetime import date
+from typing import List, Optional
+from sqlalchemy import Integer, Numeric, String, case, cast, extract, func
+from sqlalchemy import literal_column, null, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+import schemas
+
+PURCHASE = "P"
+SALE = "S"
+EXPENSE = "E"
+
+
+def _text(value: str):
+    """An inline string constant (not a bind parameter, so its type is known)."""
+    return literal_column(f"'{value}'", String)
+
+
+def _ledger(day: date):
+    """UNION ALL of (kind, amount) over the purchases, sales and expenses of a day.
+
+    The date filter is applied inside each branch so it can use the per-table
+    date indexes instead of filtering the combined result.
+    """
+    branches = []
+    for kind, model, amount in (
+        (PURCHASE, models.Purchase, models.Purchase.total_purchase_cost),
+        (SALE, models.Sale, models.Sale.total_amount),
+        (EXPENSE, models.Expense, models.Expense.amount),
+    ):
+        branches.append(
+            select(_text(kind).label("kind"), amount.label("amount")).where(
+                model.date == day
+            )
+        )
+    return union_all(*branches).subquery("ledger")
+
+
+def _sum_where(condition, column):
+    return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+
+def _month_list(months: int, today: date):
+    """The last ``months`` (year, month) pairs, oldest first, ending at today."""
+    month_list = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        month_list.append((year, month))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    month_list.reverse()
+    return month_list
+
+
+# ============== STATEMENTS ==============
+def _scalar_sum(column):
+    return select(func.coalesce(func.sum(column), 0)).scalar_subquery()
+
+
+def dashboard_statement(today: date):
+    ledger = _ledger(today)
+    return select(
+        _sum_where(ledger.c.kind == PURCHASE, ledger.c.amount).label(
+            "today_purchases"
+        ),
+        _sum_where(ledger.c.kind == SALE, ledger.c.amount).label("today_sales"),
+        _sum_where(ledger.c.kind == EXPENSE, ledger.c.amount).label(
+            "today_expenses"
+        ),
+        _scalar_sum(models.MonthlyRollup.purchases).label("total_purchases"),
+        _scalar_sum(models.MonthlyRollup.sales).label("total_sales"),
+        _scalar_sum(models.MonthlyRollup.expenses).label("total_expenses"),
+        _scalar_sum(models.BuyerBalance.outstanding).label("total_receivable"),
+    )
+
+
+def _monthly_select(start_date: date):
+    rollup = models.MonthlyRollup
+    return select(
+        _text("month").label("section"),
+        cast(extract("year", rollup.month), Integer).label("year"),
+        cast(extract("month", rollup.month), Integer).label("month"),
+        cast(null(), String).label("name"),
+        cast(rollup.purchases, Numeric).label("a"),
+        cast(rollup.sales, Numeric).label("b"),
+        cast(rollup.expenses, Numeric).label("c"),
+    ).where(rollup.month >= start_date)
+
+
+def _product_select(start_date: Optional[date] = None, end_date: Optional[date] = None):
+    if start_date is None and end_date is None:
+        rollup = models.MonthlyProductRollup
+        return (
+            select(
+                _text("product").label("section"),
+                cast(null(), Integer).label("year"),
+                cast(null(), Integer).label("month"),
+                models.ProductType.name.label("name"),
+                cast(func.sum(rollup.kg_sold), Numeric).label("a"),
+                cast(func.sum(rollup.amount), Numeric).label("b"),
+                cast(null(), Numeric).label("c"),
+            )
+            .join(rollup, models.ProductType.id == rollup.product_type_id)
+            .group_by(models.ProductType.name)
+            # Rollup rows stay behind at zero when their sales are deleted;
+            # like the join on sale_items, list only products that sold.
+            .having(
+                or_(func.sum(rollup.kg_sold) != 0, func.sum(rollup.amount) != 0)
+            )
+        )
+
+    query = (
+        select(
+            _text("product").label("section"),
+            cast(null(), Integer).label("year"),
+            cast(null(), Integer).label("month"),
+            models.ProductType.name.label("name"),
+            cast(func.coalesce(func.sum(models.SaleItem.quantity), 0), Numeric).label(
+                "a"
+            ),
+            cast(
+                func.coalesce(func.sum(models.SaleItem.total_price), 0), Numeric
+            ).label("b"),
+            cast(null(), Numeric).label("c"),
+        )
+        .join(models.SaleItem, models.ProductType.id == models.SaleItem.product_type_id)
+        .join(models.Sale, models.SaleItem.sale_id == models.Sale.id)
+        .group_by(models.ProductType.name)
+    )
+    if start_date:
+        query = query.where(models.Sale.date >= start_date)
+    if end_date:
+        query = query.where(models.Sale.date <= end_date)
+    return query
+
+
+def _top_buyers_select(limit: int):
+    top = (
+        select(models.Buyer.name, models.BuyerBalance.outstanding)
+        .join(models.BuyerBalance, models.BuyerBalance.buyer_id == models.Buyer.id)
+        .where(models.BuyerBalance.outstanding > 0)
+        .order_by(models.BuyerBalance.outstanding.desc())
+        .limit(limit)
+        .subquery("top")
+    )
+    return select(
+        _text("buyer").label("section"),
+        cast(null(), Integer).label("year"),
+        cast(null(), Integer).label("month"),
+        top.c.name.label("name"),
+        cast(top.c.outstanding, Numeric).label("a"),
+        cast(null(), Numeric).label("b"),
+        cast(null(), Numeric).label("c"),
+    )
+
+
+def monthly_statement(months: int, today: date):
+    year, month = _month_list(months, today)[0]
+    return _monthly_select(date(year, month, 1))
+
+
+def product_sales_statement(
+    start_date: Optional[date] = None, end_date: Optional[date] = None
+):
+    return _product_select(start_date, end_date)
+
+
+def top_buyers_statement(limit: int):
+    return _top_buyers_select(limit)
+
+
+def full_report_statement(months: int, today: date, top_buyers_limit: int = 10):
+    year, month = _month_list(months, today)[0]
+    return union_all(
+        _monthly_select(date(year, month, 1)),
+        _product_select(),
+        _top_buyers_select(top_buyers_limit),
+    )
+
+
+# ============== ROW PARSING ==============
+def parse_dashboard(row) -> schemas.DashboardSummary:
+    total_sales = row.total_sales or 0
+    total_purchases = row.total_purchases or 0
+    total_expenses = row.total_expenses or 0
+    return schemas.DashboardSummary(
+        today_purchases=row.today_purchases or 0,
+        today_sales=row.today_sales or 0,
+        today_expenses=row.today_expenses or 0,
+        total_purchases=total_purchases,
+        total_sales=total_sales,
+        total_expenses=total_expenses,
+        total_profit=total_sales - total_purchases - total_expenses,
+        total_receivable=row.total_receivable or 0,
+    )
+
+
+def parse_monthly(rows, months: int, today: date) -> List[schemas.MonthlyStats]:
+    totals = {(r.year, r.month): r for r in rows}
+    monthly_stats = []
+    for year, month in _month_list(months, today):
+        row = totals.get((year, month))
+        purchases = row.a if row else 0
+        sales = row.b if row else 0
+        expenses = row.c if row else 0
+        monthly_stats.append(
+            schemas.MonthlyStats(
+                month=date(year, month, 1).strftime("%b %Y"),
+                purchases=purchases,
+                sales=sales,
+                expenses=expenses,
+                profit=sales - purchases - expenses,
+            )
+        )
+    return monthly_stats
+
+
+def parse_product_sales(rows) -> List[schemas.ProductSalesStats]:
+    return [
+        schemas.ProductSalesStats(
+            product_name=r.name, total_quantity=r.a or 0, total_amount=r.b or 0
+        )
+        for r in rows
+    ]
+
+
+def parse_top_buyers(rows) -> List[schemas.TopBuyerStats]:
+    return [
+        schemas.TopBuyerStats(buyer_name=r.name, outstanding_amount=r.a)
+        for r in sorted(rows, key=lambda r: r.a, reverse=True)
+    ]
+
+
+def parse_full_report(rows, months: int, today: date) -> schemas.AnalyticsResponse:
+    sections = {"month": [], "product": [], "buyer": []}
+    for row in rows:
+        sections[row.section].append(row)
+    return schemas.AnalyticsResponse(
+        monthly_stats=parse_monthly(sections["month"], months, today),
+        product_sales=parse_product_sales(sections["product"]),
+        top_buyers=parse_top_buyers(sections["buyer"]),
+    )
+
+
+# ============== QUERIES ==============
+async def dashboard_summary(db: AsyncSession, today: Optional[date] = None):
+    today = today or date.today()
+    result = await db.execute(dashboard_statement(today))
+    return parse_dashboard(result.one())
+
+
+async def monthly_stats(db: AsyncSession, months: int, today: Optional[date] = None):
+    today = today or date.today()
+    result = await db.execute(monthly_statement(months, today))
+    return parse_monthly(result.all(), months, today)
+
+
+async def product_sales(
+    db: AsyncSession,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    result = await db.execute(product_sales_statement(start_date, end_date))
+    return parse_product_sales(result.all())
+
+
+async def top_buyers(db: AsyncSession, limit: int = 10):
+    result = await db.execute(top_buyers_statement(limit))
+    return parse_top_buyers(result.all())
+
+
+async def full_report(db: AsyncSession, months: int, today: Optional[date] = None):
+    today = today or date.today()
+    result = await db.execute(full_report_statement(months, today))
+    return parse_full_report(result.all(), months, today)
@@ -1,11 +1,15 @@
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_async_db, get_db
 import models
 import schemas
 import os
@@ -18,14 +22,36 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated users are cached in-process by token subject (email) so the hot
+# path of every API call does not pay a users SELECT round trip. Entries are
+# detached User snapshots: read-only, so routes that modify the user must
+# re-load it in their own session. A password change in this process drops the
+# entry immediately; changes made elsewhere (scripts, other instances) take
+# effect within USER_CACHE_TTL seconds. Set it to 0 to disable the cache.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# passlib (and bcrypt behind it) is only needed to log in or change the
+# password, not to check a token, so it is imported on first use instead of on
+# every cold start.
+_pwd_context = None
+
+def password_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -47,7 +73,46 @@ def decode_token(token: str):
     except JWTError:
         return None
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _cached_user(email: str) -> Optional[models.User]:
+    with _user_cache_lock:
+        entry = _user_cache.get(email)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del _user_cache[email]
+            return None
+        return user
+
+def _cache_user(user: models.User):
+    if USER_CACHE_TTL <= 0:
+        return
+    with _user_cache_lock:
+        _user_cache[user.email] = (time.monotonic() + USER_CACHE_TTL, user)
+
+def invalidate_user_cache(email: Optional[str] = None):
+    """Drop one cached user (or all of them) after changing users rows."""
+    with _user_cache_lock:
+        if email is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(email, None)
+
+def _load_user(db: Session, email: str) -> Optional[models.User]:
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user is not None:
+        # Detach a fully loaded snapshot so it can be shared across requests.
+        db.expunge(user)
+    return user
+
+async def _load_user_async(db: AsyncSession, email: str) -> Optional[models.User]:
+    user = await db.scalar(select(models.User).where(models.User.email == email))
+    if user is not None:
+        db.expunge(user)
+    return user
+
+async def _authenticate(token: str, load_user) -> models.User:
+    """The cached user the token names, or ``await load_user(email)``."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -58,16 +123,44 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if token_data is None:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    user = _cached_user(token_data.email)
+    if user is not None:
+        return user
+
+    user = await load_user(token_data.email)
     if user is None:
         raise credentials_exception
-    
+
+    _cache_user(user)
     return user
 
-async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
-    if not current_user.is_active:
+def _check_active(user: models.User) -> models.User:
+    if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # A cache miss queries through the blocking Session: run it in the
+    # threadpool so it does not stall the event loop (and the async routes).
+    return await _authenticate(
+        token, lambda email: run_in_threadpool(_load_user, db, email)
+    )
+
+async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+    return _check_active(current_user)
+
+# For the ``async def`` routes (analytics): a cache miss loads the user through
+# the route's AsyncSession, so the request never checks out a second, blocking
+# connection just to authenticate.
+async def get_async_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+):
+    return await _authenticate(token, lambda email: _load_user_async(db, email))
+
+async def get_async_current_active_user(
+    current_user: models.User = Depends(get_async_current_user),
+):
+    return _check_active(current_user)
 
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(models.User).filter(models.User.email == email).first()
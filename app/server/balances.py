@@ -0,0 +1,257 @@
+"""Materialized per-buyer balances.
+
+``buyer_balances`` holds one row per buyer with its total sales, total payments
+and outstanding amount (``opening_balance + total_sales - total_payments``).
+The sale/payment/buyer write paths call the ``apply_*`` helpers below inside
+their own transaction, so the row is always committed together with the change
+that caused it. Reads (buyer lists, dashboard receivable, top buyers) then cost
+a single indexed lookup instead of loading every sale and payment.
+
+Increments are done in SQL (``SET total = total + :delta``) so two concurrent
+writers for the same buyer cannot lose an update. If a buyer has no row yet
+(e.g. a database created before this table existed) the row is computed from
+scratch on first write; ``python rebuild_balances.py`` backfills everything.
+Because that fallback reads the flushed state, call the helper right after
+adding/changing/deleting each row, before making the next change for the same
+buyer.
+
+The same helpers keep ``buyer_monthly_balances`` (sales and payments per buyer
+per month) current with plain delta upserts, which assume the table was
+backfilled when it was created (``migrate_add_tables.py`` does so). The ledger sums those rows for the
+balance carried forward into a date range (see ledger.py), reading at most one
+row per month of history instead of every earlier sale and payment.
+"""
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import extract, func, update
+from sqlalchemy.orm import Session
+import models
+from rollups import month_start, upsert_deltas
+
+
+def _buyer_totals(db: Session, buyer_ids=None):
+    """Compute {buyer_id: (opening, total_sales, total_payments)} from raw rows."""
+    sales = (
+        db.query(
+            models.Sale.buyer_id.label("buyer_id"),
+            func.sum(models.Sale.total_amount).label("total"),
+        )
+        .group_by(models.Sale.buyer_id)
+        .subquery()
+    )
+    payments = (
+        db.query(
+            models.Payment.buyer_id.label("buyer_id"),
+            func.sum(models.Payment.amount).label("total"),
+        )
+        .group_by(models.Payment.buyer_id)
+        .subquery()
+    )
+    query = (
+        db.query(
+            models.Buyer.id,
+            func.coalesce(models.Buyer.opening_balance, 0),
+            func.coalesce(sales.c.total, 0),
+            func.coalesce(payments.c.total, 0),
+        )
+        .outerjoin(sales, sales.c.buyer_id == models.Buyer.id)
+        .outerjoin(payments, payments.c.buyer_id == models.Buyer.id)
+    )
+    if buyer_ids is not None:
+        query = query.filter(models.Buyer.id.in_(buyer_ids))
+    return {row[0]: (row[1], row[2], row[3]) for row in query.all()}
+
+
+def _insert_computed(db: Session, buyer_id: int):
+    db.flush()  # make pending sales/payments visible to the aggregate
+    totals = _buyer_totals(db, [buyer_id]).get(buyer_id)
+    if totals is None:
+        return
+    opening, total_sales, total_payments = totals
+    db.add(
+        models.BuyerBalance(
+            buyer_id=buyer_id,
+            total_sales=total_sales,
+            total_payments=total_payments,
+            outstanding=opening + total_sales - total_payments,
+        )
+    )
+    db.flush()
+
+
+def _increment(db: Session, buyer_id: int, sales=0, payments=0, opening=0):
+    if not (sales or payments or opening):
+        return
+    result = db.execute(
+        update(models.BuyerBalance)
+        .where(models.BuyerBalance.buyer_id == buyer_id)
+        .values(
+            total_sales=models.BuyerBalance.total_sales + sales,
+            total_payments=models.BuyerBalance.total_payments + payments,
+            outstanding=models.BuyerBalance.outstanding + opening + sales - payments,
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+    if result.rowcount == 0:
+        _insert_computed(db, buyer_id)
+
+
+def _apply_month(db: Session, buyer_id: int, day, sales=0, payments=0):
+    upsert_deltas(
+        db,
+        models.BuyerMonthlyBalance,
+        {"buyer_id": buyer_id, "month": month_start(day)},
+        {"sales": sales, "payments": payments},
+    )
+
+
+def init_balance(db: Session, buyer: models.Buyer):
+    """Create the balance row for a newly added buyer."""
+    db.flush()
+    buyer.balance = models.BuyerBalance(
+        buyer_id=buyer.id,
+        total_sales=0,
+        total_payments=0,
+        outstanding=buyer.opening_balance or 0,
+    )
+
+
+def apply_sale(db: Session, sale: models.Sale, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a sale's amount from its buyer's totals."""
+    amount = sign * (sale.total_amount or 0)
+    _increment(db, sale.buyer_id, sales=amount)
+    _apply_month(db, sale.buyer_id, sale.date, sales=amount)
+
+
+def apply_payment(db: Session, payment: models.Payment, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a payment from its buyer's totals."""
+    amount = sign * (payment.amount or 0)
+    _increment(db, payment.buyer_id, payments=amount)
+    _apply_month(db, payment.buyer_id, payment.date, payments=amount)
+
+
+def move_sale(db: Session, sale: models.Sale, old_buyer_id: int, old_date):
+    """Move a sale's amount from ``old_buyer_id`` / ``old_date`` to its current
+    buyer and date."""
+    amount = sale.total_amount or 0
+    if sale.buyer_id != old_buyer_id:
+        _increment(db, old_buyer_id, sales=-amount)
+        _increment(db, sale.buyer_id, sales=amount)
+    _apply_month(db, old_buyer_id, old_date, sales=-amount)
+    _apply_month(db, sale.buyer_id, sale.date, sales=amount)
+
+
+def apply_opening_balance_change(db: Session, buyer_id: int, delta: Decimal):
+    """Shift a buyer's outstanding amount after its opening balance changed."""
+    _increment(db, buyer_id, opening=delta)
+
+
+def apply_totals(db: Session, sales_by_month: dict, payments_by_month: dict):
+    """Apply sale/payment sums keyed by ``(buyer_id, month)`` in one pass (e.g.
+    after a bulk insert).
+
+    The rows the sums came from must already be inserted, for the same reason
+    as the per-row helpers.
+    """
+    db.flush()
+    sales_by_buyer, payments_by_buyer = {}, {}
+    for (buyer_id, month), amount in sales_by_month.items():
+        sales_by_buyer[buyer_id] = sales_by_buyer.get(buyer_id, 0) + amount
+    for (buyer_id, month), amount in payments_by_month.items():
+        payments_by_buyer[buyer_id] = payments_by_buyer.get(buyer_id, 0) + amount
+
+    for buyer_id in sorted(set(sales_by_buyer) | set(payments_by_buyer)):
+        _increment(
+            db,
+            buyer_id,
+            sales=sales_by_buyer.get(buyer_id, 0),
+            payments=payments_by_buyer.get(buyer_id, 0),
+        )
+    for buyer_id, month in sorted(set(sales_by_month) | set(payments_by_month)):
+        _apply_month(
+            db,
+            buyer_id,
+            month,
+            sales=sales_by_month.get((buyer_id, month), 0),
+            payments=payments_by_month.get((buyer_id, month), 0),
+        )
+
+
+def _monthly_totals(db: Session):
+    """Compute {(buyer_id, month): (sales, payments)} from the raw rows."""
+    totals = {}
+    for model, amount, index in (
+        (models.Sale, models.Sale.total_amount, 0),
+        (models.Payment, models.Payment.amount, 1),
+    ):
+        year = extract("year", model.date)
+        month = extract("month", model.date)
+        rows = (
+            db.query(model.buyer_id, year, month, func.sum(amount))
+            .group_by(model.buyer_id, year, month)
+            .all()
+        )
+        for buyer_id, row_year, row_month, total in rows:
+            key = (buyer_id, date(int(row_year), int(row_month), 1))
+            pair = totals.setdefault(key, [0, 0])
+            pair[index] += total or 0
+    return {key: tuple(pair) for key, pair in totals.items()}
+
+
+def rebuild_balances(db: Session) -> int:
+    """Recompute every buyer's balance rows from the raw tables. Returns the
+    number of buyers."""
+    totals = _buyer_totals(db)
+    monthly = _monthly_totals(db)
+    db.query(models.BuyerBalance).delete()
+    db.query(models.BuyerMonthlyBalance).delete()
+    db.add_all(
+        models.BuyerMonthlyBalance(
+            buyer_id=buyer_id, month=month, sales=sales, payments=payments
+        )
+        for (buyer_id, month), (sales, payments) in monthly.items()
+    )
+    db.add_all(
+        models.BuyerBalance(
+            buyer_id=buyer_id,
+            total_sales=total_sales,
+            total_payments=total_payments,
+            outstanding=opening + total_sales - total_payments,
+        )
+        for buyer_id, (opening, total_sales, total_payments) in totals.items()
+    )
+    db.commit()
+    return len(totals)
+
+
+def verify_balances(db: Session, tolerance: Decimal = Decimal(0)):
+    """Compare stored balances with freshly computed ones.
+
+    Returns a list of ``(buyer_id, stored, expected)`` tuples for every buyer
+    whose stored row is missing or off by more than ``tolerance``, followed by
+    ``(buyer_id, (month, *stored), (month, *expected))`` for each wrong month.
+    """
+    stored = {
+        row.buyer_id: (row.total_sales, row.total_payments, row.outstanding)
+        for row in db.query(models.BuyerBalance).all()
+    }
+    mismatches = []
+    for buyer_id, (opening, total_sales, total_payments) in _buyer_totals(db).items():
+        expected = (total_sales, total_payments, opening + total_sales - total_payments)
+        actual = stored.get(buyer_id)
+        if actual is None or any(
+            abs(a - e) > tolerance for a, e in zip(actual, expected)
+        ):
+            mismatches.append((buyer_id, actual, expected))
+
+    stored_monthly = {
+        (row.buyer_id, row.month): (row.sales, row.payments)
+        for row in db.query(models.BuyerMonthlyBalance).all()
+    }
+    expected_monthly = _monthly_totals(db)
+    for buyer_id, month in sorted(set(stored_monthly) | set(expected_monthly)):
+        actual = stored_monthly.get((buyer_id, month), (0, 0))
+        expected = expected_monthly.get((buyer_id, month), (0, 0))
+        if any(abs(a - e) > tolerance for a, e in zip(actual, expected)):
+            mismatches.append((buyer_id, (month, *actual), (month, *expected)))
+    return mismatches
@@ -0,0 +1,663 @@
+"""Benchmark every API route against a generated dataset.
+
+    python benchmark.py run --database-url sqlite:///bench.db --out before.json
+    python benchmark.py run --database-url sqlite:///bench.db --reuse --out after.json
+    python benchmark.py compare before.json after.json
+
+``run`` creates the tables in the given database and fills them with
+seed_demo.py's deterministic dataset (``--preset``, default ``medium``, the
+volume overrides such as ``--sales``, and ``--seed``). ``--reuse`` keeps a
+dataset from an earlier run, so several commits can be measured against the
+same data. It then drives each endpoint in turn with ``--concurrency``
+concurrent clients until ``--requests`` requests have been made, and writes a
+JSON report. For every endpoint the report holds p50/p95/p99/max latency,
+throughput, errors, SQL statements and DB time per request (from the
+``Server-Timing`` header, see instrumentation.py) and the peak Python
+allocation of one request (a separate ``tracemalloc`` pass, so tracing does
+not skew the latencies). Streamed
+responses (exports, the NDJSON ledger) send that header before their body, so
+their statement counts stop at the first byte.
+
+Requests go straight to the ASGI app in this process, with no sockets or HTTP
+parser, so the numbers are the server's own cost plus the database round
+trips. Point ``--database-url`` at a throwaway local PostgreSQL to include real
+network/driver behaviour. Never point it at a database you care about: ``run``
+writes to it. ``--no-cache`` disables the analytics response cache.
+
+``compare`` prints the change per endpoint and exits with status 1 when any p95
+grew by more than ``--threshold`` (default 25%) or any endpoint issues more
+statements than before.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+BENCH_USER = "bench@kastbhanjan.local"
+DEFAULT_DATABASE_URL = "sqlite:///bench.db"
+
+SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+# ============== DATASET ==============
+def _ensure_user(db):
+    import models
+    from auth import get_password_hash
+
+    if not db.query(models.User).filter(models.User.email == BENCH_USER).first():
+        db.add(
+            models.User(
+                email=BENCH_USER,
+                hashed_password=get_password_hash("bench"),
+                full_name="Benchmark",
+                is_active=True,
+                is_admin=True,
+            )
+        )
+        db.commit()
+
+
+def _row_counts(db):
+    import models
+
+    return {
+        model.__tablename__: db.query(model).count()
+        for model in (
+            models.ProductType,
+            models.Buyer,
+            models.Sale,
+            models.SaleItem,
+            models.Payment,
+            models.Purchase,
+            models.Expense,
+        )
+    }
+
+
+def _sample_ids(db, model, limit=1000):
+    return [row[0] for row in db.query(model.id).order_by(model.id).limit(limit)]
+
+
+# ============== REQUESTS ==============
+def _multipart(field, filename, content: bytes):
+    boundary = "benchmarkboundary"
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+    ).encode()
+    body += content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def build_endpoints(ids, rng):
+    """(name, method, path factory, body factory) for every route in main.py.
+
+    Factories take no arguments and draw ids from ``ids`` with ``rng``, so each
+    request hits a different row (deterministically).
+    """
+    today = date.today()
+    month_ago = (today - timedelta(days=30)).isoformat()
+
+    def pick(kind):
+        return lambda: rng.choice(ids[kind])
+
+    def path(template, **fields):
+        return lambda: template.format(**{k: f() for k, f in fields.items()})
+
+    def json_body(factory):
+        return lambda: (json.dumps(factory()).encode(), "application/json")
+
+    buyer, sale, purchase, expense, product = (
+        pick("buyers"),
+        pick("sales"),
+        pick("purchases"),
+        pick("expenses"),
+        pick("product_types"),
+    )
+
+    def new_sale():
+        return {
+            "date": today.isoformat(),
+            "buyer_id": buyer(),
+            "payment_type": "Partial",
+            "payment_received_now": 100,
+            "sale_items": [
+                {"product_type_id": product(), "quantity": 120.5, "price_per_unit": 14}
+            ],
+        }
+
+    def new_payment():
+        return {"date": today.isoformat(), "buyer_id": buyer(), "amount": 500}
+
+    def new_purchase():
+        return {
+            "date": today.isoformat(),
+            "seller_name": "Bench Seller",
+            "quantity": 900,
+            "price_per_unit": 11.5,
+            "transport_cost": 300,
+        }
+
+    def new_expense():
+        return {"date": today.isoformat(), "category": "Labour", "amount": 750}
+
+    def mutation_batch():
+        # 20 queued entries, as a phone replays them after losing signal
+        operations = []
+        for _ in range(5):
+            for op, factory in (
+                ("create_sale", new_sale),
+                ("create_purchase", new_purchase),
+                ("add_payment", new_payment),
+                ("create_expense", new_expense),
+            ):
+                # Fresh keys: seeded ones would replay on a --reuse'd dataset
+                key = uuid.uuid4().hex
+                operations.append({"idempotency_key": key, "op": op, "data": factory()})
+        return {"operations": operations}
+
+    def dashboard_batch():
+        # What the dashboard screen loads
+        paths = (
+            "/api/analytics/dashboard-summary",
+            "/api/analytics/monthly-stats?months=12",
+            "/api/analytics/product-sales",
+            "/api/analytics/top-buyers",
+            "/api/product-types",
+            "/api/buyers/list",
+        )
+        return {"requests": [{"path": p} for p in paths]}
+
+    def import_file():
+        rows = "".join(f"{today.isoformat()},{buyer()},250\n" for _ in range(20))
+        return _multipart(
+            "file", "payments.csv", f"date,buyer_id,amount\n{rows}".encode()
+        )
+
+    def login():
+        body = f"username={BENCH_USER}&password=bench".encode()
+        return body, "application/x-www-form-urlencoded"
+
+    get = "GET"
+    return [
+        ("GET /health", get, path("/health"), None),
+        ("POST /api/auth/login", "POST", path("/api/auth/login"), login),
+        ("GET /api/auth/me", get, path("/api/auth/me"), None),
+        ("GET /api/product-types", get, path("/api/product-types"), None),
+        (
+            "GET /api/product-types/{id}",
+            get,
+            path("/api/product-types/{id}", id=product),
+            None,
+        ),
+        ("GET /api/purchases", get, path("/api/purchases"), None),
+        ("GET /api/purchases?cursor=", get, path("/api/purchases?cursor="), None),
+        (
+            "GET /api/purchases/{id}",
+            get,
+            path("/api/purchases/{id}", id=purchase),
+            None,
+        ),
+        (
+            "GET /api/purchases/stats/today",
+            get,
+            path("/api/purchases/stats/today"),
+            None,
+        ),
+        ("GET /api/sales", get, path("/api/sales"), None),
+        ("GET /api/sales?cursor=", get, path("/api/sales?cursor="), None),
+        ("GET /api/sales/{id}", get, path("/api/sales/{id}", id=sale), None),
+        ("GET /api/sales/stats/today", get, path("/api/sales/stats/today"), None),
+        ("GET /api/buyers", get, path("/api/buyers"), None),
+        ("GET /api/buyers?search=", get, path("/api/buyers?search=12"), None),
+        ("GET /api/buyers/list", get, path("/api/buyers/list"), None),
+        ("GET /api/buyers/{id}", get, path("/api/buyers/{id}", id=buyer), None),
+        (
+            "GET /api/buyers/{id}/ledger",
+            get,
+            path("/api/buyers/{id}/ledger", id=buyer),
+            None,
+        ),
+        (
+            "GET /api/buyers/{id}/ledger?limit=",
+            get,
+            path("/api/buyers/{id}/ledger?limit=50", id=buyer),
+            None,
+        ),
+        (
+            "GET /api/buyers/{id}/ledger/stream",
+            get,
+            path("/api/buyers/{id}/ledger/stream", id=buyer),
+            None,
+        ),
+        (
+            "GET /api/buyers/{id}/payments",
+            get,
+            path("/api/buyers/{id}/payments", id=buyer),
+            None,
+        ),
+        ("GET /api/expenses", get, path("/api/expenses"), None),
+        ("GET /api/expenses/{id}", get, path("/api/expenses/{id}", id=expense), None),
+        ("GET /api/expenses/stats/today", get, path("/api/expenses/stats/today"), None),
+        (
+            "GET /api/expenses/stats/by-category",
+            get,
+            path("/api/expenses/stats/by-category"),
+            None,
+        ),
+        (
+            "GET /api/analytics/dashboard-summary",
+            get,
+            path("/api/analytics/dashboard-summary"),
+            None,
+        ),
+        (
+            "GET /api/analytics/monthly-stats",
+            get,
+            path("/api/analytics/monthly-stats?months=12"),
+            None,
+        ),
+        (
+            "GET /api/analytics/product-sales",
+            get,
+            path("/api/analytics/product-sales"),
+            None,
+        ),
+        (
+            "GET /api/analytics/product-sales?start_date=",
+            get,
+            path(f"/api/analytics/product-sales?start_date={month_ago}"),
+            None,
+        ),
+        ("GET /api/analytics/top-buyers", get, path("/api/analytics/top-buyers"), None),
+        (
+            "GET /api/analytics/full-report",
+            get,
+            path("/api/analytics/full-report"),
+            None,
+        ),
+        (
+            "GET /api/export/purchases",
+            get,
+            path(f"/api/export/purchases?start_date={month_ago}"),
+            None,
+        ),
+        (
+            "GET /api/export/sales",
+            get,
+            path(f"/api/export/sales?start_date={month_ago}"),
+            None,
+        ),
+        (
+            "GET /api/export/expenses",
+            get,
+            path(f"/api/export/expenses?start_date={month_ago}"),
+            None,
+        ),
+        (
+            "GET /api/export/buyers/{id}/ledger",
+            get,
+            path("/api/export/buyers/{id}/ledger", id=buyer),
+            None,
+        ),
+        (
+            "GET /api/sync?since=",
+            get,
+            path("/api/sync?since={token}", token=pick("sync_tokens")),
+            None,
+        ),
+        ("GET /api/search/suggest?q=ra", get, path("/api/search/suggest?q=ra"), None),
+        (
+            "GET /api/search/suggest?q=pate&kind=buyer",
+            get,
+            path("/api/search/suggest?q=pate&kind=buyer"),
+            None,
+        ),
+        ("GET /api/_metrics", get, path("/api/_metrics"), None),
+        ("POST /api/batch", "POST", path("/api/batch"), json_body(dashboard_batch)),
+        ("POST /api/sales", "POST", path("/api/sales"), json_body(new_sale)),
+        (
+            "POST /api/buyers/{id}/payments",
+            "POST",
+            lambda: None,  # filled from the body's buyer below
+            json_body(new_payment),
+        ),
+        (
+            "POST /api/purchases",
+            "POST",
+            path("/api/purchases"),
+            json_body(new_purchase),
+        ),
+        ("POST /api/expenses", "POST", path("/api/expenses"), json_body(new_expense)),
+        (
+            "POST /api/batch-mutations",
+            "POST",
+            path("/api/batch-mutations"),
+            json_body(mutation_batch),
+        ),
+        (
+            "POST /api/import/payments",
+            "POST",
+            path("/api/import/payments"),
+            import_file,
+        ),
+    ]
+
+
+async def asgi_request(app, method, target, headers, body=b""):
+    """Send one request to ``app`` over ASGI; returns (status, headers, size)."""
+    path, _, query = target.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Streaming responses watch for a disconnect that never comes; they
+        # cancel this wait themselves once the body is complete.
+        await asyncio.get_running_loop().create_future()
+
+    status, response_headers, size = None, {}, 0
+
+    async def send(message):
+        nonlocal status, response_headers, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = {
+                k.decode().lower(): v.decode() for k, v in message.get("headers", [])
+            }
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, size
+
+
+def _request_for(endpoint, token):
+    name, method, make_path, make_body = endpoint
+    headers = {"authorization": f"Bearer {token}"}
+    body = b""
+    if make_body is not None:
+        body, content_type = make_body()
+        headers["content-type"] = content_type
+        headers["content-length"] = str(len(body))
+    target = make_path()
+    if target is None:  # POST /api/buyers/{id}/payments takes the body's buyer
+        target = f"/api/buyers/{json.loads(body)['buyer_id']}/payments"
+    return method, target, headers, body
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return round(sorted_values[rank - 1], 2)
+
+
+async def _measure(app, endpoint, token, requests, concurrency):
+    latencies, statements, db_ms, errors, sizes = [], [], [], 0, []
+    remaining = requests
+
+    async def client():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, target, headers, body = _request_for(endpoint, token)
+            start = time.perf_counter()
+            status, response_headers, size = await asgi_request(
+                app, method, target, headers, body
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(size)
+            if status >= 400:
+                errors += 1
+            timing = SERVER_TIMING.search(response_headers.get("server-timing", ""))
+            if timing:
+                db_ms.append(float(timing.group(1)))
+                statements.append(int(timing.group(2)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": round(latencies[-1], 2),
+        "avg_statements": round(sum(statements) / len(statements), 2)
+        if statements
+        else None,
+        "avg_db_ms": round(sum(db_ms) / len(db_ms), 2) if db_ms else None,
+        "avg_response_bytes": round(sum(sizes) / len(sizes)),
+    }
+
+
+async def _peak_alloc_kb(app, endpoint, token):
+    """Peak Python allocation while serving one request (tracemalloc)."""
+    gc.collect()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await asgi_request(app, *_request_for(endpoint, token))
+    return round((tracemalloc.get_traced_memory()[1] - baseline) / 1024, 1)
+
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+# ============== COMMANDS ==============
+def run(args):
+    from database import Base, SessionLocal, engine
+    import models
+    import seed_demo
+    from sqlalchemy import func, select
+    from auth import create_access_token
+    from main import app
+    from routers.sync import SYNC_OVERLAP, encode_token
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.reuse and db.query(models.Sale.id).first() is not None:
+            print("✓ Reusing the existing dataset")
+        else:
+            if db.query(models.Buyer.id).first() is not None:
+                print("✗ Database already has data; pass --reuse or use a fresh one.")
+                sys.exit(1)
+            start = time.perf_counter()
+            sizes = seed_demo.sizes_from_args(args)
+            generated = seed_demo.generate(db, sizes, args.seed)
+            elapsed = time.perf_counter() - start
+            print(f"✓ Generated {sum(generated.values()):,} rows in {elapsed:.1f}s")
+        _ensure_user(db)
+        rows = _row_counts(db)
+        ids = {
+            "buyers": _sample_ids(db, models.Buyer),
+            "sales": _sample_ids(db, models.Sale),
+            "purchases": _sample_ids(db, models.Purchase),
+            "expenses": _sample_ids(db, models.Expense),
+            "product_types": _sample_ids(db, models.ProductType),
+            # A delta sync whose window (token - overlap) starts now, past the
+            # freshly generated rows: it returns what the timed POSTs write
+            "sync_tokens": [encode_token(db.scalar(select(func.now())) + SYNC_OVERLAP)],
+        }
+    finally:
+        db.close()
+
+    token = create_access_token({"sub": BENCH_USER})
+    endpoints = build_endpoints(ids, random.Random(args.seed))
+    if args.only:
+        endpoints = [e for e in endpoints if args.only in e[0]]
+
+    async def measure_all():
+        results = {}
+        for endpoint in endpoints:
+            # One untimed request first: warms the user cache, lazy imports and
+            # the connection pool so they don't land in the first percentile.
+            await asgi_request(app, *_request_for(endpoint, token))
+            results[endpoint[0]] = await _measure(
+                app, endpoint, token, args.requests, args.concurrency
+            )
+            result = results[endpoint[0]]
+            print(
+                f"{'✗' if result['errors'] else '✓'} {endpoint[0]}: "
+                f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                f"p99={result['p99_ms']}ms queries={result['avg_statements']}"
+            )
+        if not args.skip_memory:
+            tracemalloc.start()
+            try:
+                for endpoint in endpoints:
+                    results[endpoint[0]]["peak_alloc_kb"] = await _peak_alloc_kb(
+                        app, endpoint, token
+                    )
+            finally:
+                tracemalloc.stop()
+        return results
+
+    results = asyncio.run(measure_all())
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "rows": rows,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "analytics_cache": not args.no_cache,
+            "max_rss_mb": _max_rss_mb(),
+        },
+        "endpoints": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.out}")
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"{base['meta'].get('commit')} -> {head['meta'].get('commit')}")
+    # Rows written by an earlier run's POSTs are fine; a different seed or
+    # database is not a like-for-like comparison.
+    for field in ("database", "seed"):
+        if base["meta"].get(field) != head["meta"].get(field):
+            print(f"! The reports were made with different {field} settings.")
+
+    regressions = 0
+    for name in sorted(set(base["endpoints"]) & set(head["endpoints"])):
+        old, new = base["endpoints"][name], head["endpoints"][name]
+        change = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0
+        more_queries = (new["avg_statements"] or 0) > (old["avg_statements"] or 0)
+        bad = change > args.threshold or more_queries
+        regressions += bad
+        print(
+            f"{'✗' if bad else '✓'} {name}: p95 {old['p95_ms']} -> {new['p95_ms']}ms "
+            f"({change:+.0%}), p99 {old['p99_ms']} -> {new['p99_ms']}ms, "
+            f"queries {old['avg_statements']} -> {new['avg_statements']}"
+        )
+
+    print(f"\n{regressions} regression(s).")
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    # database.py and cache.py read their settings when first imported, and
+    # seed_demo (needed for the arguments) imports database, so these two
+    # options are applied before anything else is parsed.
+    early = argparse.ArgumentParser(add_help=False)
+    early.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    early.add_argument("--no-cache", action="store_true")
+    settings, _ = early.parse_known_args()
+    os.environ["DATABASE_URL"] = settings.database_url
+    if settings.no_cache:
+        os.environ["CACHE_MAX_ENTRIES"] = "0"
+    import seed_demo
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate data and measure")
+    run_parser.add_argument(
+        "--database-url", default=DEFAULT_DATABASE_URL, help="throwaway database"
+    )
+    run_parser.add_argument("--out", default="benchmark.json")
+    run_parser.add_argument("--reuse", action="store_true")
+    seed_demo.add_size_arguments(run_parser, default_preset="medium")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--requests", type=int, default=100)
+    run_parser.add_argument("--only", help="measure only endpoints containing this")
+    run_parser.add_argument("--no-cache", action="store_true")
+    run_parser.add_argument("--skip-memory", action="store_true")
+
+    compare_parser = commands.add_parser("compare", help="diff two reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.25)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
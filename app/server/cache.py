@@ -0,0 +1,147 @@
+"""Response cache for the read-only report routes.
+
+Values are stored as JSON text under ``route?params|etag`` keys. The ETag
+comes from ``data_versions`` (see etags.py), which every committing write
+bumps for the tables it touched. A write therefore moves every dependent
+report to a new key, and the stale entries are never read again; they age out
+of the LRU (or expire in Redis). No router has to remember to invalidate
+anything, and it stays correct across several server instances sharing one
+Redis.
+
+The backend is chosen by ``CACHE_URL``:
+
+- unset or ``memory://``: an in-process LRU of ``CACHE_MAX_ENTRIES`` (default
+  256) entries. It is per instance, which suits warm serverless functions.
+- ``redis://host:port/db``: any Redis-compatible server. This needs the
+  optional ``redis`` package, which is not in requirements.txt.
+
+Hits and misses are counted per instance and served by ``GET /api/_metrics``.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # seconds; Redis only
+
+
+class CacheBackend:
+    """Minimal interface a cache backend implements (values are str).
+
+    The methods are coroutines so a network backend never blocks the event
+    loop the report routes run on."""
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str):
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Thread-safe in-process LRU."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend(CacheBackend):
+    """Redis (or any server speaking its protocol) shared by all instances."""
+
+    PREFIX = "kastbhanjan:cache:"
+
+    def __init__(self, url: str, ttl: int = CACHE_TTL):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "CACHE_URL points at Redis but the redis package is not installed"
+            ) from e
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    async def get(self, key):
+        return await self._client.get(self.PREFIX + key)
+
+    async def set(self, key, value):
+        await self._client.set(self.PREFIX + key, value, ex=self.ttl)
+
+
+def _create_backend(url: str) -> CacheBackend:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return MemoryBackend()
+
+
+backend = _create_backend(CACHE_URL)
+
+_hits = 0
+_misses = 0
+_stats_lock = threading.Lock()
+
+
+def _count(hit: bool):
+    global _hits, _misses
+    with _stats_lock:
+        if hit:
+            _hits += 1
+        else:
+            _misses += 1
+
+
+def request_key(request: Request) -> str:
+    """Route, sorted query parameters and the data version of the request."""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{params}|{request.state.etag}"
+
+
+async def cached(request: Request, compute: Callable[[], Awaitable]):
+    """Return the cached result for ``request``, or ``await compute()`` and
+    cache it. The route must declare ``etags.conditional`` for its tables."""
+    key = request_key(request)
+    value = await backend.get(key)
+    _count(value is not None)
+    if value is not None:
+        return json.loads(value)
+    result = await compute()
+    await backend.set(key, json.dumps(jsonable_encoder(result)))
+    return result
+
+
+def stats() -> dict:
+    with _stats_lock:
+        hits, misses = _hits, _misses
+    total = hits + misses
+    return {
+        "backend": type(backend).__name__,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 3) if total else None,
+    }
+
+
+def reset_stats():
+    global _hits, _misses
+    with _stats_lock:
+        _hits = _misses = 0
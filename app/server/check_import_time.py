@@ -0,0 +1,135 @@
+"""Measure the cold start of the API and fail when it exceeds its budget.
+
+Runs a fresh interpreter twice: once with ``-X importtime`` to see what
+``import main`` loads, and once to time the import plus the first requests.
+Neither needs a database. Run from the app/server directory:
+
+    python check_import_time.py
+    python check_import_time.py --import-budget 600 --cold-start-budget 1000
+
+Budgets (milliseconds; also ``IMPORT_BUDGET_MS`` / ``COLD_START_BUDGET_MS``):
+
+- import: ``import main``, what Vercel runs before the first request.
+- cold start: that import plus the first ``/api`` response, which includes
+  loading the route's router (see lazy_routers.py).
+
+It also fails if ``import main`` loads a module that should only load on
+demand (``DEFERRED``): the routers, the password hasher and the database
+driver.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+DEFERRED = ("routers.", "passlib", "bcrypt", "psycopg", "jose")
+
+# Measured on a development machine (CPython 3.11): import ~630 ms (it was
+# ~1,080 ms with every router imported up front) and ~920 ms to the first /api
+# response. The defaults leave headroom for slower CI and function hosts.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "900"))
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "1300"))
+
+COLD_START = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+from benchmark import asgi_request
+imported = time.perf_counter()
+asyncio.run(asgi_request(main.app, "GET", "/health", {}))
+health = time.perf_counter()
+# No token: answers 401, but only after the products router has loaded.
+asyncio.run(asgi_request(main.app, "GET", "/api/product-types", {}))
+api = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "health_ms": (health - imported) * 1000,
+    "first_api_ms": (api - health) * 1000,
+}))
+"""
+
+
+def _python(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+
+
+def import_profile():
+    """Modules loaded by ``import main`` and its direct imports, as
+    ``(names, [(cumulative_us, name), ...])``."""
+    result = _python("-X", "importtime", "-c", "import main")
+    if result.returncode:
+        raise RuntimeError(result.stderr)
+    # Children are printed before their parent, one indent level deeper.
+    names, direct = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0 and name != "main":
+            names, direct = [], []  # loaded by the interpreter, not by main
+            continue
+        names.append(name)
+        if depth == 1:
+            direct.append((int(cumulative), name))
+    return names, sorted(direct, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--cold-start-budget", type=float, default=COLD_START_BUDGET_MS)
+    args = parser.parse_args()
+
+    failed = False
+    try:
+        modules, direct = import_profile()
+        print("Heaviest imports of main:")
+        for cumulative, name in direct[:8]:
+            print(f"  {name:<28} {cumulative / 1000:7.1f} ms")
+
+        eager = sorted(name for name in modules if name.startswith(DEFERRED))
+        if eager:
+            failed = True
+            print(f"✗ Loaded at import instead of on demand: {', '.join(eager)}")
+        else:
+            print("✓ Routers, password hasher and DB driver load on demand")
+
+        result = _python("-c", COLD_START)
+        if result.returncode:
+            raise RuntimeError(result.stderr)
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        cold_start = timings["import_ms"] + timings["health_ms"]
+        cold_start += timings["first_api_ms"]
+
+        for label, value, budget in (
+            ("import main", timings["import_ms"], args.import_budget),
+            ("cold start to first /api response", cold_start, args.cold_start_budget),
+        ):
+            ok = value <= budget
+            failed = failed or not ok
+            print(
+                f"{'✓' if ok else '✗'} {label}: {value:.0f} ms (budget {budget:.0f} ms)"
+            )
+        print(
+            f"  first /health {timings['health_ms']:.0f} ms, "
+            f"first /api (router load) {timings['first_api_ms']:.0f} ms"
+        )
+    except Exception as e:
+        print(f"✗ Could not measure: {e}")
+        sys.exit(1)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
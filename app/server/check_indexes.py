@@ -0,0 +1,187 @@
+"""EXPLAIN-based check that the list endpoints' queries are served by indexes.
+
+Calls each filtered list endpoint directly against DATABASE_URL, captures every
+SQL statement it emits, and runs EXPLAIN on each one. A statement fails the
+check if its plan reads any table without an index (a sequential scan).
+
+On PostgreSQL ``enable_seqscan`` is switched off for the EXPLAIN session, so
+small development tables still report the index the planner *would* use at
+scale; a statement that still shows a Seq Scan has no usable index at all.
+ILIKE searches are only checked on PostgreSQL (they rely on pg_trgm).
+
+    python check_indexes.py       # exits with status 1 if any query fails
+"""
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fastapi import Response
+from sqlalchemy import event, func, select
+from database import Base, SessionLocal, engine
+import models
+from routers import buyers, expenses, purchases, sales, sync
+
+
+# Small lookup tables that are read whole on purpose (the sync API sends every
+# product type).
+FULL_READS = {"product_types"}
+
+
+def _cases(db, is_postgres):
+    today = date.today()
+    since = today - timedelta(days=90)
+    buyer = db.query(models.Buyer).first()
+    buyer_id = buyer.id if buyer else None
+
+    cases = [
+        (
+            "sales: latest",
+            lambda: sales.get_sales(db=db),
+        ),
+        (
+            "sales: buyer + date range",
+            lambda: sales.get_sales(
+                start_date=since, end_date=today, buyer_id=buyer_id, db=db
+            ),
+        ),
+        (
+            "sales: payment type",
+            lambda: sales.get_sales(payment_type=models.PaymentType.CREDIT, db=db),
+        ),
+        (
+            "purchases: date range",
+            lambda: purchases.get_purchases(start_date=since, end_date=today, db=db),
+        ),
+        (
+            "expenses: category + date range",
+            lambda: expenses.get_expenses(
+                start_date=since,
+                end_date=today,
+                category=models.ExpenseCategory.RENT,
+                db=db,
+            ),
+        ),
+        (
+            "sync: changes since",
+            lambda: sync.sync(
+                since=sync.encode_token(db.scalar(select(func.now()))), db=db
+            ),
+        ),
+    ]
+    if buyer_id is not None:  # the ledger routes 404 on an empty database
+        cases += [
+            (
+                "buyer ledger: date range",
+                lambda: buyers.get_buyer_ledger(
+                    buyer_id,
+                    start_date=since,
+                    end_date=today,
+                    limit=None,
+                    cursor=None,
+                    db=db,
+                ),
+            ),
+            (
+                "buyer ledger: page",
+                lambda: buyers.get_buyer_ledger(
+                    buyer_id, limit=50, cursor=None, response=Response(), db=db
+                ),
+            ),
+            ("buyer payments", lambda: buyers.get_buyer_payments(buyer_id, db=db)),
+        ]
+    if is_postgres:
+        cases += [
+            (
+                "purchases: seller search",
+                lambda: purchases.get_purchases(seller_name="scrap", db=db),
+            ),
+            (
+                "buyers: search",
+                lambda: buyers.get_buyers(search="pat", db=db),
+            ),
+        ]
+    return cases
+
+
+def _uses_index_postgres(conn, statement, parameters):
+    plan = conn.exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + statement, parameters
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+
+    def walk(node):
+        scans.append(node["Node Type"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return "Seq Scan" not in scans, scans
+
+
+def _uses_index_sqlite(conn, statement, parameters):
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    details = [row[-1] for row in rows]
+    # Only scans of real tables count; "SCAN CONSTANT ROW" and scans of a
+    # subquery's (already index-filtered) rows are fine.
+    full_scans = [
+        d
+        for d in details
+        if d.startswith("SCAN ")
+        and "USING" not in d
+        and d.split()[1] in Base.metadata.tables
+        and d.split()[1] not in FULL_READS
+    ]
+    return not full_scans, details
+
+
+def main():
+    is_postgres = engine.dialect.name == "postgresql"
+    check = _uses_index_postgres if is_postgres else _uses_index_sqlite
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    db = SessionLocal()
+    failures = 0
+    try:
+        cases = _cases(db, is_postgres)
+        for name, call in cases:
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                call()
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+            db.rollback()
+
+            bad = []
+            with engine.connect() as conn:
+                if is_postgres:
+                    conn.exec_driver_sql("SET enable_seqscan = off")
+                for statement, parameters in captured:
+                    ok, plan = check(conn, statement, parameters)
+                    if not ok:
+                        bad.append((statement, plan))
+
+            failures += len(bad)
+            print(f"{'✗' if bad else '✓'} {name} ({len(captured)} statement(s))")
+            for statement, plan in bad:
+                print(f"    no index used: {' '.join(statement.split())}\n    {plan}")
+    finally:
+        db.close()
+
+    print(f"\n{failures} statement(s) without an index.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Check that the sales endpoints issue a fixed number of SQL statements.
+
+Calls each endpoint directly against DATABASE_URL, serializes the result through
+its response model (which is where lazy loads would fire), and counts the
+statements emitted. Each list endpoint is run with a small and a large page; a
+statement count that grows with the page size is an N+1 and fails the check.
+
+    python check_query_counts.py   # exits with status 1 if any endpoint fails
+
+Needs a few sales in the database (e.g. after seed_demo.py) to be useful.
+"""
+import os
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from database import SessionLocal, engine
+import models
+import schemas
+from routers import sales
+
+SMALL_PAGE = 1
+LARGE_PAGE = 50
+
+
+def _count_statements(db, call, response_type):
+    """Run ``call`` in a fresh session state and return the statements it emits."""
+    db.expunge_all()
+    count = 0
+
+    def counter(conn, cursor, statement, parameters, context, executemany):
+        nonlocal count
+        count += 1
+
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        TypeAdapter(response_type).validate_python(call())
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+    db.rollback()
+    return count
+
+
+def main():
+    db = SessionLocal()
+    failures = 0
+    try:
+        sale_count = db.query(models.Sale).count()
+        if sale_count < 2:
+            print("✗ Need at least 2 sales to compare page sizes; seed data first.")
+            sys.exit(1)
+        sale_id = db.query(models.Sale.id).first()[0]
+
+        page_cases = [
+            (
+                "GET /api/sales",
+                lambda limit: sales.get_sales(limit=limit, db=db),
+            ),
+            (
+                "GET /api/sales?cursor=",
+                lambda limit: sales.get_sales(
+                    limit=limit, cursor="", response=Response(), db=db
+                ),
+            ),
+        ]
+        for name, call in page_cases:
+            small = _count_statements(
+                db, lambda: call(SMALL_PAGE), List[schemas.SaleResponse]
+            )
+            large = _count_statements(
+                db, lambda: call(LARGE_PAGE), List[schemas.SaleResponse]
+            )
+            bad = large > small
+            failures += bad
+            print(
+                f"{'✗' if bad else '✓'} {name}: {small} statement(s) at "
+                f"limit={SMALL_PAGE}, {large} at limit={LARGE_PAGE}"
+            )
+
+        detail = _count_statements(
+            db, lambda: sales.get_sale(sale_id, db=db), schemas.SaleResponse
+        )
+        print(f"✓ GET /api/sales/{{id}}: {detail} statement(s)")
+    finally:
+        db.close()
+
+    print(f"\n{failures} endpoint(s) with per-row queries.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
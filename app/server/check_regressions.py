@@ -0,0 +1,439 @@
+"""Replay API scenarios that once went wrong, and fail if one does again.
+
+Each check drives the app in-process (like benchmark.py) against a throwaway
+database: a fresh SQLite file unless ``--database-url`` names another
+throwaway database. Never point it at a database you care about: the checks
+write to it. Run from the app/server directory:
+
+    python check_regressions.py   # exits with status 1 if any check fails
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+CHECK_USER = "checks@kastbhanjan.local"
+
+_checks = []
+_failures = 0
+
+
+def check(function):
+    """Register ``function(client)`` as a check."""
+    _checks.append(function)
+    return function
+
+
+def expect(ok: bool, label: str):
+    global _failures
+    _failures += not ok
+    print(f"  {'✓' if ok else '✗'} {label}")
+
+
+class Client:
+    """Authenticated in-process requests; returns (status, headers, JSON)."""
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self.token = token
+
+    async def _request(self, method, target, body, headers):
+        path, _, query = target.partition("?")
+        headers = {"authorization": f"Bearer {self.token}", **headers}
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+            headers["content-type"] = "application/json"
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "client": ("127.0.0.1", 50000),
+            "server": ("checks", 80),
+        }
+        messages = [{"type": "http.request", "body": body or b"", "more_body": False}]
+
+        async def receive():
+            return messages.pop() if messages else {"type": "http.disconnect"}
+
+        status, response_headers, chunks = None, {}, []
+
+        async def send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = {
+                    k.decode().lower(): v.decode() for k, v in message["headers"]
+                }
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        content = b"".join(chunks)
+        return status, response_headers, json.loads(content) if content else None
+
+    def request(self, method, target, body=None, headers=None):
+        return asyncio.run(self._request(method, target, body, headers or {}))
+
+    def get(self, target, headers=None):
+        return self.request("GET", target, headers=headers)
+
+    def post(self, target, body):
+        return self.request("POST", target, body)
+
+    def upload(self, target, filename, content: bytes):
+        """POST ``content`` as the multipart field ``file``."""
+        boundary = uuid.uuid4().hex
+        body = (
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n"
+            ).encode()
+            + content
+            + f"\r\n--{boundary}--\r\n".encode()
+        )
+        return self.request(
+            "POST",
+            target,
+            body,
+            {"content-type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+
+def data_versions() -> dict:
+    import models
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        return dict(
+            db.query(models.DataVersion.table_name, models.DataVersion.version).all()
+        )
+
+
+def unique(prefix: str) -> str:
+    # Fresh names and keys, so the checks can re-run on the same database
+    return f"{prefix} {uuid.uuid4().hex[:8]}"
+
+
+def new_buyer(client) -> int:
+    return client.post("/api/buyers", {"name": unique("Check Buyer")})[2]["id"]
+
+
+def new_product_type(client) -> int:
+    return client.post("/api/product-types", {"name": unique("Check Ply")})[2]["id"]
+
+
+def sale(buyer_id, product_type_id, amount=100, received=0) -> dict:
+    return {
+        "date": date.today().isoformat(),
+        "buyer_id": buyer_id,
+        "payment_type": "Partial" if received else "Credit",
+        "payment_received_now": received,
+        "sale_items": [
+            {
+                "product_type_id": product_type_id,
+                "quantity": 1,
+                "price_per_unit": amount,
+            }
+        ],
+    }
+
+
+# ============== CHECKS ==============
+@check
+def batch_with_a_failed_operation_still_bumps_data_versions(client):
+    buyer = new_buyer(client)
+    product_type = new_product_type(client)
+    _, headers, _ = client.get("/api/sales")
+    before = data_versions()
+
+    status, _, body = client.post(
+        "/api/batch-mutations",
+        {
+            "operations": [
+                {
+                    "idempotency_key": unique("good-sale"),
+                    "op": "create_sale",
+                    "data": sale(buyer, product_type, received=20),
+                },
+                {
+                    "idempotency_key": unique("unknown-buyer"),
+                    "op": "add_payment",
+                    "data": {
+                        "date": date.today().isoformat(),
+                        "buyer_id": 999999,
+                        "amount": 5,
+                    },
+                },
+            ]
+        },
+    )
+    expect(
+        status == 200 and [r["status"] for r in body["results"]] == [201, 404],
+        "the sale is applied and the unknown buyer reported",
+    )
+    after = data_versions()
+    for table in ("sales", "sale_items", "payments", "buyer_balances"):
+        expect(
+            after.get(table, 0) > before.get(table, 0),
+            f"data_versions bumped for {table}",
+        )
+    status, _, _ = client.get("/api/sales", headers={"if-none-match": headers["etag"]})
+    expect(status == 200, "GET /api/sales no longer matches the old ETag")
+
+
+@check
+def batch_operation_failing_in_the_database_is_rolled_back_alone(client):
+    from sqlalchemy import event, exc
+    from database import engine
+
+    marker = unique("fail-in-database")
+
+    def fail(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO PAYMENTS") and (
+            marker in str(parameters)
+        ):
+            raise exc.OperationalError(statement, parameters, Exception(marker))
+
+    buyer = new_buyer(client)
+    product_type = new_product_type(client)
+    payment = {"date": date.today().isoformat(), "buyer_id": buyer, "amount": 5}
+    event.listen(engine, "before_cursor_execute", fail)
+    try:
+        status, _, body = client.post(
+            "/api/batch-mutations",
+            {
+                "operations": [
+                    {
+                        "idempotency_key": unique("good-sale"),
+                        "op": "create_sale",
+                        "data": sale(buyer, product_type, amount=50),
+                    },
+                    {
+                        "idempotency_key": unique("bad-payment"),
+                        "op": "add_payment",
+                        "data": {**payment, "notes": marker},
+                    },
+                    {
+                        "idempotency_key": unique("good-payment"),
+                        "op": "add_payment",
+                        "data": payment,
+                    },
+                ]
+            },
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", fail)
+    expect(
+        status == 200 and [r["status"] for r in body["results"]] == [201, 500, 200],
+        "the failed payment is reported and the other operations applied",
+    )
+    _, _, buyer_row = client.get(f"/api/buyers/{buyer}")
+    expect(
+        buyer_row["total_sales"] == 50 and buyer_row["total_payments"] == 5,
+        "the buyer's totals hold the sale and one payment",
+    )
+
+
+@check
+def analytics_requests_hold_one_connection(client):
+    from sqlalchemy import event
+    from auth import invalidate_user_cache
+    from database import engine, get_async_engine
+
+    checkouts = {"sync": 0, "async": 0}
+    engines = {"sync": engine, "async": get_async_engine().sync_engine}
+    listeners = {
+        name: lambda *args, name=name: checkouts.__setitem__(name, checkouts[name] + 1)
+        for name in engines
+    }
+    for name, listener in listeners.items():
+        event.listen(engines[name], "checkout", listener)
+    try:
+        invalidate_user_cache()  # the user is loaded too
+        status, _, _ = client.get("/api/analytics/dashboard-summary")
+    finally:
+        for name, listener in listeners.items():
+            event.remove(engines[name], "checkout", listener)
+    expect(
+        status == 200 and checkouts == {"sync": 0, "async": 1},
+        f"GET /api/analytics/dashboard-summary checks out {checkouts}",
+    )
+
+
+@check
+def list_pages_reject_out_of_range_limits(client):
+    for path in ("/api/sales", "/api/purchases", "/api/expenses", "/api/buyers"):
+        for query in ("cursor=&limit=0", "limit=0", "limit=-1", "skip=-1"):
+            status, _, _ = client.get(f"{path}?{query}")
+            expect(status == 422, f"GET {path}?{query} is rejected with 422")
+
+
+@check
+def imports_that_are_not_utf8_are_rejected(client):
+    csv = "date,category,amount,description\n{},Other,10,{}\n"
+    for encoding, expected in (("utf-8", 200), ("cp1252", 422)):
+        content = csv.format(date.today().isoformat(), "Café").encode(encoding)
+        status, _, body = client.upload("/api/import/expenses", "e.csv", content)
+        expect(
+            status == expected,
+            f"a {encoding} CSV import answers {expected} (got {status}: {body})",
+        )
+
+
+@check
+def product_sales_drop_products_whose_sales_were_deleted(client):
+    buyer = new_buyer(client)
+    product_type = new_product_type(client)
+    _, _, product = client.get(f"/api/product-types/{product_type}")
+    sale_id = client.post("/api/sales", sale(buyer, product_type))[2]["id"]
+    client.request("DELETE", f"/api/sales/{sale_id}")
+
+    _, _, product_sales = client.get("/api/analytics/product-sales")
+    _, _, report = client.get("/api/analytics/full-report")
+    for label, rows in (
+        ("product-sales", product_sales),
+        ("full-report", report["product_sales"]),
+    ):
+        expect(
+            product["name"] not in [row["product_name"] for row in rows],
+            f"GET /api/analytics/{label} leaves out the product",
+        )
+
+
+@check
+def migrating_to_the_checkpoint_tables_backfills_them(client):
+    import contextlib
+    import io
+    from sqlalchemy import func, select
+    import models
+    import migrate_add_tables
+    from balances import verify_balances
+    from database import SessionLocal, engine
+
+    buyer = new_buyer(client)
+    product_type = new_product_type(client)
+    client.post("/api/sales", sale(buyer, product_type, amount=80))
+    # A database from before the balance checkpoints and product rollups
+    for model in (models.BuyerMonthlyBalance, models.MonthlyProductRollup):
+        model.__table__.drop(engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate_add_tables.main()
+    payment = {"date": date.today().isoformat(), "buyer_id": buyer, "amount": 30}
+    client.post(f"/api/buyers/{buyer}/payments", payment)
+
+    with SessionLocal() as db:
+        mismatches = verify_balances(db)
+        expect(not mismatches, f"balances and checkpoints match: {mismatches}")
+        rollup = models.MonthlyProductRollup
+        kg_sold = db.scalar(
+            select(func.sum(rollup.kg_sold)).where(
+                rollup.product_type_id == product_type
+            )
+        )
+        expect(kg_sold == 1, "the product rollup holds the earlier sale")
+
+
+def _etag_changes(client, path, write, label):
+    _, headers, _ = client.get(path)
+    write()
+    status, _, _ = client.get(path, headers={"if-none-match": headers["etag"]})
+    expect(status == 200, f"GET {path} changes its ETag {label}")
+
+
+@check
+def etags_follow_the_embedded_buyer_balances(client):
+    buyer = new_buyer(client)
+    product_type = new_product_type(client)
+    client.post("/api/sales", sale(buyer, product_type, amount=150))
+    payment = {"date": date.today().isoformat(), "buyer_id": buyer, "amount": 30}
+
+    _etag_changes(
+        client,
+        "/api/sales",
+        lambda: client.post(f"/api/buyers/{buyer}/payments", payment),
+        "after a payment (embedded buyer balance)",
+    )
+    _etag_changes(
+        client,
+        f"/api/buyers/{buyer}/payments",
+        lambda: client.post("/api/sales", sale(buyer, product_type)),
+        "after a sale (embedded buyer balance)",
+    )
+
+
+@check
+def amounts_too_large_for_their_column_are_rejected(client):
+    for amount in ("1e27", "12345678901234.5"):
+        status, _, _ = client.post(
+            "/api/expenses",
+            {"date": date.today().isoformat(), "category": "Other", "amount": amount},
+        )
+        expect(status == 422, f"an expense of {amount} is rejected with 422")
+    status, _, _ = client.post(
+        "/api/purchases",
+        {
+            "date": date.today().isoformat(),
+            "seller_name": unique("Check Seller"),
+            "quantity": "123456789012.5",
+            "price_per_unit": 1,
+        },
+    )
+    expect(status == 422, "a purchase of 123456789012.5 kg is rejected with 422")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--database-url", help="throwaway database (default: new SQLite file)"
+    )
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url or (
+        "sqlite:///" + os.path.join(tempfile.mkdtemp(), "checks.db")
+    )
+    os.environ["CACHE_MAX_ENTRIES"] = "0"
+
+    import models
+    from auth import create_access_token, get_password_hash
+    from database import Base, SessionLocal, engine
+    from main import app
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        if not db.query(models.User).filter(models.User.email == CHECK_USER).first():
+            db.add(
+                models.User(
+                    email=CHECK_USER,
+                    hashed_password=get_password_hash("checks"),
+                    is_active=True,
+                )
+            )
+            db.commit()
+    client = Client(app, create_access_token({"sub": CHECK_USER}))
+
+    for function in _checks:
+        print(function.__name__.replace("_", " "))
+        try:
+            function(client)
+        except Exception as e:
+            expect(False, f"raised {type(e).__name__}: {e}")
+
+    print(f"\n{_failures} failed check(s).")
+    sys.exit(1 if _failures else 0)
+
+
+if __name__ == "__main__":
+    main()
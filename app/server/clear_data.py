@@ -10,7 +10,20 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from database import SessionLocal, engine
-from models import User, ProductType, Buyer, Purchase, Sale, SaleItem, Payment, Expense
+from models import (
+    User,
+    ProductType,
+    Buyer,
+    BuyerBalance,
+    BuyerMonthlyBalance,
+    MonthlyRollup,
+    MonthlyProductRollup,
+    Purchase,
+    Sale,
+    SaleItem,
+    Payment,
+    Expense,
+)
 
 
 def clear_all_data():
@@ -36,6 +49,12 @@ def clear_all_data():
         # Delete in order (respect foreign keys)
         print("\n=== DELETING DATA ===")
 
+        deleted = db.query(MonthlyProductRollup).delete()
+        print(f"Deleted {deleted} monthly product rollups")
+
+        deleted = db.query(MonthlyRollup).delete()
+        print(f"Deleted {deleted} monthly rollups")
+
         deleted = db.query(SaleItem).delete()
         print(f"Deleted {deleted} sale items")
 
@@ -45,11 +64,17 @@ def clear_all_data():
         deleted = db.query(Sale).delete()
         print(f"Deleted {deleted} sales")
 
+        deleted = db.query(Expense).delete()
+        print(f"Deleted {deleted} expenses")
+
         deleted = db.query(Purchase).delete()
         print(f"Deleted {deleted} purchases")
 
-        deleted = db.query(Expense).delete()
-        print(f"Deleted {deleted} expenses")
+        deleted = db.query(BuyerBalance).delete()
+        print(f"Deleted {deleted} buyer balances")
+
+        deleted = db.query(BuyerMonthlyBalance).delete()
+        print(f"Deleted {deleted} buyer monthly balances")
 
         deleted = db.query(Buyer).delete()
         print(f"Deleted {deleted} buyers")
@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine
+import threading
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
 from dotenv import load_dotenv
 
@@ -17,32 +22,365 @@ if DATABASE_URL.startswith("postgres://"):
 elif DATABASE_URL.startswith("postgresql://") and "+psycopg" not in DATABASE_URL:
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
 
-# Serverless-friendly engine for Vercel functions.
+# Connection pool profiles (DB_POOL_PROFILE).
 #
-# A Vercel function instance stays "warm" between requests and the module-level
-# engine below is reused, so we keep a SMALL connection pool instead of NullPool.
-# This lets a warm instance reuse its Postgres connection across requests rather
-# than paying the (expensive, especially cross-region) TLS + auth handshake on
-# every single request -- which is what made every DB-backed endpoint take ~2.5s.
+#  - serverless (Vercel functions): an instance stays "warm" between requests and
+#    reuses the module-level engine, so we keep a SMALL pool instead of NullPool.
+#    A warm instance then reuses its Postgres connection rather than paying the
+#    (expensive, especially cross-region) TLS + auth handshake on every request,
+#    which is what made every DB-backed endpoint take ~2.5s. pool_size=1 /
+#    max_overflow=2 since functions handle one request at a time and concurrent
+#    instances must not exhaust Neon; pool_recycle=300 drops connections before
+#    Neon's idle timeout / suspend.
+#  - server (self-hosted uvicorn/gunicorn): each worker process keeps a real
+#    pool (DB_POOL_SIZE, default 5, plus DB_MAX_OVERFLOW, default 10). Keep
+#    workers * (size + overflow) below the server's max_connections, or put
+#    pgbouncer in front and use the next profile.
+#  - pgbouncer (transaction pooling in front, e.g. Neon's "-pooler" host): the
+#    same pool sizes as server, but without prepared statements (below) and
+#    with the short recycle, since the pooler owns the real connections.
 #
-#  - pool_size=1 / max_overflow=2: tiny footprint per instance (functions handle
-#    one request at a time), so concurrent instances won't exhaust Neon.
-#  - pool_recycle=300: drop connections before Neon's idle timeout / suspend.
-#  - pool_pre_ping: replace a dead connection instead of erroring on reuse.
-#  - prepare_threshold=None: disable psycopg3 server-side prepared statements so
-#    this works whether DATABASE_URL is Neon's direct OR pooled (pgbouncer) host.
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=1,
-    max_overflow=2,
-    pool_recycle=300,
-    pool_pre_ping=True,
-    connect_args={"prepare_threshold": None},
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# DB_POOL_PROFILE=auto (the default) picks serverless on Vercel / AWS Lambda,
+# pgbouncer when the host looks like a pooler (a "-pooler" Neon host or port
+# 6432), and server otherwise. Every profile pre-pings (replacing a dead
+# connection instead of erroring on reuse).
+#
+# Prepared statements: psycopg prepares a query after PREPARE_THRESHOLD
+# executions on a connection, so hot queries skip re-planning. A transaction
+# pooler may run the next execution on a different server connection where the
+# statement doesn't exist, so they are off (prepare_threshold=None) whenever the
+# host is a pooler, in any profile. DB_PREPARED_STATEMENTS=on/off overrides
+# that, e.g. for pgbouncer >= 1.21 with max_prepared_statements set.
+#
+# A sqlite:/// URL (local experiments, benchmark.py) gets SQLAlchemy's defaults
+# instead: none of the above applies to a local file, and sqlite3 rejects the
+# psycopg-only connect argument.
+POOL_PROFILES = {
+    "serverless": dict(pool_size=1, max_overflow=2, pool_recycle=300),
+    "server": dict(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_recycle=1800,
+    ),
+    "pgbouncer": dict(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_recycle=300,
+    ),
+}
+PREPARE_THRESHOLD = 5  # psycopg's default
+
+
+def _is_pooler_host(url) -> bool:
+    return "-pooler" in (url.host or "") or url.port == 6432
+
+
+def _detect_profile(url) -> str:
+    if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return "serverless"
+    if _is_pooler_host(url):
+        return "pgbouncer"
+    return "server"
+
+
+def _pool_settings():
+    """``(profile, prepared_statements, engine options)`` for DATABASE_URL."""
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() == "sqlite":
+        return "sqlite", False, {}
+    profile = os.getenv("DB_POOL_PROFILE", "auto").lower()
+    if profile == "auto":
+        profile = _detect_profile(url)
+    elif profile not in POOL_PROFILES:
+        raise ValueError(
+            f"DB_POOL_PROFILE must be auto or one of {list(POOL_PROFILES)}"
+        )
+
+    prepared = os.getenv("DB_PREPARED_STATEMENTS", "auto").lower()
+    if prepared == "auto":
+        prepared = profile != "pgbouncer" and not _is_pooler_host(url)
+    else:
+        prepared = prepared in ("on", "true", "1")
+    options = dict(
+        POOL_PROFILES[profile],
+        pool_pre_ping=True,
+        connect_args={"prepare_threshold": PREPARE_THRESHOLD if prepared else None},
+    )
+    return profile, prepared, options
+
+
+POOL_PROFILE, PREPARED_STATEMENTS, _ENGINE_OPTIONS = _pool_settings()
+
+# The engine is created on first use (the first session, or ``database.engine``)
+# rather than at import: creating it loads the dialect and psycopg, which a cold
+# start should only pay for when a request actually needs the database.
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def _create_engine():
+    if POOL_PROFILE == "sqlite":
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL, **_ENGINE_OPTIONS)
+    _watch_pool(engine, "sync")
+    return engine
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine()
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+class _SessionFactory(sessionmaker):
+    """``sessionmaker`` that creates the engine before its first session."""
+
+    def __call__(self, **local_kw):
+        if _engine is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _SessionFactory(autocommit=False, autoflush=False)
+
+
+def __getattr__(name):
+    # ``from database import engine`` keeps working for scripts (PEP 562).
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 Base = declarative_base()
 
+# Async engine for the read-only routes declared ``async def`` (analytics).
+#
+# Those handlers run on the event loop instead of a threadpool worker, so one
+# warm instance can keep several of them in flight while each waits on Neon.
+# The async engine gets its own pool with the same profile as above.
+# postgresql+psycopg is async-capable as is. SQLite (local experiments only)
+# needs the aiosqlite driver. The engine is created on first use, so importing
+# this module never requires an async driver.
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+_async_engine = None
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        url = make_url(DATABASE_URL)
+        if url.get_backend_name() == "sqlite":
+            # aiosqlite runs without a pool; the pool settings don't apply.
+            url = url.set(drivername="sqlite+aiosqlite")
+            _async_engine = create_async_engine(url)
+        else:
+            _async_engine = create_async_engine(url, **_ENGINE_OPTIONS)
+        _watch_pool(_async_engine.sync_engine, "async")
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+# Pool utilisation for ``GET /api/_metrics``: live occupancy from the pool
+# itself plus counters kept by pool events. A "connects" count close to
+# "checkouts" means connections are not being reused (pool too small, or
+# recycled too often).
+_pool_counters = {}
+_pool_lock = threading.Lock()
+
+
+def _watch_pool(engine, label: str):
+    counters = _pool_counters[label] = {
+        "connects": 0,
+        "checkouts": 0,
+        "peak_checked_out": 0,
+    }
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        with _pool_lock:
+            counters["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out = engine.pool.checkedout() if hasattr(engine.pool, "size") else 1
+        with _pool_lock:
+            counters["checkouts"] += 1
+            counters["peak_checked_out"] = max(
+                counters["peak_checked_out"], checked_out
+            )
+
+
+def pool_status() -> dict:
+    """Pool profile and per-engine utilisation of this process."""
+    engines = {
+        "sync": _engine,
+        "async": _async_engine.sync_engine if _async_engine is not None else None,
+    }
+    status = {
+        "profile": POOL_PROFILE,
+        "prepared_statements": PREPARED_STATEMENTS,
+        "engines": {},
+    }
+    for label, engine in engines.items():
+        if engine is None:
+            continue  # not created yet in this instance
+        pool = engine.pool
+        with _pool_lock:
+            entry = {"pool": type(pool).__name__, **_pool_counters[label]}
+        if hasattr(pool, "size"):  # QueuePool and its async variant
+            capacity = pool.size() + _ENGINE_OPTIONS.get("max_overflow", 10)
+            entry.update(
+                size=pool.size(),
+                capacity=capacity,
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                utilisation=round(pool.checkedout() / capacity, 3),
+            )
+        status["engines"][label] = entry
+    return status
+
+
+# Data versions for conditional GETs (see etags.py).
+#
+# Every transaction that writes to a table bumps that table's row in
+# ``data_versions`` right before it commits, so the new version becomes visible
+# together with the data. Writes are collected from ORM flushes and from the
+# INSERT/UPDATE/DELETE statements run through a session (bulk imports,
+# ``query.delete()``, the rollup upserts), which covers every router and script
+# without each one having to remember it. The bumps are sent at commit, sorted
+# by table name, so concurrent writers take the row locks briefly and in the
+# same order. ON CONFLICT works on both PostgreSQL and SQLite.
+DATA_VERSIONS_TABLE = "data_versions"
+
+_BUMP_VERSION = text(
+    "INSERT INTO data_versions (table_name, version, updated_at) "
+    "VALUES (:table_name, 1, :now) "
+    "ON CONFLICT (table_name) DO UPDATE SET "
+    "version = data_versions.version + 1, updated_at = excluded.updated_at"
+)
+
+
+# Tombstones for the sync API (see routers/sync.py).
+#
+# Deleting a buyer, sale, payment, purchase, expense or product type records
+# (table, id) in ``deleted_rows`` in the same transaction, so clients holding a
+# replica learn about the delete. A bulk ``query.delete()`` can't say which
+# rows went, so it records the table with a NULL id, which makes the next sync
+# of every client start over from a full snapshot. ``deleted_at`` is the
+# database's transaction time, the same clock as the ``updated_at`` columns.
+# Tombstones older than TOMBSTONE_RETENTION_DAYS are pruned as new ones are
+# written; a client that hasn't synced for that long gets a full snapshot.
+TOMBSTONE_TABLES = {
+    "buyers",
+    "sales",
+    "payments",
+    "purchases",
+    "expenses",
+    "product_types",
+}
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "90"))
+
+_RECORD_TOMBSTONE = text(
+    "INSERT INTO deleted_rows (table_name, row_id, deleted_at) "
+    "VALUES (:table_name, :row_id, CURRENT_TIMESTAMP)"
+)
+_PRUNE_TOMBSTONES = text("DELETE FROM deleted_rows WHERE deleted_at < :cutoff")
+
+
+def _changed_tables(session) -> set:
+    return session.info.setdefault("changed_tables", set())
+
+
+def _tombstones(session) -> set:
+    return session.info.setdefault("tombstones", set())
+
+
+def mark_changed(session, *tables):
+    """Record writes the session can't see (e.g. COPY on the raw connection)."""
+    _changed_tables(session).update(table.name for table in tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    changed = _changed_tables(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        changed.add(obj.__table__.name)
+    for obj in session.deleted:
+        if obj.__table__.name in TOMBSTONE_TABLES:
+            _tombstones(session).add((obj.__table__.name, obj.id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        table = orm_execute_state.statement.table.name
+        _changed_tables(orm_execute_state.session).add(table)
+        if orm_execute_state.is_delete and table in TOMBSTONE_TABLES:
+            _tombstones(orm_execute_state.session).add((table, None))
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_data_versions(session):
+    if session.in_nested_transaction():
+        return  # a savepoint: the outer commit bumps for it
+    session.flush()  # the commit's own flush only runs after this hook
+    changed = session.info.pop("changed_tables", set())
+    changed.discard(DATA_VERSIONS_TABLE)
+    if changed:
+        now = datetime.now(timezone.utc)
+        session.execute(
+            _BUMP_VERSION,
+            [{"table_name": table, "now": now} for table in sorted(changed)],
+        )
+
+    tombstones = session.info.pop("tombstones", set())
+    if tombstones:
+        session.execute(
+            _RECORD_TOMBSTONE,
+            [{"table_name": table, "row_id": row_id} for table, row_id in tombstones],
+        )
+        cutoff = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+        session.execute(_PRUNE_TOMBSTONES, {"cutoff": cutoff})
+
+
+# A savepoint (``begin_nested()``) that rolls back only undoes its own writes:
+# the tables and tombstones recorded before it began are restored, so the outer
+# commit still bumps and records those.
+@event.listens_for(Session, "after_transaction_create")
+def _remember_changes(session, transaction):
+    if transaction.nested:
+        session.info.setdefault("savepoints", {})[transaction] = (
+            set(_changed_tables(session)),
+            set(_tombstones(session)),
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_savepoint(session, transaction):
+    if transaction.nested:
+        session.info.get("savepoints", {}).pop(transaction, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session):
+    savepoint = session.get_nested_transaction()
+    if savepoint is None:
+        session.info.pop("changed_tables", None)
+        session.info.pop("tombstones", None)
+        return
+    changed, tombstones = session.info["savepoints"][savepoint]
+    session.info["changed_tables"] = set(changed)
+    session.info["tombstones"] = set(tombstones)
+
 
 # Dependency to get DB session
 def get_db():
@@ -51,3 +389,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
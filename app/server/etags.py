@@ -0,0 +1,133 @@
+"""Conditional GETs: ``ETag`` / ``If-None-Match`` from per-table data versions.
+
+``data_versions`` holds a counter per table, bumped by every transaction that
+writes to it (see database.py). A GET route declared with
+``dependencies=[conditional(models.Sale, ...)]`` reads the versions of the
+tables its response is built from (one primary-key lookup) and derives its
+ETag from them. When the client already holds that ETag, the dependency
+answers 304 before the route's own queries run. Otherwise the ``ETag`` and
+``Last-Modified`` headers go out with the normal response.
+
+``Cache-Control: private, no-cache`` lets the browser (and the service worker,
+which fetches through the browser cache) keep the JSON and revalidate it on
+every use, so an unchanged dashboard costs one tiny query and an empty 304.
+Routes whose output also depends on the current date (today's stats, the
+month windows of the charts) pass ``daily=True``. The ``async def`` routes
+declare ``async_conditional``, which reads the versions (and authenticates)
+through their AsyncSession, so a request holds one connection, not two.
+"""
+import hashlib
+import os
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Tuple
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database import get_async_db, get_db
+from auth import get_async_current_active_user, get_current_active_user
+import models
+
+CACHE_CONTROL = "private, no-cache"
+
+# Part of every ETag, so a deployment that changes a response format never
+# answers 304 for a body cached from the previous one.
+DEPLOYMENT = os.getenv("VERCEL_GIT_COMMIT_SHA", "")
+
+
+def _versions_query(tables):
+    return (
+        select(
+            models.DataVersion.table_name,
+            models.DataVersion.version,
+            models.DataVersion.updated_at,
+        )
+        .where(models.DataVersion.table_name.in_(tables))
+        .order_by(models.DataVersion.table_name)
+    )
+
+
+def _etag(rows, daily: bool) -> Tuple[str, Optional[datetime]]:
+    digest = hashlib.sha1(DEPLOYMENT.encode())
+    for table_name, version, updated_at in rows:
+        digest.update(f"{table_name}:{version}:{updated_at};".encode())
+    if daily:
+        digest.update(date.today().isoformat().encode())
+
+    last_modified = max((row.updated_at for row in rows), default=None)
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)  # SQLite
+    return f'W/"{digest.hexdigest()[:32]}"', last_modified
+
+
+def current_etag(
+    db: Session, tables, daily: bool = False
+) -> Tuple[str, Optional[datetime]]:
+    """ETag and last change time of the data in ``tables`` (table names)."""
+    return _etag(db.execute(_versions_query(tables)).all(), daily)
+
+
+async def current_async_etag(
+    db: AsyncSession, tables, daily: bool = False
+) -> Tuple[str, Optional[datetime]]:
+    """``current_etag`` through an AsyncSession."""
+    return _etag((await db.execute(_versions_query(tables))).all(), daily)
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): the W/ prefixes are ignored.
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def _answer(
+    request: Request, response: Response, etag: str, last_modified: Optional[datetime]
+):
+    """304 if the request's ``If-None-Match`` holds ``etag``, else set the
+    headers on ``response``."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(timezone.utc), usegmt=True
+        )
+    if _matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    request.state.etag = etag  # also the data version for cache.py's keys
+    response.headers.update(headers)
+
+
+def conditional(*tables, daily: bool = False):
+    """Route dependency: 304 if the client's copy of ``tables`` is current."""
+    names = sorted(table.__tablename__ for table in tables)
+
+    def check(
+        request: Request,
+        response: Response,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_active_user),
+    ):
+        _answer(request, response, *current_etag(db, names, daily))
+
+    return Depends(check)
+
+
+def async_conditional(*tables, daily: bool = False):
+    """``conditional`` for ``async def`` routes using ``get_async_db``."""
+    names = sorted(table.__tablename__ for table in tables)
+
+    async def check(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: models.User = Depends(get_async_current_active_user),
+    ):
+        _answer(request, response, *await current_async_etag(db, names, daily))
+
+    return Depends(check)
@@ -0,0 +1,198 @@
+"""Per-request database instrumentation.
+
+``InstrumentationMiddleware`` gives every HTTP request a ``RequestStats`` held
+in a context variable. SQLAlchemy event hooks on every engine and session (the
+sync ``engine`` and the async analytics engine alike) add to it as the request
+runs:
+
+- ``statements`` / ``db_ms``: each SQL statement and its execution time.
+- ``pool_ms``: the time a session spends waiting for a connection. This covers
+  pool checkout, the pre-ping, and any new TLS + auth handshake, which is the
+  cost ``database.py`` sizes the pool around.
+
+When the response starts, the totals go out in a ``Server-Timing`` header (so
+they show up in the browser devtools) and into per-route histograms served by
+``GET /api/_metrics``. Any statement slower than ``SLOW_QUERY_MS`` (default
+200) is logged on the ``kastbhanjan.sql`` logger, together with its route.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+logger = logging.getLogger("kastbhanjan.sql")
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_ms", "pool_ms")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_ms = 0.0
+        self.pool_ms = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")  # set by FastAPI once a route matches
+        return f"{self.scope['method']} {route.path if route else 'unmatched'}"
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Stats of the request being served, or None outside a request."""
+    return _current.get()
+
+
+# ============== SQLALCHEMY HOOKS ==============
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_ms += elapsed_ms
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning(
+            "slow query (%.1f ms) in %s: %s",
+            elapsed_ms,
+            stats.route if stats else "-",
+            " ".join(statement.split()),
+        )
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _after_transaction_create(session, transaction):
+    if transaction.parent is None:
+        session.info["connection_wait_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _after_begin(session, transaction, connection):
+    start = session.info.pop("connection_wait_start", None)
+    stats = _current.get()
+    if start is not None and stats is not None:
+        stats.pool_ms += (time.perf_counter() - start) * 1000
+
+
+# ============== PER-ROUTE HISTOGRAMS ==============
+class _RouteMetrics:
+    __slots__ = (
+        "count",
+        "total_ms",
+        "max_ms",
+        "statements",
+        "db_ms",
+        "pool_ms",
+        "buckets",
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.statements = 0
+        self.db_ms = 0.0
+        self.pool_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+
+_routes = {}
+_lock = threading.Lock()
+
+
+def record(stats: RequestStats, total_ms: float):
+    route = stats.route
+    with _lock:
+        metrics = _routes.get(route)
+        if metrics is None:
+            metrics = _routes[route] = _RouteMetrics()
+        metrics.count += 1
+        metrics.total_ms += total_ms
+        metrics.max_ms = max(metrics.max_ms, total_ms)
+        metrics.statements += stats.statements
+        metrics.db_ms += stats.db_ms
+        metrics.pool_ms += stats.pool_ms
+        metrics.buckets[bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+
+
+def snapshot() -> dict:
+    """Per-route totals, averages and cumulative latency buckets."""
+    labels = [f"le_{bound}ms" for bound in LATENCY_BUCKETS_MS] + ["le_inf"]
+    routes = {}
+    with _lock:
+        for route, m in sorted(_routes.items()):
+            cumulative, buckets = 0, {}
+            for label, hits in zip(labels, m.buckets):
+                cumulative += hits
+                buckets[label] = cumulative
+            routes[route] = {
+                "count": m.count,
+                "avg_ms": round(m.total_ms / m.count, 2),
+                "max_ms": round(m.max_ms, 2),
+                "avg_statements": round(m.statements / m.count, 2),
+                "avg_db_ms": round(m.db_ms / m.count, 2),
+                "avg_pool_ms": round(m.pool_ms / m.count, 2),
+                "latency_buckets": buckets,
+            }
+    return {"slow_query_ms": SLOW_QUERY_MS, "routes": routes}
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+# ============== MIDDLEWARE ==============
+class InstrumentationMiddleware:
+    """ASGI middleware adding ``Server-Timing`` and recording route metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        recorded = False
+
+        async def send_with_timing(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                total_ms = (time.perf_counter() - start) * 1000
+                timing = (
+                    f'db;dur={stats.db_ms:.1f};desc="{stats.statements} queries", '
+                    f"pool;dur={stats.pool_ms:.1f}, total;dur={total_ms:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode())
+                ]
+                record(stats, total_ms)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
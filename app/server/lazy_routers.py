@@ -0,0 +1,61 @@
+"""Import routers on the first request that needs them.
+
+Importing a router module pulls in its schemas, queries and helpers, and
+``include_router`` builds the request/response models of every route; together
+that is a large share of a cold start. ``LazyRouters`` keeps a map of URL
+prefix -> module and ``LazyRoutersMiddleware`` includes a router only when a
+request under its prefix arrives, so a cold function instance pays for the
+routes it serves first and nothing else.
+
+``/docs``, ``/redoc`` and ``/openapi.json`` load every router (the schema must
+list them all), as does ``load_all()``, which the warm-up route calls.
+"""
+import importlib
+import threading
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+SCHEMA_PATHS = ("/docs", "/redoc", "/openapi.json")
+
+
+class LazyRouters:
+    """Routers of ``app`` still to be included, by URL prefix."""
+
+    def __init__(self, app, modules: dict):
+        self.app = app
+        self.pending = dict(modules)  # prefix -> module name
+        self._lock = threading.Lock()
+
+    def _include(self, prefixes):
+        for prefix in prefixes:
+            module = importlib.import_module(self.pending[prefix])
+            self.app.include_router(module.router)
+            del self.pending[prefix]  # only once its routes are in place
+
+    def load(self, path: str):
+        """Include the routers that could serve ``path``."""
+        with self._lock:
+            if path.startswith(SCHEMA_PATHS):
+                self._include(list(self.pending))
+            else:
+                self._include(
+                    [
+                        prefix
+                        for prefix in self.pending
+                        if path == prefix or path.startswith(prefix + "/")
+                    ]
+                )
+
+    def load_all(self):
+        with self._lock:
+            self._include(list(self.pending))
+
+
+class LazyRoutersMiddleware:
+    def __init__(self, app: ASGIApp, routers: LazyRouters):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self.routers.pending and scope["type"] == "http":
+            self.routers.load(scope["path"])
+        await self.app(scope, receive, send)
@@ -0,0 +1,255 @@
+"""Buyer ledger (khata) entries, in date order with running balances.
+
+``ledger_statement`` is one UNION ALL of the buyer's sales and payments inside
+the requested window, ordered by the database on ``(date, kind, id)``, where
+sales come before payments on the same day. ``iter_ledger`` streams it in
+batches (``yield_per``), oldest or newest first. It loads the item
+descriptions for each batch of sales with one query and yields one
+``LedgerEntry`` at a time. ``ledger_page`` returns a single keyset page.
+Rows outside the window or page are never read.
+
+The running balance starts from ``carried_forward``: the opening balance plus
+the ``buyer_monthly_balances`` checkpoints of every whole month before the
+window, plus the raw rows of the partial month before ``start_date``. That
+keeps the balance column correct for filtered views while reading at most
+one checkpoint row per month of history. Newest-first walks start from the
+balance at the other edge and subtract as they go (``balance_before`` gives
+it for a page boundary).
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterator, Optional
+from fastapi import Response
+from sqlalchemy import Integer, String, cast, func, literal_column, null
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.orm import Session, joinedload
+import models
+import schemas
+from money import MoneyColumn
+from pagination import decode_cursor, keyset_page
+from rollups import month_start
+
+BATCH_SIZE = 500
+
+SALE, PAYMENT = 0, 1  # kind codes; also the order of entries on the same day
+
+
+def sale_description(items) -> str:
+    """Ledger text for a sale built from its items: "PLY 50kg, LAFA 30kg"."""
+    if not items:
+        return "Sale"
+    parts = []
+    for item in items:
+        prod_name = item.product_type.name if item.product_type else "Item"
+        # float(): NUMERIC(14, 3) would print as "50.000"
+        parts.append(f"{prod_name} {float(item.quantity)}{item.unit}")
+    return ", ".join(parts)
+
+
+def carried_forward(db: Session, buyer: models.Buyer, before: date) -> Decimal:
+    """Balance of ``buyer`` at the start of ``before`` (one round trip)."""
+    first_day = month_start(before)
+    checkpoints = select(
+        func.coalesce(
+            func.sum(
+                models.BuyerMonthlyBalance.sales - models.BuyerMonthlyBalance.payments
+            ),
+            0,
+        )
+    ).where(
+        models.BuyerMonthlyBalance.buyer_id == buyer.id,
+        models.BuyerMonthlyBalance.month < first_day,
+    )
+    partial_sales = select(func.coalesce(func.sum(models.Sale.total_amount), 0)).where(
+        models.Sale.buyer_id == buyer.id,
+        models.Sale.date >= first_day,
+        models.Sale.date < before,
+    )
+    partial_payments = select(func.coalesce(func.sum(models.Payment.amount), 0)).where(
+        models.Payment.buyer_id == buyer.id,
+        models.Payment.date >= first_day,
+        models.Payment.date < before,
+    )
+    history, sales, payments = db.execute(
+        select(
+            checkpoints.scalar_subquery(),
+            partial_sales.scalar_subquery(),
+            partial_payments.scalar_subquery(),
+        )
+    ).one()
+    return (buyer.opening_balance or 0) + history + sales - payments
+
+
+def opening_balance_for(
+    db: Session, buyer: models.Buyer, start_date: Optional[date]
+) -> Decimal:
+    """Balance before the first ledger entry of a window starting at
+    ``start_date`` (the buyer's opening balance when unbounded)."""
+    if start_date:
+        return carried_forward(db, buyer, start_date)
+    return buyer.opening_balance or 0
+
+
+def closing_balance_for(
+    db: Session, buyer: models.Buyer, end_date: Optional[date]
+) -> Decimal:
+    """Balance after the last ledger entry of a window ending at ``end_date``
+    (the buyer's current outstanding amount when unbounded)."""
+    if end_date:
+        return carried_forward(db, buyer, end_date + timedelta(days=1))
+    return buyer.outstanding_balance
+
+
+def _entries(buyer_id: int, start_date: Optional[date], end_date: Optional[date]):
+    """Sales and payments of a buyer as (date, kind, id, debit, credit, method)."""
+    sales = select(
+        models.Sale.date.label("date"),
+        literal_column(str(SALE), Integer).label("kind"),
+        models.Sale.id.label("id"),
+        models.Sale.total_amount.label("debit"),
+        literal_column("0", MoneyColumn).label("credit"),
+        cast(null(), String).label("method"),
+    ).where(models.Sale.buyer_id == buyer_id)
+    payments = select(
+        models.Payment.date,
+        literal_column(str(PAYMENT), Integer),
+        models.Payment.id,
+        literal_column("0", MoneyColumn),
+        models.Payment.amount,
+        models.Payment.payment_method,
+    ).where(models.Payment.buyer_id == buyer_id)
+
+    if start_date:
+        sales = sales.where(models.Sale.date >= start_date)
+        payments = payments.where(models.Payment.date >= start_date)
+    if end_date:
+        sales = sales.where(models.Sale.date <= end_date)
+        payments = payments.where(models.Payment.date <= end_date)
+
+    return union_all(sales, payments).subquery()
+
+
+def _order_key(entries):
+    return (entries.c.date, entries.c.kind, entries.c.id)
+
+
+def ledger_statement(
+    buyer_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    newest_first: bool = False,
+):
+    """The buyer's entries in ledger order (oldest first unless ``newest_first``)."""
+    entries = _entries(buyer_id, start_date, end_date)
+    key = _order_key(entries)
+    if newest_first:
+        key = tuple(column.desc() for column in key)
+    return select(entries).order_by(*key)
+
+
+def balance_before(db: Session, buyer: models.Buyer, key) -> Decimal:
+    """Balance just before the entry with ordering key ``(date, kind, id)``."""
+    day, kind, entry_id = key
+    same_day = _entries(buyer.id, day, day)
+    earlier_today = db.execute(
+        select(func.coalesce(func.sum(same_day.c.debit - same_day.c.credit), 0)).where(
+            tuple_(same_day.c.kind, same_day.c.id) < tuple_(kind, entry_id)
+        )
+    ).scalar()
+    return carried_forward(db, buyer, day) + earlier_today
+
+
+def _descriptions(db: Session, sale_ids) -> dict:
+    items = defaultdict(list)
+    if sale_ids:
+        rows = (
+            db.query(models.SaleItem)
+            .options(joinedload(models.SaleItem.product_type))
+            .filter(models.SaleItem.sale_id.in_(sale_ids))
+            .order_by(models.SaleItem.id)
+        )
+        for item in rows:
+            items[item.sale_id].append(item)
+    return {sale_id: sale_description(items[sale_id]) for sale_id in sale_ids}
+
+
+def _walk(db: Session, batches, balance: Decimal, newest_first: bool):
+    """Turn batches of ledger rows into entries, carrying the running balance.
+
+    Oldest first, ``balance`` is the balance before the first row; newest
+    first, it is the balance after the first row.
+    """
+    for rows in batches:
+        descriptions = _descriptions(db, [row.id for row in rows if row.kind == SALE])
+        for row in rows:
+            change = row.debit - row.credit
+            if not newest_first:
+                balance += change
+            if row.kind == SALE:
+                kind, description = "SALE", descriptions[row.id]
+            else:
+                kind, description = "PAYMENT", f"Payment - {row.method}"
+            yield schemas.LedgerEntry(
+                date=row.date,
+                type=kind,
+                description=description,
+                debit=row.debit,
+                credit=row.credit,
+                balance=balance,
+            )
+            if newest_first:
+                balance -= change
+
+
+def iter_ledger(
+    db: Session,
+    buyer: models.Buyer,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    balance: Optional[Decimal] = None,
+    newest_first: bool = False,
+) -> Iterator[schemas.LedgerEntry]:
+    """Yield the buyer's ledger entries with running balances.
+
+    ``balance`` is the balance at the edge the iteration starts from: before
+    the oldest entry (default ``opening_balance_for``), or after the newest
+    one with ``newest_first`` (default ``closing_balance_for``).
+    """
+    if balance is None:
+        if newest_first:
+            balance = closing_balance_for(db, buyer, end_date)
+        else:
+            balance = opening_balance_for(db, buyer, start_date)
+
+    statement = ledger_statement(buyer.id, start_date, end_date, newest_first)
+    result = db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+    yield from _walk(db, result.partitions(), balance, newest_first)
+
+
+def ledger_page(
+    db: Session,
+    buyer: models.Buyer,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    cursor: str,
+    limit: int,
+    response: Response,
+):
+    """One newest-first page of the ledger, keyset-paginated like the list
+    routes (see pagination.py).
+
+    Returns ``(entries, opening, closing)``: the page's entries and the
+    balances before its oldest and after its newest entry.
+    """
+    entries = _entries(buyer.id, start_date, end_date)
+    key = _order_key(entries)
+    rows = keyset_page(db.query(entries), key, cursor, limit, response)
+
+    if cursor:
+        closing = balance_before(db, buyer, decode_cursor(cursor, key))
+    else:
+        closing = closing_balance_for(db, buyer, end_date)
+    page = list(_walk(db, [rows], closing, newest_first=True))
+    opening = closing - sum(row.debit - row.credit for row in rows)
+    return page, opening, closing
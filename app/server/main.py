@@ -1,14 +1,9 @@
+import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import (
-    auth,
-    purchases,
-    sales,
-    buyers,
-    expenses,
-    product_types,
-    analytics,
-)
+from sqlalchemy import text
+from instrumentation import InstrumentationMiddleware
+from lazy_routers import LazyRouters, LazyRoutersMiddleware
 
 app = FastAPI(
     title="Kastbhanjan Playwood Management System",
@@ -22,22 +17,42 @@ app = FastAPI(
 # on :5173 calling the API on :8000). Auth is a Bearer token in the
 # Authorization header (not cookies), so we use a wildcard origin WITHOUT
 # credentials, which is a valid CORS combination (wildcard + credentials is not).
+# Custom response headers the frontend reads must be listed in expose_headers.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
+)
+
+# Routers are included on the first request under their prefix (see
+# lazy_routers.py), so a cold start only imports what that request needs.
+routers = LazyRouters(
+    app,
+    {
+        "/api/auth": "routers.auth",
+        "/api/purchases": "routers.purchases",
+        "/api/sales": "routers.sales",
+        "/api/buyers": "routers.buyers",
+        "/api/expenses": "routers.expenses",
+        "/api/product-types": "routers.product_types",
+        "/api/analytics": "routers.analytics",
+        "/api/import": "routers.imports",
+        "/api/export": "routers.exports",
+        "/api/sync": "routers.sync",
+        "/api/search": "routers.search",
+        "/api/batch-mutations": "routers.mutations",
+        "/api/batch": "routers.batch",
+        "/api/_metrics": "routers.metrics",
+    },
 )
+app.add_middleware(LazyRoutersMiddleware, routers=routers)
+app.state.routers = routers  # routers/batch.py loads the routes it dispatches to
 
-# Include routers
-app.include_router(auth.router)
-app.include_router(purchases.router)
-app.include_router(sales.router)
-app.include_router(buyers.router)
-app.include_router(expenses.router)
-app.include_router(product_types.router)
-app.include_router(analytics.router)
+# Added last so it is outermost: its timing covers CORS and every route.
+app.add_middleware(InstrumentationMiddleware)
 
 
 @app.get("/")
@@ -52,3 +67,27 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/api/_warmup")
+def warmup():
+    """Load every router, open the pooled DB connection and the password
+    hasher, so the next real request finds a warm instance. Cheap to repeat;
+    point an uptime pinger at it to keep an instance warm."""
+    import auth
+    import database
+
+    timings = {}
+    start = time.perf_counter()
+    routers.load_all()
+    timings["routers_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    with database.get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+    timings["database_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    auth.password_context()
+    timings["password_hasher_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return {"status": "warm", **timings}
@@ -0,0 +1,50 @@
+"""
+Script to add the list/filter indexes declared in models.py to an existing database.
+
+``Base.metadata.create_all`` only creates indexes together with new tables, so
+databases created before the indexes were declared need this once. It is safe to
+re-run: every index is created with IF NOT EXISTS.
+
+On PostgreSQL the pg_trgm extension is enabled (for the ILIKE search indexes)
+and the indexes are built with CREATE INDEX CONCURRENTLY, so the live tables
+stay writable while the indexes build. Run from the app/server directory:
+
+    python migrate_add_indexes.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from database import engine, Base
+import models  # noqa: F401  ensures models register on Base.metadata
+
+
+def main():
+    is_postgres = engine.dialect.name == "postgresql"
+
+    # CONCURRENTLY cannot run inside a transaction block.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if is_postgres:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+        for table in Base.metadata.sorted_tables:
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                if is_postgres:
+                    index.dialect_options["postgresql"]["concurrently"] = True
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+                else:
+                    index.create(conn, checkfirst=True)
+                print(f"✓ {index.name}")
+
+    print("Indexes are up to date.")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,58 @@
+"""
+Script to create the tables declared in models.py that an existing database
+does not have yet (e.g. ``data_versions``). Existing tables are left untouched,
+so it is safe to re-run.
+
+Every commit bumps ``data_versions`` (see database.py), so run this before
+deploying code that introduces it. The write paths only apply deltas to the
+balance and rollup tables, so when one of those is created here it is also
+filled from the raw tables (as ``rebuild_balances.py`` / ``rebuild_rollups.py``
+would); otherwise the first write after the deploy would leave e.g. a monthly
+checkpoint holding only its own amount. Run from the app/server directory:
+
+    python migrate_add_tables.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import inspect
+from database import SessionLocal, engine, Base
+import models  # noqa: F401  ensures models register on Base.metadata
+from balances import rebuild_balances
+from rollups import rebuild_rollups
+
+# Derived table -> (function filling it from the raw tables, what it counts)
+BACKFILLS = {
+    models.BuyerBalance.__tablename__: (rebuild_balances, "buyer(s)"),
+    models.BuyerMonthlyBalance.__tablename__: (rebuild_balances, "buyer(s)"),
+    models.MonthlyRollup.__tablename__: (rebuild_rollups, "month(s)"),
+    models.MonthlyProductRollup.__tablename__: (rebuild_rollups, "month(s)"),
+}
+
+
+def main():
+    existing = set(inspect(engine).get_table_names())
+    missing = [t for t in Base.metadata.sorted_tables if t.name not in existing]
+    Base.metadata.create_all(bind=engine, tables=missing)
+    for table in missing:
+        print(f"✓ {table.name}")
+
+    backfills = []
+    for table in missing:
+        backfill = BACKFILLS.get(table.name)
+        if backfill is not None and backfill not in backfills:
+            backfills.append(backfill)
+    with SessionLocal() as db:
+        for rebuild, unit in backfills:
+            print(f"✓ {rebuild.__name__}: {rebuild(db)} {unit}")
+    print("Tables are up to date.")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,74 @@
+"""
+Script to convert the money and quantity columns from floating point to NUMERIC.
+
+models.py declares amounts as NUMERIC(14, 2) and quantities as NUMERIC(14, 3)
+(see money.py). On an existing PostgreSQL database this converts every such
+column still stored as ``double precision`` / ``real``, rounding each value to
+the column's scale. All columns change in ONE transaction, so a failure leaves
+the database untouched. Each ALTER rewrites its table under an exclusive lock,
+so run it while the app is idle. It is safe to re-run; converted columns are
+skipped.
+
+Afterwards, rebuild the derived tables so they are the exact sums of the
+rounded rows:
+
+    python migrate_money_columns.py
+    python rebuild_balances.py
+    python rebuild_rollups.py
+
+SQLite (local development) needs no migration: it has no fixed column types, and
+SQLAlchemy rounds the stored values to the declared scale when reading them.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import Float, Numeric, inspect, text
+from database import engine, Base
+import models  # noqa: F401  ensures models register on Base.metadata
+
+
+def _float_columns(inspector):
+    """(table, column, numeric type) for each NUMERIC model column still stored
+    as a float."""
+    existing = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        current = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if (
+                isinstance(column.type, Numeric)
+                and not isinstance(column.type, Float)
+                and isinstance(current.get(column.name), Float)
+            ):
+                yield table.name, column.name, column.type
+
+
+def main():
+    if engine.dialect.name != "postgresql":
+        print("✓ Nothing to do: only PostgreSQL stores the columns as floats.")
+        return
+
+    columns = list(_float_columns(inspect(engine)))
+    with engine.begin() as conn:
+        for table, column, numeric in columns:
+            type_sql = f"NUMERIC({numeric.precision}, {numeric.scale})"
+            conn.execute(
+                text(
+                    f'ALTER TABLE "{table}" ALTER COLUMN "{column}" TYPE {type_sql} '
+                    f'USING round("{column}"::numeric, {numeric.scale})'
+                )
+            )
+            print(f"✓ {table}.{column} -> {type_sql}")
+
+    print(f"Converted {len(columns)} column(s).")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
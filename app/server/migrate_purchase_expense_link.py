@@ -0,0 +1,138 @@
+"""
+Script to link existing transport expenses to their purchases.
+
+Creating a purchase with a transport cost also creates a Transport expense.
+models.py now records which purchase that is in ``expenses.purchase_id``;
+before, the purchase routes found it again by date, category and a LIKE on the
+seller name in the description. This adds the column and its unique index to
+an existing database and backfills it: each unlinked Transport expense is
+paired with the purchase it was generated for, i.e. a purchase on the same date
+whose transport cost equals the amount and whose seller the description names
+("Transport cost for purchase from <seller>"). When several purchases and
+expenses fit the same key they are paired in id order, as they were created.
+
+Everything runs in ONE transaction, so a failure leaves the database untouched.
+It is safe to re-run: the column and index are only added when missing, and
+expenses that are already linked are left alone. Run from the app/server
+directory:
+
+    python migrate_purchase_expense_link.py
+"""
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from database import engine
+import models
+
+DESCRIPTION_PREFIX = "Transport cost for purchase from "
+
+
+def _add_column(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("expenses")}
+    if "purchase_id" in columns:
+        return False
+    conn.execute(
+        text(
+            "ALTER TABLE expenses "
+            "ADD COLUMN purchase_id INTEGER REFERENCES purchases (id)"
+        )
+    )
+    return True
+
+
+def _seller(description):
+    """Seller named by an automatic transport description, or None."""
+    if not description or not description.startswith(DESCRIPTION_PREFIX):
+        return None
+    return description[len(DESCRIPTION_PREFIX) :]
+
+
+def _matches(conn):
+    """``(expense_id, purchase_id)`` pairs for the unlinked transport expenses."""
+    Expense, Purchase = models.Expense, models.Purchase
+    linked = select(Expense.purchase_id).where(Expense.purchase_id.is_not(None))
+    purchases = defaultdict(list)  # (date, transport cost) -> purchases
+    for row in conn.execute(
+        select(
+            Purchase.id,
+            Purchase.date,
+            Purchase.transport_cost,
+            Purchase.seller_name,
+            Purchase.transport_service,
+        )
+        .where(Purchase.transport_cost > 0, Purchase.id.not_in(linked))
+        .order_by(Purchase.id)
+    ):
+        purchases[(row.date, row.transport_cost)].append(row)
+
+    pairs = []
+    for expense in conn.execute(
+        select(Expense.id, Expense.date, Expense.amount, Expense.description)
+        .where(
+            Expense.category == models.ExpenseCategory.TRANSPORT,
+            Expense.purchase_id.is_(None),
+        )
+        .order_by(Expense.id)
+    ):
+        seller = _seller(expense.description)
+        if seller is None:
+            continue
+        candidates = purchases.get((expense.date, expense.amount), [])
+        for i, purchase in enumerate(candidates):
+            # The description names "<seller>" or "<seller> (<service>)".
+            name = purchase.seller_name
+            if seller == name or seller.startswith(name + " ("):
+                pairs.append((expense.id, purchase.id))
+                del candidates[i]
+                break
+    return pairs
+
+
+def main():
+    with engine.begin() as conn:
+        if _add_column(conn):
+            print("✓ Added expenses.purchase_id")
+
+        pairs = _matches(conn)
+        if pairs:
+            expenses = models.Expense.__table__
+            conn.execute(
+                update(expenses)
+                .where(expenses.c.id == bindparam("expense"))
+                .values(purchase_id=bindparam("purchase")),
+                [{"expense": e, "purchase": p} for e, p in pairs],
+            )
+        print(f"✓ Linked {len(pairs)} transport expense(s) to their purchase")
+
+        index = next(
+            i
+            for i in models.Expense.__table__.indexes
+            if i.name == "ix_expenses_purchase_id"
+        )
+        index.create(conn, checkfirst=True)
+        print(f"✓ {index.name}")
+
+        unlinked = conn.execute(
+            select(models.Expense.id).where(
+                models.Expense.category == models.ExpenseCategory.TRANSPORT,
+                models.Expense.purchase_id.is_(None),
+                models.Expense.description.like(DESCRIPTION_PREFIX + "%"),
+            )
+        ).all()
+        if unlinked:
+            print(
+                f"  {len(unlinked)} automatic transport expense(s) match no "
+                "purchase (edited by hand, or the purchase is gone); left as is."
+            )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
@@ -2,20 +2,42 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
-    Float,
     DateTime,
     Text,
     ForeignKey,
     Enum,
     Date,
     Boolean,
+    Index,
+    JSON,
+    DDL,
+    event,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from money import MoneyColumn, QuantityColumn
 import enum
 
 
+def trigram_index(name, column):
+    """GIN trigram index serving ``ILIKE '%term%'`` searches (PostgreSQL only)."""
+    return Index(
+        name,
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+
+# The trigram indexes need the pg_trgm extension; create it with the tables.
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 # Enums
 class PaymentType(str, enum.Enum):
     PAID = "Paid"
@@ -63,36 +85,94 @@ class ProductType(Base):
 # Buyers Table (Customers)
 class Buyer(Base):
     __tablename__ = "buyers"
+    __table_args__ = (
+        Index("ix_buyers_name", "name"),
+        trigram_index("ix_buyers_name_trgm", "name"),
+        trigram_index("ix_buyers_phone_trgm", "phone"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     phone = Column(String(20), nullable=True)
     address = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
-    opening_balance = Column(Float, default=0.0)
+    opening_balance = Column(MoneyColumn, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     sales = relationship("Sale", back_populates="buyer")
     payments = relationship("Payment", back_populates="buyer")
+    # Materialized totals (see balances.py). Joined eagerly so serializing a
+    # buyer never has to touch its sales/payments.
+    balance = relationship(
+        "BuyerBalance",
+        back_populates="buyer",
+        uselist=False,
+        lazy="joined",
+        cascade="all, delete-orphan",
+    )
+    monthly_balances = relationship(
+        "BuyerMonthlyBalance", back_populates="buyer", cascade="all, delete-orphan"
+    )
 
     @property
     def total_sales(self):
+        if self.balance is not None:
+            return self.balance.total_sales
         return sum(sale.total_amount for sale in self.sales)
 
     @property
     def total_payments(self):
+        if self.balance is not None:
+            return self.balance.total_payments
         return sum(payment.amount for payment in self.payments)
 
     @property
     def outstanding_balance(self):
-        return self.opening_balance + self.total_sales - self.total_payments
+        if self.balance is not None:
+            return self.balance.outstanding
+        return (self.opening_balance or 0) + self.total_sales - self.total_payments
+
+
+# Buyer Balances Table (materialized per-buyer totals, kept current by the
+# sale/payment write paths -- rebuild with `python rebuild_balances.py`)
+class BuyerBalance(Base):
+    __tablename__ = "buyer_balances"
+
+    buyer_id = Column(Integer, ForeignKey("buyers.id"), primary_key=True)
+    total_sales = Column(MoneyColumn, nullable=False, default=0)
+    total_payments = Column(MoneyColumn, nullable=False, default=0)
+    outstanding = Column(MoneyColumn, nullable=False, default=0, index=True)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    # Relationships
+    buyer = relationship("Buyer", back_populates="balance")
+
+
+# Buyer Monthly Balances Table (per-buyer sale/payment totals per month; the
+# ledger sums these to get the balance carried forward into a date range)
+class BuyerMonthlyBalance(Base):
+    __tablename__ = "buyer_monthly_balances"
+
+    buyer_id = Column(Integer, ForeignKey("buyers.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    sales = Column(MoneyColumn, nullable=False, default=0)
+    payments = Column(MoneyColumn, nullable=False, default=0)
+
+    # Relationships
+    buyer = relationship("Buyer", back_populates="monthly_balances")
 
 
 # Purchases Table (Scrap Purchase)
 class Purchase(Base):
     __tablename__ = "purchases"
+    __table_args__ = (
+        Index("ix_purchases_date_id", "date", "id"),
+        trigram_index("ix_purchases_seller_name_trgm", "seller_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
@@ -101,29 +181,37 @@ class Purchase(Base):
     pickup_location = Column(Text, nullable=True)
     scrap_type = Column(String(100), nullable=True)
     transport_service = Column(String(100), nullable=True)
-    transport_cost = Column(Float, default=0.0)
-    quantity = Column(Float, nullable=False)
+    transport_cost = Column(MoneyColumn, default=0)
+    quantity = Column(QuantityColumn, nullable=False)
     unit = Column(String(20), default="kg")
-    price_per_unit = Column(Float, nullable=False)
-    total_purchase_cost = Column(Float, nullable=False)
+    price_per_unit = Column(MoneyColumn, nullable=False)
+    total_purchase_cost = Column(MoneyColumn, nullable=False)
     actual_paid_amount = Column(
-        Float, nullable=True
+        MoneyColumn, nullable=True
     )  # Actual amount paid (for discounts)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Relationships
+    transport_expense = relationship("Expense", uselist=False)
+
 
 # Sales Table
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_date_id", "date", "id"),
+        Index("ix_sales_buyer_id_date", "buyer_id", "date"),
+        Index("ix_sales_payment_type_date", "payment_type", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
     buyer_id = Column(Integer, ForeignKey("buyers.id"), nullable=False)
     payment_type = Column(Enum(PaymentType), nullable=False)
-    payment_received_now = Column(Float, default=0.0)
-    total_amount = Column(Float, default=0.0)
+    payment_received_now = Column(MoneyColumn, default=0)
+    total_amount = Column(MoneyColumn, default=0)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -138,14 +226,18 @@ class Sale(Base):
 # Sale Items Table
 class SaleItem(Base):
     __tablename__ = "sale_items"
+    __table_args__ = (
+        Index("ix_sale_items_sale_id", "sale_id"),
+        Index("ix_sale_items_product_type_id", "product_type_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False)
     product_type_id = Column(Integer, ForeignKey("product_types.id"), nullable=False)
-    quantity = Column(Float, nullable=False)
+    quantity = Column(QuantityColumn, nullable=False)
     unit = Column(String(20), default="kg")
-    price_per_unit = Column(Float, nullable=False)
-    total_price = Column(Float, nullable=False)
+    price_per_unit = Column(MoneyColumn, nullable=False)
+    total_price = Column(MoneyColumn, nullable=False)
 
     # Relationships
     sale = relationship("Sale", back_populates="sale_items")
@@ -155,11 +247,15 @@ class SaleItem(Base):
 # Payments Table (Customer Payments)
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_date_id", "date", "id"),
+        Index("ix_payments_buyer_id_date", "buyer_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
     buyer_id = Column(Integer, ForeignKey("buyers.id"), nullable=False)
-    amount = Column(Float, nullable=False)
+    amount = Column(MoneyColumn, nullable=False)
     payment_method = Column(String(100), default="Cash")
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -171,11 +267,99 @@ class Payment(Base):
 # Expenses Table
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_date_id", "date", "id"),
+        Index("ix_expenses_category_date", "category", "date"),
+        Index("ix_expenses_purchase_id", "purchase_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
     category = Column(Enum(ExpenseCategory), nullable=False)
-    amount = Column(Float, nullable=False)
+    amount = Column(MoneyColumn, nullable=False)
     description = Column(Text, nullable=True)
+    # The purchase whose transport cost this is (set on the automatic transport
+    # expense, NULL for expenses entered by hand)
+    purchase_id = Column(Integer, ForeignKey("purchases.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+# Monthly Rollups Table (one row per month, kept current by the purchase, sale
+# and expense write paths -- backfill with `python rebuild_rollups.py`)
+class MonthlyRollup(Base):
+    __tablename__ = "monthly_rollups"
+
+    month = Column(Date, primary_key=True)  # first day of the month
+    purchases = Column(MoneyColumn, nullable=False, default=0)
+    sales = Column(MoneyColumn, nullable=False, default=0)
+    expenses = Column(MoneyColumn, nullable=False, default=0)
+    kg_bought = Column(QuantityColumn, nullable=False, default=0)
+    kg_sold = Column(QuantityColumn, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+# Monthly Product Rollups Table (kg / amount sold per product per month)
+class MonthlyProductRollup(Base):
+    __tablename__ = "monthly_product_rollups"
+
+    month = Column(Date, primary_key=True)  # first day of the month
+    product_type_id = Column(Integer, ForeignKey("product_types.id"), primary_key=True)
+    kg_sold = Column(QuantityColumn, nullable=False, default=0)
+    amount = Column(MoneyColumn, nullable=False, default=0)
+
+    # Relationships
+    product_type = relationship("ProductType")
+
+
+# Data Versions Table (one row per table, bumped by every transaction that
+# writes to it -- the ETags of cached GET responses are derived from these)
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+# Deleted Rows Table (tombstones for the sync API: one row per deleted buyer,
+# sale, payment, purchase, expense or product type, written by database.py;
+# row_id is NULL when rows were deleted in bulk)
+class DeletedRow(Base):
+    __tablename__ = "deleted_rows"
+    __table_args__ = (Index("ix_deleted_rows_deleted_at", "deleted_at"),)
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=False)
+
+
+# Idempotency Keys Table (one row per operation applied by
+# POST /api/batch-mutations, so a replayed operation returns its first result
+# instead of being applied twice)
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(100), primary_key=True)
+    operation = Column(String(50), nullable=False)
+    response = Column(JSON, nullable=True)  # the operation's result
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+
+def changed_at(model):
+    """When a row was last written: ``updated_at``, or ``created_at`` for rows
+    never updated (and for tables without ``updated_at``)."""
+    if hasattr(model, "updated_at"):
+        return func.coalesce(model.updated_at, model.created_at)
+    return model.created_at
+
+
+# Indexes serving the sync API's "changed since" filters.
+for _model in (Buyer, Sale, Payment, Purchase, Expense):
+    Index(f"ix_{_model.__tablename__}_changed_at", changed_at(_model))
+Index("ix_buyer_balances_updated_at", BuyerBalance.updated_at)
@@ -0,0 +1,56 @@
+"""Fixed-point money and quantity handling.
+
+Amounts are stored as ``NUMERIC(14, 2)`` (rupees to the paisa) and quantities
+as ``NUMERIC(14, 3)`` (kg to the gram). They are read back as ``Decimal`` and
+request bodies are parsed into ``Decimal`` (see schemas.py), so totals computed
+in Python are exact and equal what the database would compute. Line totals are
+rounded half away from zero with ``money()``, the same rule as PostgreSQL's
+``round()``, before they are summed.
+
+Responses still declare these fields as ``float``. Pydantic turns a Decimal
+into a float natively while validating, and the JSON encoder then writes plain
+numbers. (A Decimal field would go out as a JSON string.)
+
+``parse_money()`` and ``parse_quantity()`` validate request values: they round
+like ``money()`` and ``quantity()`` but raise ValueError (a 422) for a value
+that does not fit its column.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from sqlalchemy import Numeric
+
+CENT = Decimal("0.01")
+GRAM = Decimal("0.001")
+
+MoneyColumn = Numeric(14, 2)
+QuantityColumn = Numeric(14, 3)
+
+
+def money(value) -> Decimal:
+    """``value`` rounded to the paisa."""
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def quantity(value) -> Decimal:
+    """``value`` rounded to the gram."""
+    return Decimal(value).quantize(GRAM, rounding=ROUND_HALF_UP)
+
+
+def _parse(value, rounded, column: Numeric) -> Decimal:
+    limit = Decimal(10) ** (column.precision - column.scale)
+    try:
+        value = rounded(value)
+    except InvalidOperation:
+        value = None  # too many digits to round
+    if value is None or abs(value) >= limit:
+        raise ValueError(f"must be less than {limit:,} in absolute value")
+    return value
+
+
+def parse_money(value) -> Decimal:
+    """``money(value)``; ValueError if it does not fit ``MoneyColumn``."""
+    return _parse(value, money, MoneyColumn)
+
+
+def parse_quantity(value) -> Decimal:
+    """``quantity(value)``; ValueError if it does not fit ``QuantityColumn``."""
+    return _parse(value, quantity, QuantityColumn)
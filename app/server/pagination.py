@@ -0,0 +1,65 @@
+"""Opt-in keyset (cursor) pagination for the list endpoints.
+
+The list routes keep their ``skip``/``limit`` offset behaviour by default. When
+a ``cursor`` query parameter is present (an empty ``cursor=`` starts at the
+first page) they switch to keyset mode: rows are filtered with a row-value
+comparison such as ``(date, id) < (:date, :id)``, which the ``(date, id)``
+indexes serve directly, so page 1000 costs the same as page 1.
+
+The opaque cursor for the next page is returned in the ``X-Next-Cursor``
+response header (absent on the last page), leaving the JSON body unchanged.
+"""
+import base64
+import json
+from datetime import date
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values) -> str:
+    payload = [v.isoformat() if isinstance(v, date) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Decode a cursor into values typed like ``columns``; 400 if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError("cursor arity mismatch")
+        return [
+            (
+                date.fromisoformat(value)
+                if column.type.python_type is date
+                else column.type.python_type(value)
+            )
+            for column, value in zip(columns, payload)
+        ]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(query, columns, cursor: str, limit: int, response: Response):
+    """Return one page of ``query`` in descending ``columns`` order.
+
+    ``columns`` must form a unique key (e.g. ``(date, id)``). Sets the
+    ``X-Next-Cursor`` header when more rows follow.
+    """
+    if limit < 1:
+        return []
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        query = query.filter(tuple_(*columns) < tuple_(*values))
+
+    rows = query.order_by(*(c.desc() for c in columns)).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(last, column.key) for column in columns
+        )
+    return rows
@@ -0,0 +1,46 @@
+"""Rebuild or verify the materialized ``buyer_balances`` and
+``buyer_monthly_balances`` tables.
+
+The sale/payment write paths keep both current, but after a table is first
+introduced (or after editing data directly in SQL) it must be
+backfilled from the raw sales and payments. Run from the app/server directory:
+
+    python rebuild_balances.py            # create table if needed + rebuild
+    python rebuild_balances.py --verify   # report mismatches, change nothing
+
+``--verify`` exits with status 1 if any buyer's stored balance is wrong.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import SessionLocal, engine, Base
+import models  # noqa: F401  ensures models register on Base.metadata
+from balances import rebuild_balances, verify_balances
+
+
+def main():
+    verify_only = "--verify" in sys.argv[1:]
+
+    if not verify_only:
+        # Creates the balance tables on an existing database (no-op if present).
+        Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        if verify_only:
+            mismatches = verify_balances(db)
+            for buyer_id, stored, expected in mismatches:
+                print(f"Buyer {buyer_id}: stored={stored} expected={expected}")
+            print(f"{len(mismatches)} mismatched buyer balance(s).")
+            sys.exit(1 if mismatches else 0)
+
+        count = rebuild_balances(db)
+        print(f"Rebuilt balances for {count} buyer(s).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
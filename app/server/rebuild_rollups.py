@@ -0,0 +1,32 @@
+"""Backfill the ``monthly_rollups`` / ``monthly_product_rollups`` tables.
+
+The purchase, sale and expense write paths keep the rollups current, but when
+the tables are first introduced (or after editing data directly in SQL) they
+must be rebuilt from the raw tables. Run from the app/server directory:
+
+    python rebuild_rollups.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import SessionLocal, engine, Base
+import models  # noqa: F401  ensures models register on Base.metadata
+from rollups import rebuild_rollups
+
+
+def main():
+    # Creates the rollup tables on an existing database (no-op if present).
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        count = rebuild_rollups(db)
+        print(f"Rebuilt rollups for {count} month(s).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,11 +25,15 @@ from seed_data import seed_product_types
 
 # FK-safe deletion order (children before parents)
 DELETE_ORDER = (
+    models.MonthlyProductRollup,
+    models.MonthlyRollup,
     models.SaleItem,
     models.Payment,
     models.Sale,
-    models.Purchase,
     models.Expense,
+    models.Purchase,
+    models.BuyerBalance,
+    models.BuyerMonthlyBalance,
     models.Buyer,
     models.ProductType,
     models.User,
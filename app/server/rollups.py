@@ -0,0 +1,201 @@
+"""Incrementally maintained monthly rollups.
+
+``monthly_rollups`` holds one row per month with the purchase, sale and
+expense totals and the kg bought/sold; ``monthly_product_rollups`` breaks the
+kg/amount sold down per product. The purchase, sale and expense write paths
+call the ``apply_*`` helpers below in the same transaction as the change, so a
+24-month chart reads at most 24 rows instead of grouping the raw tables.
+
+Changes are applied as deltas: call ``apply_x(db, obj, -1)`` with the row's
+old values before editing/deleting it and ``apply_x(db, obj)`` with the new
+values afterwards. Each delta is a single upsert (``INSERT .. ON CONFLICT DO
+UPDATE SET col = col + excluded.col``) so concurrent writers in the same month
+cannot lose updates. ``python rebuild_rollups.py`` backfills everything.
+"""
+from datetime import date
+from sqlalchemy import func, extract, update
+from sqlalchemy.orm import Session
+import models
+
+
+def month_start(day) -> date:
+    if isinstance(day, str):  # update schemas accept ISO date strings
+        day = date.fromisoformat(day[:10])
+    return date(day.year, day.month, 1)
+
+
+def upsert_deltas(db: Session, model, keys: dict, deltas: dict):
+    """Add ``deltas`` to the row of ``model`` at ``keys``, creating it if missing."""
+    if not any(deltas.values()):
+        return
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # Generic fallback: update, then insert if the row did not exist yet.
+        result = db.execute(
+            update(table)
+            .where(*(table.c[k] == v for k, v in keys.items()))
+            .values({k: table.c[k] + v for k, v in deltas.items()})
+        )
+        if result.rowcount == 0:
+            db.execute(table.insert().values(**keys, **deltas))
+        return
+
+    stmt = insert(table).values(**keys, **deltas)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={k: table.c[k] + stmt.excluded[k] for k in deltas},
+        )
+    )
+
+
+def _apply_month(
+    db: Session,
+    day: date,
+    purchases=0,
+    sales=0,
+    expenses=0,
+    kg_bought=0,
+    kg_sold=0,
+):
+    upsert_deltas(
+        db,
+        models.MonthlyRollup,
+        {"month": month_start(day)},
+        {
+            "purchases": purchases,
+            "sales": sales,
+            "expenses": expenses,
+            "kg_bought": kg_bought,
+            "kg_sold": kg_sold,
+        },
+    )
+
+
+def apply_purchase(db: Session, purchase: models.Purchase, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a purchase from its month's totals."""
+    _apply_month(
+        db,
+        purchase.date,
+        purchases=sign * (purchase.total_purchase_cost or 0),
+        kg_bought=sign * (purchase.quantity or 0),
+    )
+
+
+def apply_expense(db: Session, expense: models.Expense, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) an expense from its month's totals."""
+    _apply_month(db, expense.date, expenses=sign * (expense.amount or 0))
+
+
+def apply_sale(db: Session, sale: models.Sale, sign: int = 1, items=None):
+    """Add (sign=1) or remove (sign=-1) a sale and its items from its month.
+
+    ``items`` defaults to ``sale.sale_items``; pass the new items explicitly
+    when they were added by foreign key rather than through the relationship.
+    """
+    items = sale.sale_items if items is None else items
+    _apply_month(
+        db,
+        sale.date,
+        sales=sign * (sale.total_amount or 0),
+        kg_sold=sign * sum(item.quantity or 0 for item in items),
+    )
+    for item in items:
+        upsert_deltas(
+            db,
+            models.MonthlyProductRollup,
+            {"month": month_start(sale.date), "product_type_id": item.product_type_id},
+            {
+                "kg_sold": sign * (item.quantity or 0),
+                "amount": sign * (item.total_price or 0),
+            },
+        )
+
+
+def apply_totals(db: Session, months: dict, products: dict):
+    """Apply pre-aggregated deltas (e.g. from a bulk import) in one upsert each.
+
+    ``months`` maps a month start to ``{column: delta}`` for monthly_rollups;
+    ``products`` maps ``(month, product_type_id)`` to ``{"kg_sold", "amount"}``.
+    """
+    for month, deltas in sorted(months.items()):
+        upsert_deltas(db, models.MonthlyRollup, {"month": month}, dict(deltas))
+    for (month, product_type_id), deltas in sorted(products.items()):
+        upsert_deltas(
+            db,
+            models.MonthlyProductRollup,
+            {"month": month, "product_type_id": product_type_id},
+            dict(deltas),
+        )
+
+
+def _grouped_by_month(db: Session, date_column, *sums):
+    year = extract("year", date_column)
+    month = extract("month", date_column)
+    rows = db.query(year, month, *sums).group_by(year, month).all()
+    return {date(int(r[0]), int(r[1]), 1): r[2:] for r in rows}
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute both rollup tables from the raw tables. Returns month count."""
+    purchases = _grouped_by_month(
+        db,
+        models.Purchase.date,
+        func.sum(models.Purchase.total_purchase_cost),
+        func.sum(models.Purchase.quantity),
+    )
+    sales = _grouped_by_month(db, models.Sale.date, func.sum(models.Sale.total_amount))
+    expenses = _grouped_by_month(
+        db, models.Expense.date, func.sum(models.Expense.amount)
+    )
+
+    year = extract("year", models.Sale.date)
+    month = extract("month", models.Sale.date)
+    product_rows = (
+        db.query(
+            year,
+            month,
+            models.SaleItem.product_type_id,
+            func.sum(models.SaleItem.quantity),
+            func.sum(models.SaleItem.total_price),
+        )
+        .join(models.Sale, models.SaleItem.sale_id == models.Sale.id)
+        .group_by(year, month, models.SaleItem.product_type_id)
+        .all()
+    )
+    kg_sold = {}
+    for row in product_rows:
+        key = date(int(row[0]), int(row[1]), 1)
+        kg_sold[key] = kg_sold.get(key, 0) + (row[3] or 0)
+
+    db.query(models.MonthlyProductRollup).delete()
+    db.query(models.MonthlyRollup).delete()
+
+    months = sorted(set(purchases) | set(sales) | set(expenses) | set(kg_sold))
+    db.add_all(
+        models.MonthlyRollup(
+            month=month_key,
+            purchases=purchases.get(month_key, (0, 0))[0] or 0,
+            kg_bought=purchases.get(month_key, (0, 0))[1] or 0,
+            sales=sales.get(month_key, (0,))[0] or 0,
+            expenses=expenses.get(month_key, (0,))[0] or 0,
+            kg_sold=kg_sold.get(month_key, 0),
+        )
+        for month_key in months
+    )
+    db.add_all(
+        models.MonthlyProductRollup(
+            month=date(int(row[0]), int(row[1]), 1),
+            product_type_id=row[2],
+            kg_sold=row[3] or 0,
+            amount=row[4] or 0,
+        )
+        for row in product_rows
+    )
+    db.commit()
+    return len(months)
@@ -50,14 +50,17 @@ def change_password(
     db: Session = Depends(get_db),
 ):
     """Change user password"""
-    from auth import verify_password, get_password_hash
+    from auth import verify_password, get_password_hash, invalidate_user_cache
 
     if not verify_password(old_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect old password"
         )
 
-    current_user.hashed_password = get_password_hash(new_password)
+    # current_user is a detached (cached) snapshot; write through this session.
+    user = db.get(models.User, current_user.id)
+    user.hashed_password = get_password_hash(new_password)
     db.commit()
+    invalidate_user_cache(user.email)
 
     return {"message": "Password changed successfully"}
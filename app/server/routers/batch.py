@@ -0,0 +1,172 @@
+"""Several GET requests in one round trip, for screens that load many at once.
+
+``POST /api/batch`` takes a list of GET paths under ``/api`` (with their query
+strings) and answers with one result per path, in order: the status code, the
+headers the route set (``ETag``, ``Last-Modified``, ``X-Next-Cursor``) and the
+body the route would have returned on its own. The dashboard's six requests
+thus pay the round trip, the token check and the pool checkout once instead of
+six times.
+
+Each sub-request runs through its route's own dependencies and response model,
+with the batch's user and database session already in FastAPI's dependency
+cache: the user is looked up once, every sub-request uses the batch's
+Session, and the analytics routes share one AsyncSession (opened by the first
+that needs it). The sub-requests run one after another, since a session must
+not be used concurrently; the batch saves the per-request overhead, not the
+time of the queries themselves.
+
+A sub-request with ``if_none_match`` gets a 304 without a body while its data
+is unchanged, as a conditional GET would. A failing sub-request (unknown path,
+invalid query parameter, missing row) reports its status and ``detail``
+without affecting the others. Streaming routes (the CSV exports) can't be
+batched.
+"""
+import asyncio
+from contextlib import AsyncExitStack
+from urllib.parse import urlsplit
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.dependencies.utils import solve_dependencies
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute, run_endpoint_function, serialize_response
+from sqlalchemy.orm import Session
+from starlette.routing import Match
+from database import get_async_db, get_db
+from auth import (
+    get_async_current_active_user,
+    get_async_current_user,
+    get_current_active_user,
+    get_current_user,
+)
+import models
+import schemas
+
+router = APIRouter(prefix="/api/batch", tags=["Batch"])
+
+# Dependencies whose value every sub-request takes from the batch
+SHARED_DEPENDENCIES = (
+    get_db,
+    get_async_db,
+    get_current_user,
+    get_current_active_user,
+    get_async_current_user,
+    get_async_current_active_user,
+)
+
+# Request headers of the batch not passed on to its sub-requests
+DROPPED_HEADERS = (b"content-length", b"content-type", b"if-none-match")
+
+
+def _route(app, scope) -> APIRoute:
+    """The GET route serving ``scope`` (404 / 405 like the app would)."""
+    method_not_allowed = False
+    for route in app.router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL and isinstance(route, APIRoute):
+            scope.update(child_scope)
+            return route
+        method_not_allowed = method_not_allowed or match == Match.PARTIAL
+    if method_not_allowed:
+        raise HTTPException(status_code=405, detail="Method Not Allowed")
+    raise HTTPException(status_code=404, detail="Not Found")
+
+
+async def _get(
+    request: Request, get: schemas.BatchGet, shared: dict, stack: AsyncExitStack
+) -> schemas.BatchGetResult:
+    url = urlsplit(get.path)
+    if url.scheme or url.netloc or not url.path.startswith("/api/"):
+        return schemas.BatchGetResult(
+            path=get.path, status=400, body={"detail": "Only /api paths can be batched"}
+        )
+    request.app.state.routers.load(url.path)
+
+    headers = [(k, v) for k, v in request.scope["headers"] if k not in DROPPED_HEADERS]
+    if get.if_none_match:
+        headers.append((b"if-none-match", get.if_none_match.encode()))
+    scope = {
+        **request.scope,
+        "method": "GET",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": headers,
+        "path_params": {},
+        "state": {},
+    }
+
+    try:
+        route = _route(request.app, scope)
+        values, errors, _, sub_response, cache = await solve_dependencies(
+            request=Request(scope),
+            dependant=route.dependant,
+            dependency_overrides_provider=request.app,
+            # Only the shared values: the rest (the ETag checks) are per route.
+            dependency_cache=dict(shared),
+            async_exit_stack=stack,
+        )
+        shared.update(
+            (key, value)
+            for key, value in cache.items()
+            if key[0] in SHARED_DEPENDENCIES
+        )
+        if errors:
+            return schemas.BatchGetResult(
+                path=get.path, status=422, body={"detail": jsonable_encoder(errors)}
+            )
+
+        is_coroutine = asyncio.iscoroutinefunction(route.dependant.call)
+        raw_response = await run_endpoint_function(
+            dependant=route.dependant, values=values, is_coroutine=is_coroutine
+        )
+        if isinstance(raw_response, Response):
+            return schemas.BatchGetResult(
+                path=get.path,
+                status=400,
+                body={"detail": "Streaming routes can't be batched"},
+            )
+        body = await serialize_response(
+            field=route.response_field,
+            response_content=raw_response,
+            include=route.response_model_include,
+            exclude=route.response_model_exclude,
+            by_alias=route.response_model_by_alias,
+            exclude_unset=route.response_model_exclude_unset,
+            exclude_defaults=route.response_model_exclude_defaults,
+            exclude_none=route.response_model_exclude_none,
+            is_coroutine=is_coroutine,
+        )
+    except HTTPException as e:
+        return schemas.BatchGetResult(
+            path=get.path,
+            status=e.status_code,
+            headers={k.lower(): v for k, v in (e.headers or {}).items()},
+            body=None if e.status_code == 304 else {"detail": e.detail},
+        )
+
+    return schemas.BatchGetResult(
+        path=get.path,
+        status=sub_response.status_code or route.status_code or 200,
+        headers=dict(sub_response.headers),
+        body=body,
+    )
+
+
+@router.post("", response_model=schemas.BatchGetResponse)
+async def batch_get(
+    batch: schemas.BatchGetRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Run several GET requests in one, with one user lookup and DB session"""
+    shared = {
+        (get_db, ()): db,
+        (get_current_user, ()): current_user,
+        (get_current_active_user, ()): current_user,
+        (get_async_current_user, ()): current_user,
+        (get_async_current_active_user, ()): current_user,
+    }
+    # Closes the AsyncSession the analytics routes open, after the last one.
+    async with AsyncExitStack() as stack:
+        responses = [await _get(request, get, shared, stack) for get in batch.requests]
+    return {"responses": responses}
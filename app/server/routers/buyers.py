@@ -1,25 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import Optional, List
 from datetime import date
-from database import get_db
+from database import SessionLocal, get_db
 from auth import get_current_active_user
+from etags import conditional
 import models
 import schemas
+import balances
+import ledger
+from pagination import keyset_page
 
 router = APIRouter(prefix="/api/buyers", tags=["Buyers"])
 
-
-@router.get("", response_model=List[schemas.BuyerResponse])
+# Tables the responses are built from (for the ETags, see etags.py).
+BUYER_TABLES = (models.Buyer, models.BuyerBalance)
+LEDGER_TABLES = BUYER_TABLES + (
+    models.BuyerMonthlyBalance,
+    models.Sale,
+    models.SaleItem,
+    models.Payment,
+    models.ProductType,
+)
+
+
+@router.get(
+    "",
+    response_model=List[schemas.BuyerResponse],
+    dependencies=[conditional(*BUYER_TABLES)],
+)
 def get_buyers(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    response: Response = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Get all buyers with optional search"""
+    """Get all buyers with optional search (pass ``cursor`` for keyset paging)"""
     query = db.query(models.Buyer)
 
     if search:
@@ -28,37 +49,53 @@ def get_buyers(
             | (models.Buyer.phone.ilike(f"%{search}%"))
         )
 
+    if cursor is not None:
+        return keyset_page(query, (models.Buyer.id,), cursor, limit, response)
+
     buyers = query.order_by(models.Buyer.id.desc()).offset(skip).limit(limit).all()
     return buyers
 
 
-@router.get("/list", response_model=List[schemas.BuyerListResponse])
+@router.get(
+    "/list",
+    response_model=List[schemas.BuyerListResponse],
+    dependencies=[conditional(*BUYER_TABLES)],
+)
 def get_buyers_list(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get simplified buyers list"""
-    buyers = db.query(models.Buyer).order_by(models.Buyer.name).all()
-
-    result = []
-    for buyer in buyers:
-        total_sales = sum(sale.total_amount for sale in buyer.sales)
-        total_payments = sum(payment.amount for payment in buyer.payments)
-        outstanding = buyer.opening_balance + total_sales - total_payments
-
-        result.append(
-            {
-                "id": buyer.id,
-                "name": buyer.name,
-                "phone": buyer.phone,
-                "outstanding_balance": outstanding,
-            }
+    rows = (
+        db.query(
+            models.Buyer.id,
+            models.Buyer.name,
+            models.Buyer.phone,
+            func.coalesce(
+                models.BuyerBalance.outstanding, models.Buyer.opening_balance, 0
+            ).label("outstanding_balance"),
         )
+        .outerjoin(models.BuyerBalance)
+        .order_by(models.Buyer.name)
+        .all()
+    )
 
-    return result
-
-
-@router.get("/{buyer_id}", response_model=schemas.BuyerResponse)
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "phone": row.phone,
+            "outstanding_balance": row.outstanding_balance,
+        }
+        for row in rows
+    ]
+
+
+@router.get(
+    "/{buyer_id}",
+    response_model=schemas.BuyerResponse,
+    dependencies=[conditional(*BUYER_TABLES)],
+)
 def get_buyer(
     buyer_id: int,
     db: Session = Depends(get_db),
@@ -80,6 +117,7 @@ def create_buyer(
     """Create a new buyer"""
     db_buyer = models.Buyer(**buyer.dict())
     db.add(db_buyer)
+    balances.init_balance(db, db_buyer)
     db.commit()
     db.refresh(db_buyer)
     return db_buyer
@@ -98,10 +136,16 @@ def update_buyer(
         raise HTTPException(status_code=404, detail="Buyer not found")
 
     update_data = buyer_update.dict(exclude_unset=True)
+    old_opening_balance = db_buyer.opening_balance or 0
 
     for key, value in update_data.items():
         setattr(db_buyer, key, value)
 
+    if (db_buyer.opening_balance or 0) != old_opening_balance:
+        balances.apply_opening_balance_change(
+            db, buyer_id, (db_buyer.opening_balance or 0) - old_opening_balance
+        )
+
     db.commit()
     db.refresh(db_buyer)
     return db_buyer
@@ -130,123 +174,89 @@ def delete_buyer(
     return {"message": "Buyer deleted successfully"}
 
 
-@router.get("/{buyer_id}/ledger", response_model=schemas.BuyerLedgerResponse)
+@router.get(
+    "/{buyer_id}/ledger",
+    response_model=schemas.BuyerLedgerResponse,
+    dependencies=[conditional(*LEDGER_TABLES)],
+)
 def get_buyer_ledger(
     buyer_id: int,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    response: Response = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Get buyer ledger (Khata)"""
+    """Get buyer ledger (Khata), newest entry first. With a date range the
+    opening balance is the balance carried forward into it.
+
+    Pass ``limit`` and/or ``cursor`` for one page at a time: the next page's
+    cursor comes back in the ``X-Next-Cursor`` header, and opening/closing
+    balances are the balances at the page's edges."""
     buyer = db.query(models.Buyer).filter(models.Buyer.id == buyer_id).first()
     if not buyer:
         raise HTTPException(status_code=404, detail="Buyer not found")
 
-    # Get sales
-    sales_query = db.query(models.Sale).filter(models.Sale.buyer_id == buyer_id)
-    if start_date:
-        sales_query = sales_query.filter(models.Sale.date >= start_date)
-    if end_date:
-        sales_query = sales_query.filter(models.Sale.date <= end_date)
-    sales = (
-        sales_query.options(
-            joinedload(models.Sale.sale_items).joinedload(models.SaleItem.product_type)
+    if limit is not None or cursor is not None:
+        entries, opening_balance, closing_balance = ledger.ledger_page(
+            db, buyer, start_date, end_date, cursor, limit or 100, response
         )
-        .order_by(models.Sale.date)
-        .all()
-    )
-
-    # Get payments
-    payments_query = db.query(models.Payment).filter(
-        models.Payment.buyer_id == buyer_id
-    )
-    if start_date:
-        payments_query = payments_query.filter(models.Payment.date >= start_date)
-    if end_date:
-        payments_query = payments_query.filter(models.Payment.date <= end_date)
-    payments = payments_query.order_by(models.Payment.date).all()
-
-    # Build ledger entries
-    entries = []
-    running_balance = buyer.opening_balance
-
-    # Combine and sort all transactions
-    transactions = []
-
-    for sale in sales:
-        # Build description from all sale items: "PLY 50kg, LAFA 30kg"
-        if sale.sale_items:
-            parts = []
-            for item in sale.sale_items:
-                prod_name = item.product_type.name if item.product_type else "Item"
-                parts.append(f"{prod_name} {item.quantity}{item.unit}")
-            desc = ", ".join(parts)
-        else:
-            desc = "Sale"
-
-        transactions.append(
-            {
-                "date": sale.date,
-                "type": "SALE",
-                "description": desc,
-                "debit": sale.total_amount,
-                "credit": 0,
-                "obj": sale,
-            }
-        )
-
-    for payment in payments:
-        transactions.append(
-            {
-                "date": payment.date,
-                "type": "PAYMENT",
-                "description": f"Payment - {payment.payment_method}",
-                "debit": 0,
-                "credit": payment.amount,
-                "obj": payment,
-            }
-        )
-
-    # Sort by date (ascending for balance calculation)
-    transactions.sort(key=lambda x: x["date"])
-
-    for txn in transactions:
-        running_balance += txn["debit"] - txn["credit"]
-        entries.append(
-            schemas.LedgerEntry(
-                date=txn["date"],
-                type=txn["type"],
-                description=txn["description"],
-                debit=txn["debit"],
-                credit=txn["credit"],
-                balance=running_balance,
-            )
+    else:
+        opening_balance = ledger.opening_balance_for(db, buyer, start_date)
+        entries = list(
+            ledger.iter_ledger(db, buyer, start_date, end_date, opening_balance)
         )
+        closing_balance = entries[-1].balance if entries else opening_balance
 
-    # Reverse entries to show newest first
-    entries.reverse()
-
-    total_sales = sum(sale.total_amount for sale in sales)
-    total_payments = sum(payment.amount for payment in payments)
-    closing_balance = buyer.opening_balance + total_sales - total_payments
+        # Reverse entries to show newest first
+        entries.reverse()
 
     return schemas.BuyerLedgerResponse(
         buyer=buyer,
         entries=entries,
-        opening_balance=buyer.opening_balance,
+        opening_balance=opening_balance,
         closing_balance=closing_balance,
     )
 
 
-@router.post("/{buyer_id}/payments", response_model=schemas.PaymentResponse)
-def add_payment(
+def _stream_ledger(buyer_id: int, start_date, end_date):
+    # Own session: get_db's is closed before a streaming body is sent.
+    db = SessionLocal()
+    try:
+        buyer = db.get(models.Buyer, buyer_id)
+        for entry in ledger.iter_ledger(
+            db, buyer, start_date, end_date, newest_first=True
+        ):
+            yield entry.model_dump_json() + "\n"
+    finally:
+        db.close()
+
+
+@router.get("/{buyer_id}/ledger/stream")
+def stream_buyer_ledger(
     buyer_id: int,
-    payment: schemas.PaymentCreate,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Add a payment for a buyer"""
+    """Stream the buyer ledger as NDJSON, one entry per line, newest first
+    (each line carries its running balance)"""
+    if not db.get(models.Buyer, buyer_id):
+        raise HTTPException(status_code=404, detail="Buyer not found")
+    return StreamingResponse(
+        _stream_ledger(buyer_id, start_date, end_date),
+        media_type="application/x-ndjson",
+    )
+
+
+def add_buyer_payment(
+    db: Session, buyer_id: int, payment: schemas.PaymentCreate
+) -> models.Payment:
+    """Add a payment for a buyer to the session, updating the balances; the
+    caller commits. 404 if the buyer doesn't exist."""
     buyer = db.query(models.Buyer).filter(models.Buyer.id == buyer_id).first()
     if not buyer:
         raise HTTPException(status_code=404, detail="Buyer not found")
@@ -260,12 +270,29 @@ def add_payment(
     )
 
     db.add(db_payment)
+    balances.apply_payment(db, db_payment)
+    return db_payment
+
+
+@router.post("/{buyer_id}/payments", response_model=schemas.PaymentResponse)
+def add_payment(
+    buyer_id: int,
+    payment: schemas.PaymentCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Add a payment for a buyer"""
+    db_payment = add_buyer_payment(db, buyer_id, payment)
     db.commit()
     db.refresh(db_payment)
     return db_payment
 
 
-@router.get("/{buyer_id}/payments", response_model=List[schemas.PaymentResponse])
+@router.get(
+    "/{buyer_id}/payments",
+    response_model=List[schemas.PaymentResponse],
+    dependencies=[conditional(*BUYER_TABLES, models.Payment)],
+)
 def get_buyer_payments(
     buyer_id: int,
     db: Session = Depends(get_db),
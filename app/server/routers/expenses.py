@@ -1,27 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import Optional, List
 from datetime import date
 from database import get_db
 from auth import get_current_active_user
+from etags import conditional
 import models
 import schemas
+import rollups
+from pagination import keyset_page
 
 router = APIRouter(prefix="/api/expenses", tags=["Expenses"])
 
 
-@router.get("", response_model=List[schemas.ExpenseResponse])
+@router.get(
+    "",
+    response_model=List[schemas.ExpenseResponse],
+    dependencies=[conditional(models.Expense)],
+)
 def get_expenses(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     category: Optional[schemas.ExpenseCategory] = None,
+    cursor: Optional[str] = None,
+    response: Response = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Get all expenses with optional filters"""
+    """Get all expenses with optional filters (pass ``cursor`` for keyset paging)"""
     query = db.query(models.Expense)
 
     if start_date:
@@ -31,6 +40,11 @@ def get_expenses(
     if category:
         query = query.filter(models.Expense.category == category)
 
+    if cursor is not None:
+        return keyset_page(
+            query, (models.Expense.date, models.Expense.id), cursor, limit, response
+        )
+
     expenses = (
         query.order_by(models.Expense.date.desc(), models.Expense.id.desc())
         .offset(skip)
@@ -40,7 +54,11 @@ def get_expenses(
     return expenses
 
 
-@router.get("/{expense_id}", response_model=schemas.ExpenseResponse)
+@router.get(
+    "/{expense_id}",
+    response_model=schemas.ExpenseResponse,
+    dependencies=[conditional(models.Expense)],
+)
 def get_expense(
     expense_id: int,
     db: Session = Depends(get_db),
@@ -53,6 +71,14 @@ def get_expense(
     return expense
 
 
+def add_expense(db: Session, expense: schemas.ExpenseCreate) -> models.Expense:
+    """Add an expense to the session, updating the rollups; the caller commits."""
+    db_expense = models.Expense(**expense.dict())
+    db.add(db_expense)
+    rollups.apply_expense(db, db_expense)
+    return db_expense
+
+
 @router.post("", response_model=schemas.ExpenseResponse, status_code=201)
 def create_expense(
     expense: schemas.ExpenseCreate,
@@ -60,8 +86,7 @@ def create_expense(
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Create a new expense"""
-    db_expense = models.Expense(**expense.dict())
-    db.add(db_expense)
+    db_expense = add_expense(db, expense)
     db.commit()
     db.refresh(db_expense)
     return db_expense
@@ -83,8 +108,10 @@ def update_expense(
 
     update_data = expense_update.dict(exclude_unset=True)
 
+    rollups.apply_expense(db, db_expense, -1)
     for key, value in update_data.items():
         setattr(db_expense, key, value)
+    rollups.apply_expense(db, db_expense)
 
     db.commit()
     db.refresh(db_expense)
@@ -104,12 +131,13 @@ def delete_expense(
     if not db_expense:
         raise HTTPException(status_code=404, detail="Expense not found")
 
+    rollups.apply_expense(db, db_expense, -1)
     db.delete(db_expense)
     db.commit()
     return {"message": "Expense deleted successfully"}
 
 
-@router.get("/stats/today")
+@router.get("/stats/today", dependencies=[conditional(models.Expense, daily=True)])
 def get_today_expenses_stats(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
@@ -125,7 +153,7 @@ def get_today_expenses_stats(
     return {"today_expenses": result or 0}
 
 
-@router.get("/stats/by-category")
+@router.get("/stats/by-category", dependencies=[conditional(models.Expense)])
 def get_expenses_by_category(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
@@ -0,0 +1,209 @@
+"""Streaming CSV exports of the ledgers.
+
+Rows are read in batches of ``BATCH_SIZE`` through server-side cursors
+(``yield_per``) and written to the response as they arrive, so an export of
+years of data starts downloading immediately and uses constant memory.
+
+The generator opens its own session: FastAPI closes ``get_db`` sessions before
+a ``StreamingResponse`` body is sent, so only the authentication (and the
+buyer lookup for the ledger) use the request's session.
+"""
+import csv
+import enum
+import io
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import SessionLocal, get_db
+from auth import get_current_active_user
+import models
+import ledger
+
+router = APIRouter(prefix="/api/export", tags=["Export"])
+
+BATCH_SIZE = 1000
+
+PURCHASE_COLUMNS = (
+    models.Purchase.id,
+    models.Purchase.date,
+    models.Purchase.seller_name,
+    models.Purchase.seller_phone,
+    models.Purchase.pickup_location,
+    models.Purchase.transport_service,
+    models.Purchase.transport_cost,
+    models.Purchase.quantity,
+    models.Purchase.unit,
+    models.Purchase.price_per_unit,
+    models.Purchase.total_purchase_cost,
+    models.Purchase.actual_paid_amount,
+    models.Purchase.notes,
+)
+
+# One row per sale item; the sale's own columns repeat on each of its items.
+SALE_COLUMNS = (
+    models.Sale.id.label("sale_id"),
+    models.Sale.date,
+    models.Buyer.name.label("buyer"),
+    models.Sale.payment_type,
+    models.Sale.payment_received_now,
+    models.Sale.total_amount,
+    models.ProductType.name.label("product"),
+    models.SaleItem.quantity,
+    models.SaleItem.unit,
+    models.SaleItem.price_per_unit,
+    models.SaleItem.total_price,
+    models.Sale.notes,
+)
+
+EXPENSE_COLUMNS = (
+    models.Expense.id,
+    models.Expense.date,
+    models.Expense.category,
+    models.Expense.amount,
+    models.Expense.description,
+)
+
+LEDGER_HEADER = ("date", "type", "description", "debit", "credit", "balance")
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class _CsvBuffer:
+    """csv.writer target that hands back what was written since the last call."""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self.writer = csv.writer(self._buffer)
+
+    def take(self) -> str:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def _stream_statement(statement):
+    out = _CsvBuffer()
+    out.writer.writerow(column.key for column in statement.selected_columns)
+    yield out.take()
+
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+        for rows in result.partitions():
+            out.writer.writerows([_cell(value) for value in row] for row in rows)
+            yield out.take()
+    finally:
+        db.close()
+
+
+def _stream_ledger(buyer_id: int, start_date, end_date):
+    out = _CsvBuffer()
+    out.writer.writerow(LEDGER_HEADER)
+    yield out.take()
+
+    db = SessionLocal()
+    try:
+        buyer = db.get(models.Buyer, buyer_id)
+        for count, entry in enumerate(
+            ledger.iter_ledger(db, buyer, start_date, end_date), start=1
+        ):
+            out.writer.writerow(_cell(getattr(entry, key)) for key in LEDGER_HEADER)
+            if count % BATCH_SIZE == 0:
+                yield out.take()
+        yield out.take()
+    finally:
+        db.close()
+
+
+def _csv_response(rows, name: str) -> StreamingResponse:
+    filename = f"{name}-{date.today().isoformat()}.csv"
+    return StreamingResponse(
+        rows,
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _date_filtered(statement, column, start_date, end_date):
+    if start_date:
+        statement = statement.where(column >= start_date)
+    if end_date:
+        statement = statement.where(column <= end_date)
+    return statement
+
+
+@router.get("/purchases")
+def export_purchases(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Download purchases as CSV"""
+    statement = _date_filtered(
+        select(*PURCHASE_COLUMNS), models.Purchase.date, start_date, end_date
+    ).order_by(models.Purchase.date, models.Purchase.id)
+    return _csv_response(_stream_statement(statement), "purchases")
+
+
+@router.get("/sales")
+def export_sales(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Download sales as CSV (one row per sale item)"""
+    statement = (
+        select(*SALE_COLUMNS)
+        .join(models.Buyer, models.Sale.buyer_id == models.Buyer.id)
+        .outerjoin(models.SaleItem, models.SaleItem.sale_id == models.Sale.id)
+        .outerjoin(
+            models.ProductType,
+            models.SaleItem.product_type_id == models.ProductType.id,
+        )
+    )
+    statement = _date_filtered(
+        statement, models.Sale.date, start_date, end_date
+    ).order_by(models.Sale.date, models.Sale.id, models.SaleItem.id)
+    return _csv_response(_stream_statement(statement), "sales")
+
+
+@router.get("/expenses")
+def export_expenses(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Download expenses as CSV"""
+    statement = _date_filtered(
+        select(*EXPENSE_COLUMNS), models.Expense.date, start_date, end_date
+    ).order_by(models.Expense.date, models.Expense.id)
+    return _csv_response(_stream_statement(statement), "expenses")
+
+
+@router.get("/buyers/{buyer_id}/ledger")
+def export_buyer_ledger(
+    buyer_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Download a buyer's ledger (Khata) as CSV, oldest entry first"""
+    buyer = db.get(models.Buyer, buyer_id)
+    if not buyer:
+        raise HTTPException(status_code=404, detail="Buyer not found")
+    return _csv_response(
+        _stream_ledger(buyer_id, start_date, end_date), f"ledger-buyer-{buyer_id}"
+    )
@@ -0,0 +1,328 @@
+"""Bulk import of ledger history from CSV or NDJSON files.
+
+``POST /api/import/{sales|purchases|expenses|payments}`` takes a file upload,
+validates each record against the same Create schema the single-row routes
+use, and inserts valid records in chunks of ``CHUNK_SIZE`` with one multi-row
+INSERT per table per chunk. Balances and monthly rollups are then updated once
+from aggregated deltas instead of once per row.
+
+The import is all-or-nothing: it runs in a single transaction. If any record
+is invalid, validation still runs to the end of the file so the response can
+list every bad line (up to ``MAX_REPORTED_ERRORS``), and nothing is committed.
+
+CSV columns are the schema field names; empty cells fall back to the schema
+defaults. For sales, each CSV row is one sale item (``product_type_id``,
+``quantity``, ``unit``, ``price_per_unit``). Consecutive rows with the same
+``ref`` form one sale, and its sale-level fields are taken from the first row.
+NDJSON lines are full objects, so sales carry a ``sale_items`` array.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal
+from typing import Optional
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from database import get_db
+from auth import get_current_active_user
+import models
+import schemas
+import balances
+import rollups
+from money import money
+
+router = APIRouter(prefix="/api/import", tags=["Import"])
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+CREATE_SCHEMAS = {
+    schemas.ImportKind.SALES: schemas.SaleCreate,
+    schemas.ImportKind.PURCHASES: schemas.PurchaseCreate,
+    schemas.ImportKind.EXPENSES: schemas.ExpenseCreate,
+    schemas.ImportKind.PAYMENTS: schemas.PaymentCreate,
+}
+
+SALE_ITEM_FIELDS = ("product_type_id", "quantity", "unit", "price_per_unit")
+
+
+# ============== READERS ==============
+def _read_csv(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, {
+            key.strip(): value.strip()
+            for key, value in row.items()
+            if key and isinstance(value, str) and value.strip()
+        }
+
+
+def _read_ndjson(stream):
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            yield line, ValueError(f"invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            record = ValueError("expected a JSON object")
+        yield line, record
+
+
+def _group_sale_rows(records):
+    """Merge consecutive CSV rows sharing a ``ref`` into one sale."""
+    current, current_line, current_ref = None, None, None
+    for line, row in records:
+        if isinstance(row, Exception):
+            yield line, row
+            continue
+        ref = row.pop("ref", None)
+        item = {key: row.pop(key) for key in SALE_ITEM_FIELDS if key in row}
+        if current is not None and ref is not None and ref == current_ref:
+            current["sale_items"].append(item)
+            continue
+        if current is not None:
+            yield current_line, current
+        current, current_line, current_ref = {**row, "sale_items": [item]}, line, ref
+    if current is not None:
+        yield current_line, current
+
+
+def _detect_format(file: UploadFile) -> schemas.ImportFormat:
+    name = (file.filename or "").lower()
+    content_type = (file.content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return schemas.ImportFormat.NDJSON
+    return schemas.ImportFormat.CSV
+
+
+# ============== WRITERS ==============
+class _Totals:
+    """Balance and rollup deltas accumulated over the whole import."""
+
+    def __init__(self):
+        self.months = defaultdict(lambda: defaultdict(Decimal))
+        self.products = defaultdict(lambda: defaultdict(Decimal))
+        # keyed by (buyer_id, month)
+        self.buyer_sales = defaultdict(Decimal)
+        self.buyer_payments = defaultdict(Decimal)
+
+    def apply(self, db: Session):
+        rollups.apply_totals(db, self.months, self.products)
+        balances.apply_totals(db, self.buyer_sales, self.buyer_payments)
+
+
+def _insert_expenses(db: Session, expenses, totals: _Totals):
+    db.execute(insert(models.Expense), expenses)
+    for expense in expenses:
+        month = totals.months[rollups.month_start(expense["date"])]
+        month["expenses"] += expense["amount"]
+
+
+def _insert_purchases(db: Session, purchases, totals: _Totals):
+    rows = []
+    for purchase in purchases:
+        total_cost = money(purchase.quantity * purchase.price_per_unit)
+        total_cost += purchase.transport_cost
+        rows.append({**purchase.dict(), "total_purchase_cost": total_cost})
+        month = totals.months[rollups.month_start(purchase.date)]
+        month["purchases"] += total_cost
+        month["kg_bought"] += purchase.quantity
+    purchase_ids = db.scalars(
+        insert(models.Purchase).returning(
+            models.Purchase.id, sort_by_parameter_order=True
+        ),
+        rows,
+    ).all()
+
+    # Same automatic transport expense as create_purchase.
+    transport_expenses = []
+    for purchase_id, purchase in zip(purchase_ids, purchases):
+        if purchase.transport_cost > 0:
+            description = f"Transport cost for purchase from {purchase.seller_name}"
+            if purchase.transport_service:
+                description += f" ({purchase.transport_service})"
+            transport_expenses.append(
+                {
+                    "date": purchase.date,
+                    "category": models.ExpenseCategory.TRANSPORT,
+                    "amount": purchase.transport_cost,
+                    "description": description,
+                    "purchase_id": purchase_id,
+                }
+            )
+    if transport_expenses:
+        _insert_expenses(db, transport_expenses, totals)
+
+
+def _insert_payments(db: Session, payments, totals: _Totals):
+    rows = [payment.dict() for payment in payments]
+    db.execute(insert(models.Payment), rows)
+    for row in rows:
+        key = (row["buyer_id"], rollups.month_start(row["date"]))
+        totals.buyer_payments[key] += row["amount"]
+
+
+def _insert_sales(db: Session, sales, totals: _Totals):
+    line_totals = [
+        [money(item.quantity * item.price_per_unit) for item in sale.sale_items]
+        for sale in sales
+    ]
+    rows = [
+        {**sale.dict(exclude={"sale_items"}), "total_amount": sum(sale_totals)}
+        for sale, sale_totals in zip(sales, line_totals)
+    ]
+    sale_ids = db.scalars(
+        insert(models.Sale).returning(models.Sale.id, sort_by_parameter_order=True),
+        rows,
+    ).all()
+
+    items, payments = [], []
+    for sale_id, sale, row, sale_totals in zip(sale_ids, sales, rows, line_totals):
+        month_start = rollups.month_start(sale.date)
+        month = totals.months[month_start]
+        month["sales"] += row["total_amount"]
+        totals.buyer_sales[(sale.buyer_id, month_start)] += row["total_amount"]
+        for item, total_price in zip(sale.sale_items, sale_totals):
+            items.append(
+                {**item.dict(), "sale_id": sale_id, "total_price": total_price}
+            )
+            month["kg_sold"] += item.quantity
+            product = totals.products[(month_start, item.product_type_id)]
+            product["kg_sold"] += item.quantity
+            product["amount"] += total_price
+        # Same automatic payment record as create_sale.
+        if sale.payment_received_now > 0:
+            payments.append(
+                {
+                    "date": sale.date,
+                    "buyer_id": sale.buyer_id,
+                    "amount": sale.payment_received_now,
+                    "payment_method": "Cash",
+                    "notes": f"Payment for Sale #{sale_id}",
+                }
+            )
+            key = (sale.buyer_id, month_start)
+            totals.buyer_payments[key] += sale.payment_received_now
+
+    if items:
+        db.execute(insert(models.SaleItem), items)
+    if payments:
+        db.execute(insert(models.Payment), payments)
+
+
+def _write_chunk(db: Session, kind: schemas.ImportKind, records, totals: _Totals):
+    if kind == schemas.ImportKind.SALES:
+        _insert_sales(db, records, totals)
+    elif kind == schemas.ImportKind.PURCHASES:
+        _insert_purchases(db, records, totals)
+    elif kind == schemas.ImportKind.EXPENSES:
+        _insert_expenses(db, [record.dict() for record in records], totals)
+    else:
+        _insert_payments(db, records, totals)
+
+
+# ============== VALIDATION ==============
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def _reference_errors(kind, record, buyer_ids, product_type_ids) -> Optional[str]:
+    """Foreign keys are checked up front so one bad id can't fail a whole chunk."""
+    if kind in (schemas.ImportKind.SALES, schemas.ImportKind.PAYMENTS):
+        if record.buyer_id not in buyer_ids:
+            return f"buyer_id: buyer {record.buyer_id} not found"
+    if kind == schemas.ImportKind.SALES:
+        for item in record.sale_items:
+            if item.product_type_id not in product_type_ids:
+                return f"product_type_id: product type {item.product_type_id} not found"
+    return None
+
+
+@router.post("/{kind}", response_model=schemas.ImportResult)
+def import_records(
+    kind: schemas.ImportKind,
+    file: UploadFile = File(...),
+    format: Optional[schemas.ImportFormat] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Import sales, purchases, expenses or payments from a CSV or NDJSON file
+    (all-or-nothing; format defaults from the file extension)"""
+    schema = CREATE_SCHEMAS[kind]
+    file_format = format or _detect_format(file)
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    if file_format == schemas.ImportFormat.CSV:
+        records = _read_csv(stream)
+        if kind == schemas.ImportKind.SALES:
+            records = _group_sale_rows(records)
+    else:
+        records = _read_ndjson(stream)
+
+    buyer_ids = {row[0] for row in db.query(models.Buyer.id)}
+    product_type_ids = {row[0] for row in db.query(models.ProductType.id)}
+
+    totals = _Totals()
+    chunk, imported, errors, error_count = [], 0, [], 0
+    # The upload is decoded as the records are read, so bytes that are not
+    # UTF-8 raise from the loop itself rather than from one record.
+    try:
+        for line, raw in records:
+            try:
+                if isinstance(raw, Exception):
+                    raise raw
+                record = schema(**raw)
+                error = _reference_errors(kind, record, buyer_ids, product_type_ids)
+            except ValidationError as e:
+                error = _format_validation_error(e)
+            except (ValueError, TypeError) as e:
+                error = str(e)
+
+            if error:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(schemas.ImportRowError(line=line, error=error))
+                continue
+            if error_count:
+                continue  # nothing will be committed; keep validating only
+
+            chunk.append(record)
+            if len(chunk) >= CHUNK_SIZE:
+                _write_chunk(db, kind, chunk, totals)
+                imported += len(chunk)
+                chunk = []
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": "The file must be UTF-8 encoded; nothing was imported",
+                "errors": [],
+            },
+        )
+
+    if error_count:
+        db.rollback()
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": f"{error_count} invalid record(s); nothing was imported",
+                "errors": [error.dict() for error in errors],
+            },
+        )
+
+    if chunk:
+        _write_chunk(db, kind, chunk, totals)
+        imported += len(chunk)
+    totals.apply(db)
+    db.commit()
+    return schemas.ImportResult(kind=kind, imported=imported)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from auth import get_current_active_user
+import models
+import instrumentation
+import cache
+import database
+
+router = APIRouter(prefix="/api/_metrics", tags=["Metrics"])
+
+
+@router.get("")
+def get_metrics(
+    reset: bool = False,
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Per-route request counts, latency histograms and DB time since startup,
+    plus the report cache's hit/miss counters and connection pool utilisation"""
+    metrics = instrumentation.snapshot()
+    metrics["cache"] = cache.stats()
+    metrics["database"] = database.pool_status()
+    if reset:
+        instrumentation.reset()
+        cache.reset_stats()
+    return metrics
@@ -0,0 +1,219 @@
+"""Batched, idempotent writes for replaying entries queued offline.
+
+``POST /api/batch-mutations`` takes an ordered list of operations, each with a
+client-generated ``idempotency_key`` (a UUID per queued entry), an ``op``
+(``create_sale``, ``create_purchase``, ``add_payment``, ``create_expense``)
+and the ``data`` the matching single-row route takes as its body. They are
+applied in order in ONE transaction and committed once, and the response
+holds one result per operation: the status code and body the single-row route
+would have returned, or the error.
+
+Each operation runs in its own savepoint, so an invalid one (a validation
+error, an unknown buyer, a value or statement the database rejects) is rolled
+back and reported without affecting the rest. An operation that succeeds
+stores its result under its key in ``idempotency_keys`` in the same
+transaction. When the same key arrives again (a retry after a lost response,
+or twice in one batch) the operation is not applied a second time; its stored
+result is returned with ``replayed: true``. Failed operations store nothing,
+so they can be fixed and retried under the same key. A key is remembered for ``IDEMPOTENCY_KEY_DAYS``.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import ValidationError
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from database import get_db
+from auth import get_current_active_user
+import models
+import schemas
+from routers import buyers, expenses, purchases, sales
+
+router = APIRouter(prefix="/api/batch-mutations", tags=["Batch"])
+
+IDEMPOTENCY_KEY_DAYS = int(os.getenv("IDEMPOTENCY_KEY_DAYS", "30"))
+
+logger = logging.getLogger("kastbhanjan.mutations")
+
+
+def _add_payment(db: Session, payment: schemas.PaymentCreate):
+    return buyers.add_buyer_payment(db, payment.buyer_id, payment)
+
+
+# op -> (request schema, helper adding it to the session, response schema,
+#        status code of the single-row route)
+OPERATIONS = {
+    schemas.MutationOp.CREATE_SALE: (
+        schemas.SaleCreate,
+        sales.add_sale,
+        schemas.SaleResponse,
+        201,
+    ),
+    schemas.MutationOp.CREATE_PURCHASE: (
+        schemas.PurchaseCreate,
+        purchases.add_purchase,
+        schemas.PurchaseResponse,
+        201,
+    ),
+    schemas.MutationOp.ADD_PAYMENT: (
+        schemas.PaymentCreate,
+        _add_payment,
+        schemas.PaymentResponse,
+        200,
+    ),
+    schemas.MutationOp.CREATE_EXPENSE: (
+        schemas.ExpenseCreate,
+        expenses.add_expense,
+        schemas.ExpenseResponse,
+        201,
+    ),
+}
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def _check_references(db: Session, record):
+    """404 for a sale naming an unknown buyer or product type (the payment
+    helper checks its buyer itself)."""
+    if not isinstance(record, schemas.SaleCreate):
+        return
+    if db.get(models.Buyer, record.buyer_id) is None:
+        raise HTTPException(status_code=404, detail="Buyer not found")
+    for item in record.sale_items:
+        if db.get(models.ProductType, item.product_type_id) is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Product type {item.product_type_id} not found",
+            )
+
+
+def _replay(operation: schemas.BatchOperation, stored: models.IdempotencyKey):
+    if stored.operation != operation.op.value:
+        return schemas.BatchOperationResult(
+            idempotency_key=operation.idempotency_key,
+            op=operation.op,
+            status=422,
+            error=f"Idempotency key already used for {stored.operation}",
+        )
+    return schemas.BatchOperationResult(
+        idempotency_key=operation.idempotency_key,
+        op=operation.op,
+        status=OPERATIONS[operation.op][3],
+        replayed=True,
+        result=stored.response,
+    )
+
+
+def _apply(db: Session, operation: schemas.BatchOperation):
+    """Apply one operation in its own savepoint, as ``(stored key, result)``;
+    the key is None when nothing was stored"""
+    request_schema, add, response_schema, status = OPERATIONS[operation.op]
+    key = operation.idempotency_key
+    try:
+        record = request_schema(**operation.data)
+    except ValidationError as e:
+        return None, schemas.BatchOperationResult(
+            idempotency_key=key,
+            op=operation.op,
+            status=422,
+            error=_format_validation_error(e),
+        )
+
+    try:
+        with db.begin_nested():
+            _check_references(db, record)
+            obj = add(db, record)
+            db.flush()
+            stored = models.IdempotencyKey(
+                key=key,
+                operation=operation.op.value,
+                response=response_schema.model_validate(obj).model_dump(mode="json"),
+            )
+            db.add(stored)
+            # A concurrent request that applied the same key makes this fail,
+            # which rolls the operation back with the savepoint.
+            db.flush()
+    except HTTPException as e:
+        return None, schemas.BatchOperationResult(
+            idempotency_key=key, op=operation.op, status=e.status_code, error=e.detail
+        )
+    except ValidationError as e:
+        return None, schemas.BatchOperationResult(
+            idempotency_key=key,
+            op=operation.op,
+            status=422,
+            error=_format_validation_error(e),
+        )
+    except IntegrityError:
+        stored = db.get(models.IdempotencyKey, key)
+        if stored is not None:  # applied by a concurrent request meanwhile
+            return stored, _replay(operation, stored)
+        return None, schemas.BatchOperationResult(
+            idempotency_key=key,
+            op=operation.op,
+            status=409,
+            error="Conflicts with existing data",
+        )
+    except DataError:
+        return None, schemas.BatchOperationResult(
+            idempotency_key=key,
+            op=operation.op,
+            status=422,
+            error="Value rejected by the database",
+        )
+    except SQLAlchemyError:
+        logger.exception("Batch operation %s failed", key)
+        return None, schemas.BatchOperationResult(
+            idempotency_key=key, op=operation.op, status=500, error="Database error"
+        )
+
+    return stored, schemas.BatchOperationResult(
+        idempotency_key=key, op=operation.op, status=status, result=stored.response
+    )
+
+
+@router.post("", response_model=schemas.BatchMutationResponse)
+def apply_batch_mutations(
+    batch: schemas.BatchMutationRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Apply queued create operations in order, in one transaction; replayed
+    idempotency keys return their first result"""
+    keys = {operation.idempotency_key for operation in batch.operations}
+    seen = {
+        row.key: row
+        for row in db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.key.in_(keys)
+        )
+    }
+
+    results = []
+    for operation in batch.operations:
+        stored = seen.get(operation.idempotency_key)
+        if stored is not None:
+            results.append(_replay(operation, stored))
+            continue
+        stored, result = _apply(db, operation)
+        if stored is not None:
+            seen[operation.idempotency_key] = stored
+        results.append(result)
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=IDEMPOTENCY_KEY_DAYS)
+    db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.created_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    return {
+        "applied": sum(1 for r in results if r.error is None and not r.replayed),
+        "replayed": sum(1 for r in results if r.replayed),
+        "failed": sum(1 for r in results if r.error is not None),
+        "results": results,
+    }
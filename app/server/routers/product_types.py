@@ -3,12 +3,17 @@ from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
 from auth import get_current_active_user
+from etags import conditional
 import models
 import schemas
 
 router = APIRouter(prefix="/api/product-types", tags=["Product Types"])
 
-@router.get("", response_model=List[schemas.ProductTypeResponse])
+@router.get(
+    "",
+    response_model=List[schemas.ProductTypeResponse],
+    dependencies=[conditional(models.ProductType)],
+)
 def get_product_types(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
@@ -17,7 +22,11 @@ def get_product_types(
     product_types = db.query(models.ProductType).order_by(models.ProductType.name).all()
     return product_types
 
-@router.get("/{product_type_id}", response_model=schemas.ProductTypeResponse)
+@router.get(
+    "/{product_type_id}",
+    response_model=schemas.ProductTypeResponse,
+    dependencies=[conditional(models.ProductType)],
+)
 def get_product_type(
     product_type_id: int,
     db: Session = Depends(get_db),
@@ -100,6 +109,10 @@ def delete_product_type(
             detail="Cannot delete product type that is used in sales"
         )
     
+    # Only all-zero rollup rows can remain once no sale uses this product
+    db.query(models.MonthlyProductRollup).filter(
+        models.MonthlyProductRollup.product_type_id == product_type_id
+    ).delete()
     db.delete(db_product_type)
     db.commit()
     return {"message": "Product type deleted successfully"}
\ No newline at end of file
@@ -1,28 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import Optional, List
 from datetime import date, datetime
 from database import get_db
 from auth import get_current_active_user
+from etags import conditional
 import models
 import schemas
+import rollups
+from money import money
+from pagination import keyset_page
 
 router = APIRouter(prefix="/api/purchases", tags=["Purchases"])
 
 
-@router.get("", response_model=List[schemas.PurchaseResponse])
+@router.get(
+    "",
+    response_model=List[schemas.PurchaseResponse],
+    dependencies=[conditional(models.Purchase)],
+)
 def get_purchases(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     seller_name: Optional[str] = None,
     # scrap_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    response: Response = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Get all purchases with optional filters"""
+    """Get all purchases with optional filters (pass ``cursor`` for keyset paging)"""
     query = db.query(models.Purchase)
 
     if start_date:
@@ -34,6 +44,11 @@ def get_purchases(
     # if scrap_type:
     #     query = query.filter(models.Purchase.scrap_type.ilike(f"%{scrap_type}%"))
 
+    if cursor is not None:
+        return keyset_page(
+            query, (models.Purchase.date, models.Purchase.id), cursor, limit, response
+        )
+
     purchases = (
         query.order_by(models.Purchase.date.desc(), models.Purchase.id.desc())
         .offset(skip)
@@ -43,7 +58,11 @@ def get_purchases(
     return purchases
 
 
-@router.get("/{purchase_id}", response_model=schemas.PurchaseResponse)
+@router.get(
+    "/{purchase_id}",
+    response_model=schemas.PurchaseResponse,
+    dependencies=[conditional(models.Purchase)],
+)
 def get_purchase(
     purchase_id: int,
     db: Session = Depends(get_db),
@@ -58,6 +77,60 @@ def get_purchase(
     return purchase
 
 
+# Purchase fields copied onto its transport expense
+TRANSPORT_FIELDS = {"date", "seller_name", "transport_service", "transport_cost"}
+
+
+def _transport_description(purchase) -> str:
+    return f"Transport cost for purchase from {purchase.seller_name}" + (
+        f" ({purchase.transport_service})" if purchase.transport_service else ""
+    )
+
+
+def _sync_transport_expense(db: Session, purchase: models.Purchase):
+    """Create, update or delete the purchase's transport expense to match it.
+
+    The expense is linked by ``purchase_id`` and written in the caller's
+    transaction, so it is committed together with the purchase."""
+    expense = purchase.transport_expense
+    if expense:
+        rollups.apply_expense(db, expense, -1)
+        if purchase.transport_cost > 0:
+            expense.date = purchase.date
+            expense.amount = purchase.transport_cost
+            expense.description = _transport_description(purchase)
+            rollups.apply_expense(db, expense)
+        else:
+            # Delete expense if transport cost is now 0
+            db.delete(expense)
+    elif purchase.transport_cost > 0:
+        purchase.transport_expense = models.Expense(
+            date=purchase.date,
+            category=models.ExpenseCategory.TRANSPORT,
+            amount=purchase.transport_cost,
+            description=_transport_description(purchase),
+        )
+        rollups.apply_expense(db, purchase.transport_expense)
+
+
+def add_purchase(db: Session, purchase: schemas.PurchaseCreate) -> models.Purchase:
+    """Add a purchase (and its transport expense) to the session, updating the
+    rollups; the caller commits."""
+    # Calculate total purchase cost
+    total_cost = (
+        money(purchase.quantity * purchase.price_per_unit) + purchase.transport_cost
+    )
+
+    db_purchase = models.Purchase(**purchase.dict(), total_purchase_cost=total_cost)
+
+    db.add(db_purchase)
+    rollups.apply_purchase(db, db_purchase)
+
+    # Automatically create expense entry for transport cost
+    _sync_transport_expense(db, db_purchase)
+    return db_purchase
+
+
 @router.post("", response_model=schemas.PurchaseResponse, status_code=201)
 def create_purchase(
     purchase: schemas.PurchaseCreate,
@@ -65,29 +138,9 @@ def create_purchase(
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Create a new purchase"""
-    # Calculate total purchase cost
-    total_cost = (purchase.quantity * purchase.price_per_unit) + purchase.transport_cost
-
-    db_purchase = models.Purchase(**purchase.dict(), total_purchase_cost=total_cost)
-
-    db.add(db_purchase)
+    db_purchase = add_purchase(db, purchase)
     db.commit()
     db.refresh(db_purchase)
-
-    # Automatically create expense entry for transport cost
-    if purchase.transport_cost > 0:
-        transport_expense = models.Expense(
-            date=purchase.date,
-            category=models.ExpenseCategory.TRANSPORT,
-            amount=purchase.transport_cost,
-            description=f"Transport cost for purchase from {purchase.seller_name}"
-            + (
-                f" ({purchase.transport_service})" if purchase.transport_service else ""
-            ),
-        )
-        db.add(transport_expense)
-        db.commit()
-
     return db_purchase
 
 
@@ -107,10 +160,6 @@ def update_purchase(
 
     update_data = purchase_update.dict(exclude_unset=True)
 
-    # Track if transport cost changed
-    old_transport_cost = db_purchase.transport_cost
-    transport_cost_changed = "transport_cost" in update_data
-
     # Recalculate total if quantity or price changed
     quantity = update_data.get("quantity", db_purchase.quantity)
     price_per_unit = update_data.get("price_per_unit", db_purchase.price_per_unit)
@@ -122,62 +171,19 @@ def update_purchase(
         or "transport_cost" in update_data
     ):
         update_data["total_purchase_cost"] = (
-            quantity * price_per_unit
-        ) + transport_cost
+            money(quantity * price_per_unit) + transport_cost
+        )
 
+    rollups.apply_purchase(db, db_purchase, -1)
     for key, value in update_data.items():
         setattr(db_purchase, key, value)
+    rollups.apply_purchase(db, db_purchase)
+
+    if update_data.keys() & TRANSPORT_FIELDS:
+        _sync_transport_expense(db, db_purchase)
 
     db.commit()
     db.refresh(db_purchase)
-
-    # Update or create transport expense if transport cost changed
-    if transport_cost_changed:
-        # Find existing transport expense for this purchase
-        existing_expense = (
-            db.query(models.Expense)
-            .filter(
-                models.Expense.date == db_purchase.date,
-                models.Expense.category == models.ExpenseCategory.TRANSPORT,
-                models.Expense.description.like(
-                    f"%purchase from {db_purchase.seller_name}%"
-                ),
-            )
-            .first()
-        )
-
-        if existing_expense:
-            if transport_cost > 0:
-                # Update existing expense
-                existing_expense.amount = transport_cost
-                existing_expense.description = (
-                    f"Transport cost for purchase from {db_purchase.seller_name}"
-                    + (
-                        f" ({db_purchase.transport_service})"
-                        if db_purchase.transport_service
-                        else ""
-                    )
-                )
-            else:
-                # Delete expense if transport cost is now 0
-                db.delete(existing_expense)
-        elif transport_cost > 0:
-            # Create new expense if it didn't exist
-            transport_expense = models.Expense(
-                date=db_purchase.date,
-                category=models.ExpenseCategory.TRANSPORT,
-                amount=transport_cost,
-                description=f"Transport cost for purchase from {db_purchase.seller_name}"
-                + (
-                    f" ({db_purchase.transport_service})"
-                    if db_purchase.transport_service
-                    else ""
-                ),
-            )
-            db.add(transport_expense)
-
-        db.commit()
-
     return db_purchase
 
 
@@ -195,28 +201,18 @@ def delete_purchase(
         raise HTTPException(status_code=404, detail="Purchase not found")
 
     # Delete associated transport expense if it exists
-    if db_purchase.transport_cost > 0:
-        existing_expense = (
-            db.query(models.Expense)
-            .filter(
-                models.Expense.date == db_purchase.date,
-                models.Expense.category == models.ExpenseCategory.TRANSPORT,
-                models.Expense.description.like(
-                    f"%purchase from {db_purchase.seller_name}%"
-                ),
-            )
-            .first()
-        )
-
-        if existing_expense:
-            db.delete(existing_expense)
+    existing_expense = db_purchase.transport_expense
+    if existing_expense:
+        rollups.apply_expense(db, existing_expense, -1)
+        db.delete(existing_expense)
 
+    rollups.apply_purchase(db, db_purchase, -1)
     db.delete(db_purchase)
     db.commit()
     return {"message": "Purchase deleted successfully"}
 
 
-@router.get("/stats/today")
+@router.get("/stats/today", dependencies=[conditional(models.Purchase, daily=True)])
 def get_today_purchases_stats(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
@@ -1,29 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import func
 from typing import Optional, List
 from datetime import date
 from database import get_db
 from auth import get_current_active_user
+from etags import conditional
 import models
 import schemas
+import balances
+import rollups
+from money import money
+from pagination import keyset_page
 
 router = APIRouter(prefix="/api/sales", tags=["Sales"])
 
+# SaleResponse embeds the buyer (with its balance row) and every item with its
+# product type. Load them up front so serializing a page costs a fixed number
+# of queries: the buyer is joined (many-to-one, safe under LIMIT) and the items
+# come from one IN query per page rather than one query per sale.
+SALE_RESPONSE_OPTIONS = (
+    joinedload(models.Sale.buyer),
+    selectinload(models.Sale.sale_items).joinedload(models.SaleItem.product_type),
+)
+
+# Tables a SaleResponse is built from (for the ETags, see etags.py); the
+# embedded buyer carries its totals from buyer_balances.
+SALE_TABLES = (
+    models.Sale,
+    models.SaleItem,
+    models.Buyer,
+    models.BuyerBalance,
+    models.ProductType,
+)
+
+
+def _load_sale(db: Session, sale_id: int) -> Optional[models.Sale]:
+    return (
+        db.query(models.Sale)
+        .options(*SALE_RESPONSE_OPTIONS)
+        .filter(models.Sale.id == sale_id)
+        .first()
+    )
+
 
-@router.get("", response_model=List[schemas.SaleResponse])
+@router.get(
+    "",
+    response_model=List[schemas.SaleResponse],
+    dependencies=[conditional(*SALE_TABLES)],
+)
 def get_sales(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     buyer_id: Optional[int] = None,
     payment_type: Optional[schemas.PaymentType] = None,
+    cursor: Optional[str] = None,
+    response: Response = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Get all sales with optional filters"""
-    query = db.query(models.Sale)
+    """Get all sales with optional filters (pass ``cursor`` for keyset paging)"""
+    query = db.query(models.Sale).options(*SALE_RESPONSE_OPTIONS)
 
     if start_date:
         query = query.filter(models.Sale.date >= start_date)
@@ -34,6 +73,11 @@ def get_sales(
     if payment_type:
         query = query.filter(models.Sale.payment_type == payment_type)
 
+    if cursor is not None:
+        return keyset_page(
+            query, (models.Sale.date, models.Sale.id), cursor, limit, response
+        )
+
     sales = (
         query.order_by(models.Sale.date.desc(), models.Sale.id.desc())
         .offset(skip)
@@ -43,30 +87,31 @@ def get_sales(
     return sales
 
 
-@router.get("/{sale_id}", response_model=schemas.SaleResponse)
+@router.get(
+    "/{sale_id}",
+    response_model=schemas.SaleResponse,
+    dependencies=[conditional(*SALE_TABLES)],
+)
 def get_sale(
     sale_id: int,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get a single sale by ID"""
-    sale = db.query(models.Sale).filter(models.Sale.id == sale_id).first()
+    sale = _load_sale(db, sale_id)
     if not sale:
         raise HTTPException(status_code=404, detail="Sale not found")
     return sale
 
 
-@router.post("", response_model=schemas.SaleResponse, status_code=201)
-def create_sale(
-    sale: schemas.SaleCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user),
-):
-    """Create a new sale with items"""
-    # Calculate total from items
-    total_amount = 0
-    for item in sale.sale_items:
-        total_amount += item.quantity * item.price_per_unit
+def add_sale(db: Session, sale: schemas.SaleCreate) -> models.Sale:
+    """Add a sale with its items (and the payment received with it) to the
+    session, updating balances and rollups; the caller commits."""
+    # Calculate total from items (each line rounded to the paisa first)
+    line_totals = [
+        money(item.quantity * item.price_per_unit) for item in sale.sale_items
+    ]
+    total_amount = sum(line_totals)
 
     # Create sale
     db_sale = models.Sale(
@@ -82,16 +127,21 @@ def create_sale(
     db.flush()  # Get sale ID
 
     # Create sale items
-    for item in sale.sale_items:
+    db_items = []
+    for item, total_price in zip(sale.sale_items, line_totals):
         db_item = models.SaleItem(
             sale_id=db_sale.id,
             product_type_id=item.product_type_id,
             quantity=item.quantity,
             unit=item.unit,
             price_per_unit=item.price_per_unit,
-            total_price=item.quantity * item.price_per_unit,
+            total_price=total_price,
         )
         db.add(db_item)
+        db_items.append(db_item)
+
+    balances.apply_sale(db, db_sale)
+    rollups.apply_sale(db, db_sale, items=db_items)
 
     # If payment received, create payment record
     if sale.payment_received_now > 0:
@@ -103,12 +153,23 @@ def create_sale(
             notes=f"Payment for Sale #{db_sale.id}",
         )
         db.add(payment)
+        balances.apply_payment(db, payment)
 
-    db.commit()
-    db.refresh(db_sale)
     return db_sale
 
 
+@router.post("", response_model=schemas.SaleResponse, status_code=201)
+def create_sale(
+    sale: schemas.SaleCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Create a new sale with items"""
+    db_sale = add_sale(db, sale)
+    db.commit()
+    return _load_sale(db, db_sale.id)
+
+
 @router.put("/{sale_id}", response_model=schemas.SaleResponse)
 def update_sale(
     sale_id: int,
@@ -122,13 +183,20 @@ def update_sale(
         raise HTTPException(status_code=404, detail="Sale not found")
 
     update_data = sale_update.dict(exclude_unset=True)
+    old_buyer_id, old_date = db_sale.buyer_id, db_sale.date
+    if "date" in update_data:
+        rollups.apply_sale(db, db_sale, -1)
 
     for key, value in update_data.items():
         setattr(db_sale, key, value)
 
+    if db_sale.buyer_id != old_buyer_id or "date" in update_data:
+        balances.move_sale(db, db_sale, old_buyer_id, old_date)
+    if "date" in update_data:
+        rollups.apply_sale(db, db_sale)
+
     db.commit()
-    db.refresh(db_sale)
-    return db_sale
+    return _load_sale(db, db_sale.id)
 
 
 @router.delete("/{sale_id}")
@@ -142,12 +210,14 @@ def delete_sale(
     if not db_sale:
         raise HTTPException(status_code=404, detail="Sale not found")
 
+    rollups.apply_sale(db, db_sale, -1)
     db.delete(db_sale)
+    balances.apply_sale(db, db_sale, -1)
     db.commit()
     return {"message": "Sale deleted successfully"}
 
 
-@router.get("/stats/today")
+@router.get("/stats/today", dependencies=[conditional(models.Sale, daily=True)])
 def get_today_sales_stats(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
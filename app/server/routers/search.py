@@ -0,0 +1,170 @@
+"""Autocomplete for the buyer picker and the purchase form's seller field.
+
+``GET /api/search/suggest?q=ra`` answers from an in-process ``SuggestIndex``
+(see search_index.py) of the buyers and of the distinct seller names of the
+purchases, instead of running ``ILIKE '%q%'`` queries per keystroke.
+
+The index is built on the first request an instance serves and then kept
+current from the database, like the sync deltas (see routers/sync.py): at most
+every ``SEARCH_REFRESH_SECONDS`` (default 2) a request reads the
+``data_versions`` of buyers and purchases, and when either moved it applies
+the buyers created, updated or deleted since its last refresh and adds the
+sellers of new purchases. In between, a lookup runs no SQL at all. A change to
+an existing purchase (its seller may have been renamed or be gone), a bulk
+delete or an expired tombstone window rebuilds the index instead.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from database import TOMBSTONE_RETENTION_DAYS, get_db
+from auth import get_current_active_user
+from search_index import SuggestIndex, normalize
+from routers.sync import SYNC_OVERLAP
+import models
+import schemas
+
+router = APIRouter(prefix="/api/search", tags=["Search"])
+
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "2"))
+
+TABLES = (models.Buyer.__tablename__, models.Purchase.__tablename__)
+
+
+_index: Optional[SuggestIndex] = None
+_versions = {}  # the data_versions the index reflects
+_as_of: Optional[datetime] = None  # database clock at the last refresh
+_checked_at = 0.0  # time.monotonic() of the last data_versions read
+_refresh_lock = threading.Lock()
+
+
+def _buyer(row) -> dict:
+    return {"kind": "buyer", "id": row.id, "name": row.name, "phone": row.phone}
+
+
+def _seller(current: Optional[dict], name: str, phone: Optional[str]) -> dict:
+    """A seller seen on a purchase; keeps the ``current`` phone when the
+    purchase has none."""
+    if phone is None and current is not None:
+        phone = current["phone"]
+    return {"kind": "seller", "id": None, "name": name, "phone": phone}
+
+
+def _build(db: Session) -> SuggestIndex:
+    index = SuggestIndex()
+    Buyer, Purchase = models.Buyer, models.Purchase
+    index.put_many(
+        (("buyer", row.id), _buyer(row))
+        for row in db.execute(select(Buyer.id, Buyer.name, Buyer.phone))
+    )
+    # One row per seller and phone, oldest first, so the latest phone wins.
+    sellers = {}
+    for name, phone, _ in db.execute(
+        select(Purchase.seller_name, Purchase.seller_phone, func.max(Purchase.date))
+        .group_by(Purchase.seller_name, Purchase.seller_phone)
+        .order_by(func.max(Purchase.date))
+    ):
+        key = ("seller", normalize(name))
+        sellers[key] = _seller(sellers.get(key), name, phone)
+    index.put_many(sellers.items())
+    return index
+
+
+def _deleted_ids(db: Session, table: str, cutoff: datetime):
+    """Ids of ``table`` deleted since ``cutoff``; None for a bulk delete."""
+    ids = []
+    for (row_id,) in db.execute(
+        select(models.DeletedRow.row_id).where(
+            models.DeletedRow.table_name == table,
+            models.DeletedRow.deleted_at > cutoff,
+        )
+    ):
+        if row_id is None:
+            return None
+        ids.append(row_id)
+    return ids
+
+
+def _apply_changes(db: Session, index: SuggestIndex, changed: set, cutoff) -> bool:
+    """Apply the writes to ``changed`` tables since ``cutoff``; False when the
+    index has to be rebuilt instead."""
+    Buyer, Purchase = models.Buyer, models.Purchase
+    if Buyer.__tablename__ in changed:
+        deleted = _deleted_ids(db, Buyer.__tablename__, cutoff)
+        if deleted is None:
+            return False
+        for row in db.execute(
+            select(Buyer.id, Buyer.name, Buyer.phone).where(
+                models.changed_at(Buyer) > cutoff
+            )
+        ):
+            index.put(("buyer", row.id), _buyer(row))
+        for buyer_id in deleted:
+            index.remove(("buyer", buyer_id))
+
+    if Purchase.__tablename__ in changed:
+        if _deleted_ids(db, Purchase.__tablename__, cutoff) != []:
+            return False
+        rows = db.execute(
+            select(Purchase.seller_name, Purchase.seller_phone, Purchase.updated_at)
+            .where(models.changed_at(Purchase) > cutoff)
+            .order_by(Purchase.date)
+        ).all()
+        if any(row.updated_at is not None for row in rows):
+            return False
+        for name, phone, _ in rows:
+            key = ("seller", normalize(name))
+            index.put(key, _seller(index.get(key), name, phone))
+    return True
+
+
+def _current_index(db: Session) -> SuggestIndex:
+    """The index, refreshed when the last check is older than
+    ``SEARCH_REFRESH_SECONDS`` and the data changed since."""
+    global _index, _versions, _as_of, _checked_at
+    if _index is not None and time.monotonic() - _checked_at < SEARCH_REFRESH_SECONDS:
+        return _index
+
+    with _refresh_lock:
+        checked_at = time.monotonic()
+        if _index is not None and checked_at - _checked_at < SEARCH_REFRESH_SECONDS:
+            return _index  # refreshed by another request meanwhile
+        versions = dict(
+            db.execute(
+                select(models.DataVersion.table_name, models.DataVersion.version).where(
+                    models.DataVersion.table_name.in_(TABLES)
+                )
+            ).all()
+        )
+        if _index is not None and versions == _versions:
+            _checked_at = checked_at
+            return _index
+
+        now = db.scalar(select(func.now()))
+        index = _index
+        if index is None or now - _as_of > timedelta(days=TOMBSTONE_RETENTION_DAYS):
+            index = _build(db)
+        else:
+            changed = {t for t in TABLES if versions.get(t) != _versions.get(t)}
+            if not _apply_changes(db, index, changed, _as_of - SYNC_OVERLAP):
+                index = _build(db)
+
+        _index, _versions, _as_of, _checked_at = index, versions, now, checked_at
+        return index
+
+
+@router.get("/suggest", response_model=List[schemas.Suggestion])
+def suggest(
+    q: str = Query(min_length=1, max_length=100),
+    kind: Optional[schemas.SuggestionKind] = None,
+    limit: int = Query(default=10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Buyers and sellers whose name or phone matches ``q``, best match first
+    (``kind`` limits them to one)"""
+    return _current_index(db).search(q, limit, kind.value if kind else None)
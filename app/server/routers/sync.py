@@ -0,0 +1,132 @@
+"""Delta sync for the offline replica kept by the PWA.
+
+``GET /api/sync`` (no ``since``) returns a full snapshot of the buyers,
+product types, sales (with their items), payments, purchases and expenses,
+plus a ``token``. ``GET /api/sync?since=<token>`` then returns only the rows
+created or updated since that token (``updated_at``, else ``created_at``)
+and the ids deleted since then (the ``deleted_rows`` tombstones, see
+database.py), together with the next token. The client upserts the rows by
+id, drops the deleted ids, and keeps the token for the next refresh.
+
+The token is the database's clock at the start of the sync. Rows are stamped
+with their transaction's start time, so a transaction still running during a
+sync commits rows stamped *before* the token; each sync therefore also re-sends
+what changed in the ``SYNC_OVERLAP_SECONDS`` before the token. Upserting is
+idempotent, so the repeats are harmless.
+
+The response is a full snapshot with ``reset: true`` instead when the token is
+older than the tombstone retention, or when rows were deleted in bulk since
+(clear_data.py, reset_db.py, ``seed_demo.py --reset``). The client then
+replaces its replica.
+
+Product types are a handful of rows without ``updated_at``, so every sync
+sends all of them. A buyer is re-sent when its balance changes, since the
+response carries the buyer's totals.
+"""
+import base64
+from collections import defaultdict
+from datetime import datetime, timedelta
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select, union
+from sqlalchemy.orm import Session, selectinload
+from database import TOMBSTONE_RETENTION_DAYS, get_db
+from auth import get_current_active_user
+import models
+import schemas
+
+router = APIRouter(prefix="/api/sync", tags=["Sync"])
+
+SYNC_OVERLAP = timedelta(seconds=int(os.getenv("SYNC_OVERLAP_SECONDS", "120")))
+
+
+def encode_token(now: datetime) -> str:
+    return base64.urlsafe_b64encode(now.isoformat().encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return datetime.fromisoformat(raw.decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+
+def _needs_reset(db: Session, now: datetime, cutoff: datetime) -> bool:
+    if cutoff < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        return True  # tombstones from back then may be gone
+    bulk_delete = db.scalar(
+        select(models.DeletedRow.id)
+        .where(
+            models.DeletedRow.row_id.is_(None),
+            models.DeletedRow.deleted_at > cutoff,
+        )
+        .limit(1)
+    )
+    return bulk_delete is not None
+
+
+def _changed(db: Session, model, cutoff: Optional[datetime], *options):
+    query = db.query(model).options(*options)
+    if cutoff is not None:
+        query = query.filter(models.changed_at(model) > cutoff)
+    return query.all()
+
+
+def _changed_buyers(db: Session, cutoff: Optional[datetime]):
+    query = db.query(models.Buyer)
+    if cutoff is not None:
+        changed = union(
+            select(models.Buyer.id).where(models.changed_at(models.Buyer) > cutoff),
+            select(models.BuyerBalance.buyer_id).where(
+                models.BuyerBalance.updated_at > cutoff
+            ),
+        )
+        query = query.filter(models.Buyer.id.in_(changed))
+    return query.all()
+
+
+def _deleted(db: Session, cutoff: datetime) -> dict:
+    deleted = defaultdict(set)
+    rows = db.execute(
+        select(models.DeletedRow.table_name, models.DeletedRow.row_id).where(
+            models.DeletedRow.deleted_at > cutoff,
+            models.DeletedRow.row_id.is_not(None),
+        )
+    )
+    for table_name, row_id in rows:
+        deleted[table_name].add(row_id)
+    return {table: sorted(ids) for table, ids in sorted(deleted.items())}
+
+
+@router.get("", response_model=schemas.SyncResponse)
+def sync(
+    since: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Rows changed and ids deleted since ``since`` (a full snapshot without
+    it); keep the returned ``token`` for the next call"""
+    now = db.scalar(select(func.now()))
+    cutoff = None
+    if since:
+        cutoff = decode_token(since) - SYNC_OVERLAP
+        if _needs_reset(db, now, cutoff):
+            cutoff = None
+
+    return {
+        "token": encode_token(now),
+        "reset": cutoff is None,
+        "buyers": _changed_buyers(db, cutoff),
+        "product_types": db.query(models.ProductType)
+        .order_by(models.ProductType.id)
+        .all(),
+        "sales": _changed(
+            db, models.Sale, cutoff, selectinload(models.Sale.sale_items)
+        ),
+        "payments": _changed(db, models.Payment, cutoff),
+        "purchases": _changed(db, models.Purchase, cutoff),
+        "expenses": _changed(db, models.Expense, cutoff),
+        "deleted": _deleted(db, cutoff) if cutoff is not None else {},
+    }
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Union
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Any, Dict, Optional, List, Union
 from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
+from money import parse_money, parse_quantity
 
 # Alias for the date type. Model fields literally named ``date`` that also have a
 # default value would otherwise shadow the imported ``date`` type within the
@@ -9,6 +11,12 @@ from enum import Enum
 # those fields with ``DateType`` instead.
 DateType = date
 
+# Request bodies parse amounts and quantities as exact Decimals, rounded to the
+# column scale, and reject values too large for the column. Response models
+# declare the same fields as float (see money.py).
+Money = Annotated[Decimal, AfterValidator(parse_money)]
+Quantity = Annotated[Decimal, AfterValidator(parse_quantity)]
+
 
 # Enums
 class PaymentType(str, Enum):
@@ -27,6 +35,30 @@ class ExpenseCategory(str, Enum):
     OTHER = "Other"
 
 
+class ImportKind(str, Enum):
+    SALES = "sales"
+    PURCHASES = "purchases"
+    EXPENSES = "expenses"
+    PAYMENTS = "payments"
+
+
+class MutationOp(str, Enum):
+    CREATE_SALE = "create_sale"
+    CREATE_PURCHASE = "create_purchase"
+    ADD_PAYMENT = "add_payment"
+    CREATE_EXPENSE = "create_expense"
+
+
+class SuggestionKind(str, Enum):
+    BUYER = "buyer"
+    SELLER = "seller"
+
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
 # ============== USER SCHEMAS ==============
 class UserBase(BaseModel):
     email: str
@@ -85,7 +117,7 @@ class BuyerBase(BaseModel):
     phone: Optional[str] = None
     address: Optional[str] = None
     notes: Optional[str] = None
-    opening_balance: float = 0.0
+    opening_balance: Money = Decimal(0)
 
 
 class BuyerCreate(BuyerBase):
@@ -97,11 +129,12 @@ class BuyerUpdate(BaseModel):
     phone: Optional[str] = None
     address: Optional[str] = None
     notes: Optional[str] = None
-    opening_balance: Optional[float] = None
+    opening_balance: Optional[Money] = None
 
 
 class BuyerResponse(BuyerBase):
     id: int
+    opening_balance: float = 0.0
     created_at: datetime
     updated_at: Optional[datetime]
     total_sales: float = 0.0
@@ -126,11 +159,11 @@ class PurchaseBase(BaseModel):
     seller_phone: Optional[str] = None
     pickup_location: Optional[str] = None
     transport_service: Optional[str] = None
-    transport_cost: float = 0.0
-    quantity: float
+    transport_cost: Money = Decimal(0)
+    quantity: Quantity
     unit: str = "kg"
-    price_per_unit: float
-    actual_paid_amount: Optional[float] = None
+    price_per_unit: Money
+    actual_paid_amount: Optional[Money] = None
     notes: Optional[str] = None
 
 
@@ -144,16 +177,19 @@ class PurchaseUpdate(BaseModel):
     seller_phone: Optional[str] = None
     pickup_location: Optional[str] = None
     transport_service: Optional[str] = None
-    transport_cost: Optional[float] = None
-    quantity: Optional[float] = None
+    transport_cost: Optional[Money] = None
+    quantity: Optional[Quantity] = None
     unit: Optional[str] = None
-    price_per_unit: Optional[float] = None
-    actual_paid_amount: Optional[float] = None
+    price_per_unit: Optional[Money] = None
+    actual_paid_amount: Optional[Money] = None
     notes: Optional[str] = None
 
 
 class PurchaseResponse(PurchaseBase):
     id: int
+    transport_cost: float = 0.0
+    quantity: float
+    price_per_unit: float
     total_purchase_cost: float
     actual_paid_amount: Optional[float] = None
     created_at: datetime
@@ -166,9 +202,9 @@ class PurchaseResponse(PurchaseBase):
 # ============== SALE ITEM SCHEMAS ==============
 class SaleItemBase(BaseModel):
     product_type_id: int
-    quantity: float
+    quantity: Quantity
     unit: str = "kg"
-    price_per_unit: float
+    price_per_unit: Money
 
 
 class SaleItemCreate(SaleItemBase):
@@ -177,6 +213,8 @@ class SaleItemCreate(SaleItemBase):
 
 class SaleItemResponse(SaleItemBase):
     id: int
+    quantity: float
+    price_per_unit: float
     total_price: float
     product_type: Optional[ProductTypeResponse] = None
 
@@ -189,7 +227,7 @@ class SaleBase(BaseModel):
     date: date
     buyer_id: int
     payment_type: PaymentType
-    payment_received_now: float = 0.0
+    payment_received_now: Money = Decimal(0)
     notes: Optional[str] = None
 
 
@@ -201,12 +239,13 @@ class SaleUpdate(BaseModel):
     date: Optional[Union[DateType, str]] = None
     buyer_id: Optional[int] = None
     payment_type: Optional[PaymentType] = None
-    payment_received_now: Optional[float] = None
+    payment_received_now: Optional[Money] = None
     notes: Optional[str] = None
 
 
 class SaleResponse(SaleBase):
     id: int
+    payment_received_now: float = 0.0
     total_amount: float
     created_at: datetime
     updated_at: Optional[datetime]
@@ -230,7 +269,7 @@ class SaleListResponse(BaseModel):
 class PaymentBase(BaseModel):
     date: date
     buyer_id: int
-    amount: float
+    amount: Money
     payment_method: str = "Cash"
     notes: Optional[str] = None
 
@@ -241,6 +280,7 @@ class PaymentCreate(PaymentBase):
 
 class PaymentResponse(PaymentBase):
     id: int
+    amount: float
     created_at: datetime
     buyer: Optional[BuyerResponse] = None
 
@@ -252,7 +292,7 @@ class PaymentResponse(PaymentBase):
 class ExpenseBase(BaseModel):
     date: date
     category: ExpenseCategory
-    amount: float
+    amount: Money
     description: Optional[str] = None
 
 
@@ -263,12 +303,14 @@ class ExpenseCreate(ExpenseBase):
 class ExpenseUpdate(BaseModel):
     date: Optional[DateType] = None
     category: Optional[ExpenseCategory] = None
-    amount: Optional[float] = None
+    amount: Optional[Money] = None
     description: Optional[str] = None
 
 
 class ExpenseResponse(ExpenseBase):
     id: int
+    amount: float
+    purchase_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime]
 
@@ -330,6 +372,120 @@ class AnalyticsResponse(BaseModel):
     top_buyers: List[TopBuyerStats]
 
 
+# ============== IMPORT SCHEMAS ==============
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    kind: ImportKind
+    imported: int
+
+
+# ============== BATCH MUTATION SCHEMAS ==============
+class BatchOperation(BaseModel):
+    idempotency_key: str = Field(min_length=1, max_length=100)
+    op: MutationOp
+    data: dict  # the body of the matching single-row route
+
+
+class BatchMutationRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=500)
+
+
+class BatchOperationResult(BaseModel):
+    idempotency_key: str
+    op: MutationOp
+    status: int  # the single-row route's status code
+    replayed: bool = False  # True: applied by an earlier request
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class BatchMutationResponse(BaseModel):
+    applied: int
+    replayed: int
+    failed: int
+    results: List[BatchOperationResult]
+
+
+# ============== BATCH GET SCHEMAS ==============
+class BatchGet(BaseModel):
+    # Path and query string of a GET route, e.g. "/api/analytics/monthly-stats?months=6"
+    path: str = Field(min_length=1, max_length=2000)
+    if_none_match: Optional[str] = None  # the ETag held: 304 if still current
+
+
+class BatchGetRequest(BaseModel):
+    requests: List[BatchGet] = Field(min_length=1, max_length=20)
+
+
+class BatchGetResult(BaseModel):
+    path: str
+    status: int
+    headers: Dict[str, str] = {}  # ETag, Last-Modified, X-Next-Cursor, ...
+    body: Any = None  # the route's JSON body (None for a 304)
+
+
+class BatchGetResponse(BaseModel):
+    responses: List[BatchGetResult]
+
+
+# ============== SEARCH SCHEMAS ==============
+class Suggestion(BaseModel):
+    kind: SuggestionKind
+    id: Optional[int] = None  # the buyer's id; sellers are names, not rows
+    name: str
+    phone: Optional[str] = None
+
+
+# ============== SYNC SCHEMAS ==============
+# Rows are sent flat (a sale carries buyer_id and its items, not the nested
+# buyer and product types) since the client holds those tables too.
+class SyncSaleItem(SaleItemBase):
+    id: int
+    quantity: float
+    price_per_unit: float
+    total_price: float
+
+    class Config:
+        from_attributes = True
+
+
+class SyncSale(SaleBase):
+    id: int
+    payment_received_now: float = 0.0
+    total_amount: float
+    created_at: datetime
+    updated_at: Optional[datetime]
+    sale_items: List[SyncSaleItem]
+
+    class Config:
+        from_attributes = True
+
+
+class SyncPayment(PaymentBase):
+    id: int
+    amount: float
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncResponse(BaseModel):
+    token: str  # pass as ``since`` on the next sync
+    reset: bool  # True: a full snapshot, replace the local replica
+    buyers: List[BuyerResponse] = []
+    product_types: List[ProductTypeResponse] = []
+    sales: List[SyncSale] = []
+    payments: List[SyncPayment] = []
+    purchases: List[PurchaseResponse] = []
+    expenses: List[ExpenseResponse] = []
+    deleted: Dict[str, List[int]] = {}  # table -> ids deleted since the token
+
+
 # ============== FILTER SCHEMAS ==============
 class DateRangeFilter(BaseModel):
     start_date: Optional[date] = None
@@ -0,0 +1,176 @@
+"""In-process autocomplete index of names and phone numbers.
+
+``SuggestIndex`` answers a query in the order the suggestions are ranked, and
+stops as soon as it has enough:
+
+1. names starting with the query, in name order;
+2. names with a later word starting with it (``"ra"`` finds "Suresh Rana"),
+   in the order of that word;
+3. phone numbers starting with it;
+4. for queries of three characters or more, names and phone numbers containing
+   it anywhere (like the routes' ``ILIKE '%q%'``), in name order.
+
+The first three are ranges of sorted lists (of names, of each name from its
+second word on, of phone numbers), found by bisection; a lookup reads only the
+entries it returns. The fourth intersects the entry sets of the query's
+trigrams and checks only the entries sharing all of them; when those are many,
+it walks the names in order instead and stops at ``limit``.
+
+Names are compared case-insensitively with runs of whitespace collapsed.
+Queries made of digits (and ``+ - ( )`` or spaces) are matched against the
+phone numbers digit for digit. The index only holds what it is given;
+routers/search.py fills it from the database and keeps it current. All methods
+are thread-safe.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+PHONE_CHARS = set("0123456789+-() ")
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").casefold().split())
+
+
+def digits(text: Optional[str]) -> str:
+    return "".join(c for c in text or "" if c.isdigit())
+
+
+def _trigrams(text: str) -> Iterable[str]:
+    return (text[i : i + 3] for i in range(len(text) - 2))
+
+
+class _Entry:
+    __slots__ = ("suggestion", "name", "phone", "words", "grams")
+
+    def __init__(self, suggestion: dict):
+        self.suggestion = suggestion
+        self.name = normalize(suggestion["name"])
+        self.phone = digits(suggestion.get("phone"))
+        # The name from its second, third, ... word on
+        self.words = [self.name[i + 1 :] for i, c in enumerate(self.name) if c == " "]
+        self.grams = set(_trigrams(self.name)) | set(_trigrams(self.phone))
+
+    def sorted_texts(self) -> Iterable[Tuple[int, str]]:
+        """``(list, text)`` for each sorted list the entry is in."""
+        yield 0, self.name
+        for rest in self.words:
+            yield 1, rest
+        if self.phone:
+            yield 2, self.phone
+
+
+class SuggestIndex:
+    """Suggestions (dicts with ``kind``, ``name`` and ``phone``) by key."""
+
+    def __init__(self):
+        self._entries = {}  # key -> _Entry
+        self._sorted = ([], [], [])  # (text, key): names, later words, phones
+        self._grams = defaultdict(set)  # trigram -> keys
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.suggestion if entry else None
+
+    def put(self, key, suggestion: dict):
+        """Add the suggestion under ``key``, replacing what was there."""
+        entry = _Entry(suggestion)
+        with self._lock:
+            self._discard(key)
+            self._add(key, entry, insort)
+
+    def put_many(self, suggestions: Iterable[Tuple[object, dict]]):
+        """``put`` for many ``(key, suggestion)`` pairs, sorting once."""
+        entries = [(key, _Entry(suggestion)) for key, suggestion in suggestions]
+        with self._lock:
+            for key, entry in entries:
+                self._discard(key)
+                self._add(key, entry, list.append)
+            for texts in self._sorted:
+                texts.sort()
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def _add(self, key, entry: _Entry, add):
+        self._entries[key] = entry
+        for which, text in entry.sorted_texts():
+            add(self._sorted[which], (text, key))
+        for gram in entry.grams:
+            self._grams[gram].add(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for which, text in entry.sorted_texts():
+            texts = self._sorted[which]
+            del texts[bisect_left(texts, (text, key))]
+        for gram in entry.grams:
+            keys = self._grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self._grams[gram]
+
+    def search(
+        self, query: str, limit: int = 10, kind: Optional[str] = None
+    ) -> List[dict]:
+        """The ``limit`` best matches for ``query``, optionally of one ``kind``."""
+        query = normalize(query)
+        phone_query = digits(query) if set(query) <= PHONE_CHARS else ""
+        matches = {}  # key -> suggestion, in rank order
+
+        def wanted(key) -> bool:
+            if key in matches:
+                return False
+            return kind is None or self._entries[key].suggestion["kind"] == kind
+
+        with self._lock:
+            for texts, prefix in zip(self._sorted, (query, query, phone_query)):
+                if not prefix:
+                    continue
+                for i in range(bisect_left(texts, (prefix,)), len(texts)):
+                    text, key = texts[i]
+                    if not text.startswith(prefix):
+                        break
+                    if wanted(key):
+                        matches[key] = self._entries[key].suggestion
+                        if len(matches) == limit:
+                            return list(matches.values())
+
+            text = phone_query or query
+            if len(text) >= 3:
+                sets = sorted(
+                    (self._grams.get(g, ()) for g in _trigrams(text)), key=len
+                )
+                candidates = sets[0]
+                if len(sets) > 1 and candidates:
+                    candidates = candidates.intersection(*sets[1:])
+                if len(candidates) ** 2 > limit * len(self._entries):
+                    # Common: walk the names in order until enough contain it
+                    ordered = (key for _, key in self._sorted[0] if key in candidates)
+                else:
+                    ordered = (
+                        key
+                        for _, key in sorted(
+                            (self._entries[key].name, key) for key in candidates
+                        )
+                    )
+                for key in ordered:
+                    entry = self._entries[key]
+                    if wanted(key) and (
+                        query in entry.name
+                        or (phone_query and phone_query in entry.phone)
+                    ):
+                        matches[key] = entry.suggestion
+                        if len(matches) == limit:
+                            break
+        return list(matches.values())
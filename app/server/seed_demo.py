@@ -0,0 +1,673 @@
+"""Fill the database with generated demo / load-test data, in bulk.
+
+    python seed_demo.py                       # demo: a year of a 25-buyer business
+    python seed_demo.py --preset large        # ~1.5M rows
+    python seed_demo.py --preset small --sales 50000 --seed 7 --reset
+
+Presets (``--preset``) set every volume; ``--buyers``, ``--sales``,
+``--max-items``, ``--payments``, ``--purchases``, ``--expenses`` and ``--days``
+override single ones. ``--reset`` first deletes all data except users;
+otherwise the rows are appended. The same ``--seed``, volumes and draw backend
+always produce the same dataset.
+
+The rows are consistent with what the routes write: sales with a received
+amount get their automatic payment, purchases with a transport cost get their
+transport expense, and buyer balances and monthly rollups are rebuilt at the
+end.
+
+It is fast because it never waits on the database per row:
+
+- ids are allocated up front from ``max(id) + 1``, so sale items and payments
+  can reference their sale without a round trip (PostgreSQL sequences are
+  moved past them afterwards);
+- rows are built ``--batch-size`` sales at a time, with the random quantities
+  and prices drawn in bulk by NumPy when it is installed (optional, not in
+  requirements.txt; ``--no-numpy`` forces the pure-Python draws);
+- each batch goes out as one executemany INSERT (multi-row VALUES) or, on
+  PostgreSQL, as ``COPY ... FROM STDIN`` (``--method``, default ``auto``).
+
+Everything runs in one transaction. Because of the pre-allocated ids, don't
+run it while the app is writing to the same database.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import Enum, func, insert, text
+from sqlalchemy.orm import Session
+from database import Base, SessionLocal, engine, mark_changed
+import models
+from balances import rebuild_balances
+from rollups import rebuild_rollups
+
+try:
+    import numpy
+except ImportError:  # optional: pure-Python draws
+    numpy = None
+
+PRESETS = {
+    "demo": dict(
+        buyers=25,
+        sales=300,
+        max_items=3,
+        payments=150,
+        purchases=150,
+        expenses=70,
+        days=365,
+    ),
+    "small": dict(
+        buyers=200,
+        sales=10_000,
+        max_items=3,
+        payments=3_000,
+        purchases=1_000,
+        expenses=1_000,
+        days=730,
+    ),
+    "medium": dict(
+        buyers=1_000,
+        sales=100_000,
+        max_items=4,
+        payments=30_000,
+        purchases=10_000,
+        expenses=10_000,
+        days=730,
+    ),
+    "large": dict(
+        buyers=5_000,
+        sales=300_000,
+        max_items=4,
+        payments=100_000,
+        purchases=30_000,
+        expenses=30_000,
+        days=1_095,
+    ),
+}
+SIZE_FIELDS = tuple(PRESETS["demo"])
+BATCH_SIZE = 10_000
+
+# name -> (sell price in paise per kg, share of the kg sold)
+PRODUCTS = {
+    "Ply": (1300, 45),
+    "Lafa": (1600, 22),
+    "Jalav": (450, 20),
+    "Sheet": (2300, 4),
+    "Khili": (2600, 2),
+    "Other": (1000, 7),
+}
+PAYMENT_TYPES = [
+    models.PaymentType.PAID,
+    models.PaymentType.PARTIAL,
+    models.PaymentType.CREDIT,
+]
+PAYMENT_TYPE_WEIGHTS = [40, 35, 25]
+PAYMENT_METHODS = ["Cash", "UPI", "Bank Transfer", "Cheque"]
+
+# paise ranges per expense category
+EXPENSE_AMOUNTS = {
+    models.ExpenseCategory.RENT: (1_500_000, 2_000_000),
+    models.ExpenseCategory.ELECTRICITY: (300_000, 600_000),
+    models.ExpenseCategory.WATER: (50_000, 150_000),
+    models.ExpenseCategory.LABOUR: (500_000, 8_000_000),
+    models.ExpenseCategory.TRANSPORT: (50_000, 500_000),
+    models.ExpenseCategory.TAX: (1_000_000, 5_000_000),
+    models.ExpenseCategory.OTHER: (10_000, 1_000_000),
+}
+
+FIRST_NAMES = [
+    "Ramesh",
+    "Suresh",
+    "Mahesh",
+    "Dinesh",
+    "Kamlesh",
+    "Nilesh",
+    "Hitesh",
+    "Rakesh",
+    "Bhavesh",
+    "Jignesh",
+    "Alpesh",
+    "Dipesh",
+    "Paresh",
+    "Umesh",
+    "Vijay",
+    "Sanjay",
+    "Manoj",
+    "Rajesh",
+    "Kiran",
+    "Tushar",
+    "Chirag",
+    "Bhavin",
+]
+LAST_NAMES = [
+    "Patel",
+    "Shah",
+    "Desai",
+    "Mehta",
+    "Joshi",
+    "Parmar",
+    "Solanki",
+    "Trivedi",
+    "Chauhan",
+    "Rana",
+    "Modi",
+    "Vora",
+    "Bhatt",
+    "Thakkar",
+    "Agarwal",
+    "Doshi",
+    "Gajjar",
+    "Pandya",
+    "Kothari",
+]
+AREAS = [
+    "Udhna, Surat",
+    "Katargam, Surat",
+    "Varachha, Surat",
+    "Limbayat, Surat",
+    "Adajan, Surat",
+    "Pandesara, Surat",
+    "Sachin, Surat",
+    "Kamrej, Surat",
+    "Naroda, Ahmedabad",
+    "Vatva, Ahmedabad",
+    "Odhav, Ahmedabad",
+    "Nikol, Ahmedabad",
+]
+SELLER_NAMES = [
+    "Arvind Scrap Mart",
+    "Bharat Waste Depot",
+    "Champaklal & Sons",
+    "Dhiraj Traders",
+    "Eastern Scrap Co.",
+    "Ganesh Metal Works",
+    "Hari Om Scrap",
+    "Indo Scrap Agency",
+    "Janta Waste Buyers",
+]
+TRANSPORT_SERVICES = [
+    "Surat Transport Co.",
+    "Patel Logistics",
+    "Om Carriers",
+    "Shree Transport",
+]
+
+
+def rupees(paise: int) -> Decimal:
+    return Decimal(paise).scaleb(-2)
+
+
+def kilograms(grams: int) -> Decimal:
+    return Decimal(grams).scaleb(-3)
+
+
+def line_total(grams: int, paise_per_kg: int) -> int:
+    """money(quantity * price) in paise, in integer arithmetic."""
+    return (grams * paise_per_kg + 500) // 1000  # ROUND_HALF_UP; both positive
+
+
+class Draws:
+    """Random draws in bulk, from NumPy's generator when available."""
+
+    def __init__(self, seed: int, use_numpy: bool):
+        self.numpy = use_numpy
+        if use_numpy:
+            self._rng = numpy.random.default_rng(seed)
+        else:
+            self._rng = random.Random(seed)
+
+    def integers(self, low: int, high: int, n: int) -> list:
+        """``n`` integers in ``[low, high)``."""
+        if self.numpy:
+            return self._rng.integers(low, high, n).tolist()
+        return [self._rng.randrange(low, high) for _ in range(n)]
+
+    def choices(self, population, n: int, weights=None) -> list:
+        if self.numpy:
+            p = None
+            if weights is not None:
+                p = numpy.asarray(weights, dtype=float)
+                p /= p.sum()
+            picks = self._rng.choice(len(population), n, p=p).tolist()
+            return [population[i] for i in picks]
+        return self._rng.choices(population, weights=weights, k=n)
+
+
+# ============== WRITING ==============
+class Writer:
+    """Sends batches of row tuples to one table by executemany or COPY."""
+
+    def __init__(self, db: Session, method: str):
+        self.db = db
+        self.method = method
+        self.counts = {}
+
+    def write(self, model, columns, rows):
+        if not rows:
+            return
+        table = model.__table__
+        if self.method == "copy":
+            self._copy(table, columns, rows)
+        else:
+            # Core insert on the table: skips the ORM's per-row bookkeeping.
+            self.db.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def _copy(self, table, columns, rows):
+        # SQLAlchemy stores Enum columns by member name; psycopg would send
+        # these str enums' values instead.
+        enums = [i for i, c in enumerate(columns) if isinstance(table.c[c].type, Enum)]
+        raw = self.db.connection().connection.driver_connection
+        statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+        with raw.cursor() as cursor, cursor.copy(statement) as copy:
+            for row in rows:
+                if enums:
+                    row = list(row)
+                    for i in enums:
+                        row[i] = row[i].name
+                copy.write_row(row)
+        mark_changed(self.db, table)
+
+
+def _next_id(db: Session, model) -> int:
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _sync_sequences(db: Session, tables):
+    """Move PostgreSQL id sequences past the explicitly inserted ids."""
+    if db.get_bind().dialect.name != "postgresql":
+        return  # SQLite picks max(rowid) + 1 by itself
+    for table in tables:
+        db.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table.name}), false)"
+            )
+        )
+
+
+def reset(db: Session):
+    """Delete all business data (users are kept)."""
+    for model in (
+        models.MonthlyProductRollup,
+        models.MonthlyRollup,
+        models.BuyerBalance,
+        models.BuyerMonthlyBalance,
+        models.SaleItem,
+        models.Payment,
+        models.Sale,
+        models.Expense,
+        models.Purchase,
+        models.Buyer,
+        models.ProductType,
+    ):
+        db.query(model).delete()
+
+
+# ============== GENERATION ==============
+def _product_types(db: Session) -> dict:
+    """Ids of the PRODUCTS, creating the missing ones."""
+    existing = {
+        name: product_id
+        for product_id, name in db.query(models.ProductType.id, models.ProductType.name)
+    }
+    for name, (price, _) in PRODUCTS.items():
+        if name not in existing:
+            product = models.ProductType(
+                name=name, description=f"Scrap {name} @ Rs.{rupees(price)}/kg"
+            )
+            db.add(product)
+            db.flush()
+            existing[name] = product.id
+    return {name: existing[name] for name in PRODUCTS}
+
+
+def _buyers(writer: Writer, draws: Draws, count: int) -> list:
+    first_id = _next_id(writer.db, models.Buyer)
+    ids = list(range(first_id, first_id + count))
+    firsts = draws.choices(FIRST_NAMES, count)
+    lasts = draws.choices(LAST_NAMES, count)
+    areas = draws.choices(AREAS, count)
+    phones = draws.integers(6_000_000_000, 10_000_000_000, count)
+    kinds = draws.choices(["owe_us", "advance", "zero"], count, weights=[60, 20, 20])
+    amounts = draws.integers(200_000, 5_000_000, count)
+    rows = []
+    for i, buyer_id in enumerate(ids):
+        opening = {"owe_us": amounts[i], "advance": -amounts[i] // 2, "zero": 0}
+        rows.append(
+            (
+                buyer_id,
+                f"{firsts[i]} {lasts[i]}",
+                str(phones[i]),
+                areas[i],
+                f"Regular buyer from {areas[i].split(', ')[1]}",
+                rupees(opening[kinds[i]]),
+            )
+        )
+    writer.write(
+        models.Buyer,
+        ("id", "name", "phone", "address", "notes", "opening_balance"),
+        rows,
+    )
+    return ids
+
+
+def _sales(writer, draws, days, buyer_ids, product_ids, count, max_items, batch):
+    product_names = list(PRODUCTS)
+    product_shares = [share for _, share in PRODUCTS.values()]
+    sale_id = _next_id(writer.db, models.Sale)
+    item_id = _next_id(writer.db, models.SaleItem)
+
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        buyers = draws.choices(buyer_ids, n)
+        dates = draws.choices(days, n)
+        types = draws.choices(PAYMENT_TYPES, n, weights=PAYMENT_TYPE_WEIGHTS)
+        partial_percents = draws.integers(30, 81, n)
+        item_counts = draws.integers(1, max_items + 1, n)
+
+        m = sum(item_counts)
+        products = draws.choices(product_names, m, weights=product_shares)
+        grams = draws.integers(200_000, 3_000_001, m)
+        price_percents = draws.integers(90, 111, m)
+
+        sales, items, payments = [], [], []
+        k = 0
+        for i in range(n):
+            total = 0
+            for _ in range(item_counts[i]):
+                price = PRODUCTS[products[k]][0] * price_percents[k] // 100
+                amount = line_total(grams[k], price)
+                total += amount
+                items.append(
+                    (
+                        item_id,
+                        sale_id,
+                        product_ids[products[k]],
+                        kilograms(grams[k]),
+                        "kg",
+                        rupees(price),
+                        rupees(amount),
+                    )
+                )
+                item_id += 1
+                k += 1
+            if types[i] == models.PaymentType.PAID:
+                received = total
+            elif types[i] == models.PaymentType.PARTIAL:
+                received = total * partial_percents[i] // 100
+            else:
+                received = 0
+            sales.append(
+                (
+                    sale_id,
+                    dates[i],
+                    buyers[i],
+                    types[i],
+                    rupees(received),
+                    rupees(total),
+                )
+            )
+            # Same automatic payment record as create_sale.
+            if received > 0:
+                payments.append(
+                    (
+                        dates[i],
+                        buyers[i],
+                        rupees(received),
+                        "Cash",
+                        f"Payment for Sale #{sale_id}",
+                    )
+                )
+            sale_id += 1
+
+        writer.write(
+            models.Sale,
+            (
+                "id",
+                "date",
+                "buyer_id",
+                "payment_type",
+                "payment_received_now",
+                "total_amount",
+            ),
+            sales,
+        )
+        writer.write(
+            models.SaleItem,
+            (
+                "id",
+                "sale_id",
+                "product_type_id",
+                "quantity",
+                "unit",
+                "price_per_unit",
+                "total_price",
+            ),
+            items,
+        )
+        writer.write(
+            models.Payment,
+            ("date", "buyer_id", "amount", "payment_method", "notes"),
+            payments,
+        )
+
+
+def _payments(writer, draws, days, buyer_ids, count, batch):
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        rows = zip(
+            draws.choices(days, n),
+            draws.choices(buyer_ids, n),
+            map(rupees, draws.integers(500_000, 8_000_000, n)),
+            draws.choices(PAYMENT_METHODS, n),
+        )
+        writer.write(
+            models.Payment,
+            ("date", "buyer_id", "amount", "payment_method", "notes"),
+            [(*row, "Account settlement") for row in rows],
+        )
+
+
+def _purchases(writer, draws, days, count, batch):
+    purchase_id = _next_id(writer.db, models.Purchase)
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        dates = draws.choices(days, n)
+        sellers = draws.choices(SELLER_NAMES, n)
+        services = draws.choices(TRANSPORT_SERVICES, n)
+        locations = draws.choices(AREAS, n)
+        grams = draws.integers(500_000, 8_000_001, n)
+        prices = draws.integers(300, 351, n)
+        transport_percents = draws.choices([0, 10, 15, 20], n)
+        paid_percents = draws.integers(88, 101, n)
+
+        purchases, expenses = [], []
+        for i in range(n):
+            cost = line_total(grams[i], prices[i])
+            transport = cost * transport_percents[i] // 100
+            total = cost + transport
+            purchases.append(
+                (
+                    purchase_id,
+                    dates[i],
+                    sellers[i],
+                    locations[i],
+                    "Mixed Scrap",
+                    services[i] if transport else None,
+                    rupees(transport),
+                    kilograms(grams[i]),
+                    "kg",
+                    rupees(prices[i]),
+                    rupees(total),
+                    rupees(total * paid_percents[i] // 100),
+                )
+            )
+            # Same automatic transport expense as create_purchase.
+            if transport:
+                expenses.append(
+                    (
+                        dates[i],
+                        models.ExpenseCategory.TRANSPORT,
+                        rupees(transport),
+                        f"Transport cost for purchase from {sellers[i]}"
+                        f" ({services[i]})",
+                        purchase_id,
+                    )
+                )
+            purchase_id += 1
+
+        writer.write(
+            models.Purchase,
+            (
+                "id",
+                "date",
+                "seller_name",
+                "pickup_location",
+                "scrap_type",
+                "transport_service",
+                "transport_cost",
+                "quantity",
+                "unit",
+                "price_per_unit",
+                "total_purchase_cost",
+                "actual_paid_amount",
+            ),
+            purchases,
+        )
+        writer.write(
+            models.Expense,
+            ("date", "category", "amount", "description", "purchase_id"),
+            expenses,
+        )
+
+
+def _expenses(writer, draws, days, count, batch):
+    categories = list(EXPENSE_AMOUNTS)
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        picked = draws.choices(categories, n)
+        fractions = draws.integers(0, 1001, n)
+        rows = []
+        for day, category, fraction in zip(draws.choices(days, n), picked, fractions):
+            low, high = EXPENSE_AMOUNTS[category]
+            amount = low + (high - low) * fraction // 1000
+            rows.append((day, category, rupees(amount), f"{category.value} expense"))
+        writer.write(
+            models.Expense, ("date", "category", "amount", "description"), rows
+        )
+
+
+def default_method(bind) -> str:
+    return "copy" if bind.dialect.name == "postgresql" else "insert"
+
+
+def generate(
+    db: Session,
+    sizes: dict,
+    seed: int = 42,
+    method: str = "auto",
+    batch_size: int = BATCH_SIZE,
+    use_numpy: bool = numpy is not None,
+) -> dict:
+    """Insert a generated dataset of ``sizes`` (see PRESETS) and rebuild the
+    derived tables. Commits; returns the number of rows written per table."""
+    if method == "auto":
+        method = default_method(db.get_bind())
+    draws = Draws(seed, use_numpy)
+    writer = Writer(db, method)
+    today = date.today()
+    days = [today - timedelta(days=offset) for offset in range(sizes["days"])]
+
+    product_ids = _product_types(db)
+    buyer_ids = _buyers(writer, draws, sizes["buyers"])
+    _sales(
+        writer,
+        draws,
+        days,
+        buyer_ids,
+        product_ids,
+        sizes["sales"],
+        sizes["max_items"],
+        batch_size,
+    )
+    _payments(writer, draws, days, buyer_ids, sizes["payments"], batch_size)
+    _purchases(writer, draws, days, sizes["purchases"], batch_size)
+    _expenses(writer, draws, days, sizes["expenses"], batch_size)
+    _sync_sequences(
+        db,
+        (
+            models.Buyer.__table__,
+            models.Sale.__table__,
+            models.SaleItem.__table__,
+            models.Purchase.__table__,
+        ),
+    )
+    db.commit()
+
+    rebuild_balances(db)
+    rebuild_rollups(db)
+    return writer.counts
+
+
+def add_size_arguments(parser, default_preset: str = "demo"):
+    """``--preset`` plus one override flag per volume (shared with benchmark.py)."""
+    parser.add_argument("--preset", choices=PRESETS, default=default_preset)
+    for field in SIZE_FIELDS:
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def sizes_from_args(args) -> dict:
+    sizes = dict(PRESETS[args.preset])
+    for field in SIZE_FIELDS:
+        if getattr(args, field) is not None:
+            sizes[field] = getattr(args, field)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    add_size_arguments(parser)
+    parser.add_argument("--reset", action="store_true", help="delete existing data")
+    parser.add_argument("--method", choices=["auto", "insert", "copy"], default="auto")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--no-numpy", action="store_true")
+    args = parser.parse_args()
+
+    if args.method == "copy" and engine.dialect.name != "postgresql":
+        print("✗ --method copy needs PostgreSQL.")
+        sys.exit(1)
+    use_numpy = numpy is not None and not args.no_numpy
+    method = default_method(engine) if args.method == "auto" else args.method
+    sizes = sizes_from_args(args)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.reset:
+            reset(db)
+        start = time.perf_counter()
+        counts = generate(db, sizes, args.seed, method, args.batch_size, use_numpy)
+        elapsed = time.perf_counter() - start
+        for table, count in counts.items():
+            print(f"✓ {table}: {count:,}")
+        print(
+            f"Seeded {sum(counts.values()):,} rows in {elapsed:.1f}s "
+            f"({'NumPy' if use_numpy else 'Python'} draws, {method})."
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Seeding failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()